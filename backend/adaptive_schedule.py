@@ -0,0 +1,132 @@
+"""
+Intervalo adaptativo del aprendizaje continuo
+A partir de continuous_learning_log y de los puntos de control por fuente
+decide cuánto esperar hasta la próxima sesión (según las palabras nuevas que
+aportan las últimas sesiones) y qué fuentes conviene saltarse un tiempo
+(según las palabras que rinde cada segundo de CPU).
+"""
+
+import logging
+import sqlite3
+from typing import Dict
+
+from vocabulary_store import add_column
+
+logger = logging.getLogger(__name__)
+
+# Una fuente sin CPU medida no puede tener rendimiento "bajo" por división entre cero
+_MIN_CPU_SECONDS = 0.01
+
+
+def _migration_session_yield(conn: sqlite3.Connection):
+    """Palabras nuevas por sesión y CPU por fuente, para el intervalo adaptativo"""
+    add_column(conn, "continuous_learning_log", "new_words", "INTEGER")
+    add_column(conn, "continuous_learning_checkpoints", "cpu_seconds", "REAL DEFAULT 0")
+
+
+# Amplían las tablas de sesiones y puntos de control: van detrás de sus migraciones
+MIGRATIONS = [_migration_session_yield]
+
+
+class AdaptiveSchedule:
+    """
+    Intervalo entre sesiones y fuentes en pausa.
+
+    Tras cada sesión, si la media de palabras nuevas de las últimas
+    `yield_window` sesiones queda por debajo de `low_yield_new_words` el
+    intervalo se multiplica por `interval_step_factor`; si supera
+    `high_yield_new_words` se divide. Siempre dentro de
+    [min_interval_minutes, max_interval_minutes]. Cambiar
+    training_interval_minutes en la configuración reinicia el intervalo.
+
+    Una fuente cuyas últimas `yield_window` ejecuciones rindieron menos de
+    `min_source_words_per_cpu_second` se salta durante
+    `source_cooldown_sessions` sesiones; después vuelve a probarse.
+    """
+
+    def __init__(self, store, config):
+        self.store = store
+        self.config = config
+        self._base_minutes = config.training_interval_minutes
+        self.current_interval_minutes = float(config.training_interval_minutes)
+
+    def next_interval_minutes(self) -> float:
+        """Ajustar el intervalo con el rendimiento reciente y devolverlo"""
+        config = self.config
+        if config.training_interval_minutes != self._base_minutes:
+            self._base_minutes = config.training_interval_minutes
+            self.current_interval_minutes = float(config.training_interval_minutes)
+        if not config.adaptive_interval:
+            return float(config.training_interval_minutes)
+
+        recent = self._recent_new_words()
+        if len(recent) >= config.yield_window:
+            average = sum(recent) / len(recent)
+            previous = self.current_interval_minutes
+            if average < config.low_yield_new_words:
+                self.current_interval_minutes *= config.interval_step_factor
+            elif average > config.high_yield_new_words:
+                self.current_interval_minutes /= config.interval_step_factor
+            self.current_interval_minutes = min(config.max_interval_minutes,
+                                                max(config.min_interval_minutes, self.current_interval_minutes))
+            if self.current_interval_minutes != previous:
+                logger.info(f"⏱️ Intervalo ajustado a {self.current_interval_minutes:.1f} minutos "
+                            f"({average:.0f} palabras nuevas por sesión)")
+        return self.current_interval_minutes
+
+    def paused_sources(self) -> Dict[str, int]:
+        """{fuente: sesiones que faltan para volver a probarla} de las fuentes de bajo rendimiento"""
+        config = self.config
+        if not config.adaptive_interval:
+            return {}
+        window = config.yield_window
+        with self.store.connection() as conn:
+            rows = conn.execute("""
+                SELECT source, session_id, words_learned, cpu_seconds FROM (
+                    SELECT c.source, c.session_id, c.words_learned, c.cpu_seconds,
+                           ROW_NUMBER() OVER (PARTITION BY c.source ORDER BY c.session_id DESC) AS n
+                    FROM continuous_learning_checkpoints c
+                    JOIN continuous_learning_log l ON l.id = c.session_id
+                    WHERE c.status = 'success' AND l.session_end IS NOT NULL
+                ) WHERE n <= ?
+            """, (window,)).fetchall()
+            last_session = conn.execute("SELECT MAX(id) FROM continuous_learning_log").fetchone()[0] or 0
+
+        runs: Dict[str, list] = {}
+        for source, session_id, words, cpu in rows:
+            runs.setdefault(source, []).append((session_id, words or 0, cpu or 0.0))
+
+        paused = {}
+        for source, source_runs in runs.items():
+            if len(source_runs) < window:
+                continue
+            words = sum(run[1] for run in source_runs)
+            cpu = max(_MIN_CPU_SECONDS, sum(run[2] for run in source_runs))
+            if words / cpu >= config.min_source_words_per_cpu_second:
+                continue
+            sessions_since = last_session - max(run[0] for run in source_runs)
+            remaining = config.source_cooldown_sessions - sessions_since
+            if remaining > 0:
+                paused[source] = remaining
+        return paused
+
+    def get_stats(self) -> Dict:
+        """Intervalo actual y fuentes en pausa"""
+        try:
+            paused = self.paused_sources()
+        except Exception as e:
+            logger.warning(f"No se pudo calcular el rendimiento por fuente: {e}")
+            paused = {}
+        return {
+            'current_interval_minutes': round(self.current_interval_minutes, 2),
+            'paused_sources': paused
+        }
+
+    def _recent_new_words(self) -> list:
+        """Palabras nuevas de las últimas sesiones terminadas"""
+        with self.store.connection() as conn:
+            return [row[0] for row in conn.execute("""
+                SELECT new_words FROM continuous_learning_log
+                WHERE status IN ('completed', 'partial') AND new_words IS NOT NULL
+                ORDER BY id DESC LIMIT ?
+            """, (self.config.yield_window,))]
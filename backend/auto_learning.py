@@ -4,18 +4,105 @@ Permite que el chatbot aprenda vocabulario automáticamente sin interacción man
 """
 
 import asyncio
+import contextvars
+import functools
+import hashlib
 import json
 import logging
+import os
 import random
 import sqlite3
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 from dataclasses import dataclass, field
-import requests
 from pathlib import Path
 
+import httpx
+
+from corpus_shards import (CORPUS_WORD_PATTERN, categorize_word, count_corpus_shard, init_shard_worker,
+                           iter_corpus_lines, shard_boundaries, shard_process_context)
+from learning_metrics import PhaseMetrics
+from seen_content import SeenContentBatch, SeenContentFilter
+from traffic_load import LearningThrottle
+from vocabulary_store import add_column, get_store
+
 logger = logging.getLogger(__name__)
 
+# Instante (time.monotonic) en que la fuente en curso debe dejar de leer
+_SOURCE_DEADLINE: contextvars.ContextVar = contextvars.ContextVar('source_deadline', default=None)
+
+# Evento (threading.Event) que pide a las fuentes en curso detenerse cuanto antes
+_STOP_REQUESTED: contextvars.ContextVar = contextvars.ContextVar('stop_requested', default=None)
+
+# Función (source, cursor, words, expressions, status, cpu_seconds, new_words) que recibe el avance
+# confirmado de cada fuente
+_SESSION_PROGRESS: contextvars.ContextVar = contextvars.ContextVar('session_progress', default=None)
+
+# Métricas por fuente y fase (learning_metrics.PhaseMetrics) de la sesión en curso
+_SESSION_METRICS: contextvars.ContextVar = contextvars.ContextVar('session_metrics', default=None)
+
+# Nombre de la fuente en curso, con el que se informa su avance
+_SOURCE_NAME: contextvars.ContextVar = contextvars.ContextVar('source_name', default=None)
+
+# Cada cuánto comprueba una espera bloqueante si se pidió detener la sesión
+STOP_POLL_SECONDS = 0.25
+
+
+def _migration_auto_learning(conn: sqlite3.Connection):
+    """Registro, caché HTTP y puntos de control del aprendizaje automático"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS auto_learning_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source TEXT NOT NULL,
+            words_learned INTEGER DEFAULT 0,
+            expressions_learned INTEGER DEFAULT 0,
+            learning_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            status TEXT DEFAULT 'success'
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_auto_learning_date ON auto_learning_log(learning_date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_auto_learning_source ON auto_learning_log(source)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS corpus_ingest_state (
+            url TEXT PRIMARY KEY,
+            byte_offset INTEGER DEFAULT 0,
+            line_offset INTEGER DEFAULT 0,
+            completed INTEGER DEFAULT 0,
+            updated_at TEXT,
+            content_hash TEXT
+        )
+    """)
+    add_column(conn, "corpus_ingest_state", "content_hash", "TEXT")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS text_file_checkpoints (
+            path TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime_ns INTEGER,
+            byte_offset INTEGER DEFAULT 0,
+            head_hash TEXT,
+            updated_at TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS http_source_cache (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            content_hash TEXT,
+            size INTEGER,
+            fetched_at TEXT,
+            checked_at TEXT
+        )
+    """)
+
+
+MIGRATIONS = [_migration_auto_learning]
+
 @dataclass
 class AutoLearningConfig:
     """Configuración del aprendizaje automático"""
@@ -69,6 +156,49 @@ class AutoLearningConfig:
         "https://raw.githubusercontent.com/words/an-array-of-spanish-words/master/words.json"
     ])
     
+    # Configuración de descargas (cliente HTTP asíncrono compartido)
+    max_concurrent_requests: int = 4
+    api_timeout_seconds: float = 10.0
+    corpus_timeout_seconds: float = 15.0
+    max_retries: int = 2
+    retry_backoff_seconds: float = 0.5
+    http_cache_path: str = "learning_data/http_cache/"  # Copias locales de las fuentes descargadas
+    
+    # Ingesta de corpus en streaming (memoria acotada y reanudable)
+    corpus_batch_size: int = 5000  # Palabras distintas por inserción masiva
+    max_corpus_words_per_session: int = 50000  # Por URL; la siguiente sesión continúa donde quedó
+    max_corpus_line_bytes: int = 1 << 20  # Líneas más largas se cortan en un separador
+    text_file_head_bytes: int = 4096  # Bytes iniciales con los que se detecta un archivo reescrito
+    
+    # Corpus grandes: tokenización por fragmentos en varios procesos y una sola inserción masiva
+    sharded_ingestion_min_bytes: int = 64 << 20  # 0 desactiva el modo por fragmentos
+    shard_size_bytes: int = 16 << 20
+    shard_workers: int = 0  # 0 = un proceso por núcleo
+    
+    # Ejecución concurrente de las fuentes
+    source_deadlines: Dict[str, float] = field(default_factory=lambda: {
+        "text_files": 120.0,
+        "api_data": 60.0,
+        "synthetic_data": 30.0,
+        "spanish_corpus": 600.0
+    })
+    source_deadline_grace_seconds: float = 5.0  # Margen para confirmar el último lote antes de cancelar
+    tokenize_workers: int = 2
+    
+    # Cesión al tráfico del chat: se mide la carga entre porciones de trabajo
+    throttle_max_in_flight: int = 4  # Peticiones en vuelo a partir de las que se pausa
+    throttle_max_p95_ms: float = 500.0  # Latencia p95 reciente a partir de la que se pausa
+    throttle_max_writer_queue: int = 64  # Escrituras pendientes a partir de las que se pausa
+    throttle_slice_lines: int = 500  # Líneas leídas entre comprobaciones de carga
+    throttle_max_backoff_seconds: float = 2.0
+    
+    # Contenido ya aprendido (filtro de Bloom persistente): líneas y frases repetidas se omiten
+    enable_seen_content_filter: bool = True
+    seen_content_window_hours: float = 7 * 24  # Cada ventana tiene su filtro; al rotar se olvida lo antiguo
+    seen_content_windows: int = 2  # Ventanas consultadas (la actual y las anteriores)
+    seen_content_capacity: int = 100000  # Elementos de la primera capa del filtro
+    seen_content_error_rate: float = 0.001
+    
     # Configuración de aprendizaje
     learning_interval: int = 3600  # 1 hora
     max_words_per_session: int = 1000
@@ -80,41 +210,317 @@ class AutoVocabularyLearner:
     def __init__(self, db_path: str = "optimized_learning.db", config: Optional[AutoLearningConfig] = None):
         self.db_path = db_path
         self.config = config or AutoLearningConfig()
-        self._init_database()
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._http_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._http_semaphore: Optional[asyncio.Semaphore] = None
+        self._tokenize_pool = ThreadPoolExecutor(max_workers=self.config.tokenize_workers,
+                                                 thread_name_prefix="auto-learning")
+        self.store = get_store(db_path)
+        self.store.migrate(MIGRATIONS)
+        # Sin señal del servidor solo cuenta la cola del escritor local
+        self.throttle = LearningThrottle(
+            local_queue_depth=self.store.writer.queue_depth,
+            max_in_flight=self.config.throttle_max_in_flight,
+            max_p95_ms=self.config.throttle_max_p95_ms,
+            max_writer_queue=self.config.throttle_max_writer_queue,
+            max_backoff_seconds=self.config.throttle_max_backoff_seconds
+        )
+        self.seen_content = SeenContentFilter(
+            self.store,
+            window_seconds=self.config.seen_content_window_hours * 3600,
+            windows=self.config.seen_content_windows,
+            capacity=self.config.seen_content_capacity,
+            error_rate=self.config.seen_content_error_rate
+        )
         self._create_learning_data_dir()
     
-    def _init_database(self):
-        """Inicializar base de datos para aprendizaje automático"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                # Tabla para tracking de aprendizaje automático
-                conn.execute("""
-                    CREATE TABLE IF NOT EXISTS auto_learning_log (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        source TEXT NOT NULL,
-                        words_learned INTEGER DEFAULT 0,
-                        expressions_learned INTEGER DEFAULT 0,
-                        learning_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        status TEXT DEFAULT 'success'
-                    )
-                """)
-                
-                # Índices para optimización
-                conn.execute("CREATE INDEX IF NOT EXISTS idx_auto_learning_date ON auto_learning_log(learning_date)")
-                conn.execute("CREATE INDEX IF NOT EXISTS idx_auto_learning_source ON auto_learning_log(source)")
-                
-        except Exception as e:
-            logger.error(f"Error inicializando base de datos: {e}")
-    
     def _create_learning_data_dir(self):
         """Crear directorio para datos de aprendizaje"""
         try:
             Path(self.config.text_files_path).mkdir(exist_ok=True)
+            Path(self.config.http_cache_path).mkdir(parents=True, exist_ok=True)
         except Exception as e:
             logger.error(f"Error creando directorio de datos: {e}")
     
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """Cliente HTTP con pool de conexiones compartido por todas las fuentes del bucle actual"""
+        loop = asyncio.get_running_loop()
+        if self._http_client is None or self._http_client.is_closed or self._http_loop is not loop:
+            limits = httpx.Limits(
+                max_connections=self.config.max_concurrent_requests,
+                max_keepalive_connections=self.config.max_concurrent_requests
+            )
+            self._http_client = httpx.AsyncClient(limits=limits, follow_redirects=True)
+            self._http_loop = loop
+            self._http_semaphore = asyncio.Semaphore(self.config.max_concurrent_requests)
+        return self._http_client
+    
+    async def close(self):
+        """Cerrar el cliente HTTP compartido"""
+        if self._http_client is not None and not self._http_client.is_closed:
+            await self._http_client.aclose()
+        self._http_client = None
+    
+    async def _retrying(self, url: str, request):
+        """Ejecutar request() con concurrencia acotada y reintentos ante errores de red o 5xx"""
+        self._get_http_client()
+        
+        for attempt in range(self.config.max_retries + 1):
+            try:
+                async with self._http_semaphore:
+                    return await request()
+            except httpx.HTTPStatusError as e:
+                # Solo se reintentan errores del servidor
+                if e.response.status_code < 500:
+                    logger.warning(f"Respuesta {e.response.status_code} de {url}")
+                    return None
+                logger.warning(f"Respuesta {e.response.status_code} de {url} (intento {attempt + 1})")
+            except httpx.HTTPError as e:
+                logger.warning(f"Error descargando {url} (intento {attempt + 1}): {e}")
+            
+            if attempt < self.config.max_retries:
+                await asyncio.sleep(self.config.retry_backoff_seconds * (2 ** attempt))
+        
+        return None
+    
+    async def _fetch_to_cache(self, url: str, timeout: float) -> Tuple[str, Optional[Path]]:
+        """
+        Descargar una fuente a la caché local con petición condicional.
+        
+        Devuelve (estado, ruta en caché). Estados: "changed" si el contenido es
+        nuevo, "not_modified" si el servidor respondió 304, "unchanged" si se
+        descargó pero su hash coincide con la copia guardada y "error" si no se
+        pudo descargar (la ruta es la copia anterior, si existe).
+        """
+        client = self._get_http_client()
+        cache_file = Path(self.config.http_cache_path) / hashlib.sha256(url.encode('utf-8')).hexdigest()
+        partial_file = cache_file.with_suffix('.part')
+        cached = await asyncio.to_thread(self._load_cache_entry, url) if cache_file.exists() else None
+        
+        headers = {}
+        if cached and cached['etag']:
+            headers['If-None-Match'] = cached['etag']
+        if cached and cached['last_modified']:
+            headers['If-Modified-Since'] = cached['last_modified']
+        
+        async def request():
+            async with client.stream("GET", url, headers=headers, timeout=timeout) as response:
+                if response.status_code == 304:
+                    return response.headers, None, 0
+                response.raise_for_status()
+                
+                # El cuerpo va directo a disco: en memoria solo queda un bloque
+                digest = hashlib.sha256()
+                size = 0
+                with open(partial_file, 'wb') as f:
+                    async for chunk in response.aiter_bytes():
+                        digest.update(chunk)
+                        f.write(chunk)
+                        size += len(chunk)
+                return response.headers, digest.hexdigest(), size
+        
+        fetch_start = time.perf_counter()
+        result = await self._retrying(url, request)
+        self._record_phase("fetch", time.perf_counter() - fetch_start, int(result is not None), int(result is None))
+        if result is None:
+            return "error", cache_file if cache_file.exists() else None
+        
+        response_headers, content_hash, size = result
+        if content_hash is None:
+            status = "not_modified"
+        elif cached and content_hash == cached['content_hash']:
+            status = "unchanged"
+            partial_file.unlink()
+        else:
+            status = "changed"
+            os.replace(partial_file, cache_file)
+        
+        await self._awrite(lambda conn: self._save_cache_entry(conn, url, response_headers,
+                                                               content_hash, size, status))
+        return status, cache_file
+    
+    def _load_cache_entry(self, url: str) -> Optional[Dict]:
+        """Validadores y hash guardados de una fuente"""
+        try:
+            with self.store.connection() as conn:
+                row = conn.execute(
+                    "SELECT etag, last_modified, content_hash FROM http_source_cache WHERE url = ?",
+                    (url,)
+                ).fetchone()
+        except Exception as e:
+            logger.warning(f"No se pudo leer la caché de {url}: {e}")
+            return None
+        return {'etag': row[0], 'last_modified': row[1], 'content_hash': row[2]} if row else None
+    
+    def _save_cache_entry(self, conn: sqlite3.Connection, url: str, headers: httpx.Headers,
+                          content_hash: Optional[str], size: int, status: str):
+        """Guardar validadores HTTP y hash; un 304 solo actualiza la fecha de comprobación"""
+        now = datetime.now().isoformat()
+        if status == "not_modified":
+            conn.execute("UPDATE http_source_cache SET checked_at = ? WHERE url = ?", (now, url))
+            return
+        conn.execute("""
+            INSERT INTO http_source_cache
+            (url, etag, last_modified, content_hash, size, fetched_at, checked_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                etag = excluded.etag,
+                last_modified = excluded.last_modified,
+                content_hash = excluded.content_hash,
+                size = excluded.size,
+                fetched_at = excluded.fetched_at,
+                checked_at = excluded.checked_at
+        """, (url, headers.get('etag'), headers.get('last-modified'), content_hash, size, now, now))
+    
+    def _cached_content_hash(self, url: str) -> Optional[str]:
+        """Hash de la copia en caché de una fuente"""
+        entry = self._load_cache_entry(url)
+        return entry['content_hash'] if entry else None
+    
+    async def _run_in_pool(self, func, *args):
+        """Ejecutar trabajo de CPU (tokenizar, contar) en el pool propio, no en el del servidor"""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._tokenize_pool,
+                                          functools.partial(context.run, self._timed, func, *args))
+    
+    def _timed(self, func, *args):
+        """Ejecutar en el hilo de trabajo e informar la CPU gastada a la fuente en curso"""
+        start = time.thread_time()
+        try:
+            return func(*args)
+        finally:
+            self._report_progress(cpu_seconds=time.thread_time() - start)
+    
+    def _write(self, operation, rows: int = 0, seen: Optional[SeenContentBatch] = None):
+        """
+        Escribir a través del escritor único del almacén y esperar el COMMIT (desde hilos de trabajo).
+        Los textos de `seen` se marcan como vistos en la misma transacción; si
+        la escritura falla el filtro se recarga y siguen contando como nuevos.
+        """
+        self._yield_to_traffic()
+        
+        def write(conn):
+            result = operation(conn)
+            if seen is not None:
+                self.seen_content.save(conn, seen)
+            return result
+        
+        try:
+            return self.store.write(self._measured_write(write, rows)).result()
+        except Exception:
+            if seen is not None:
+                self.seen_content.reset()
+            raise
+    
+    async def _awrite(self, operation):
+        """Escribir desde el bucle de eventos sin bloquearlo"""
+        await self.throttle.await_capacity(self._deadline_passed)
+        return await asyncio.wrap_future(self.store.write(self._measured_write(operation)))
+    
+    @staticmethod
+    def _measured_write(operation, rows: int = 0):
+        """
+        Envolver una escritura para medir su fase 'write' en el hilo del
+        escritor, que no ve el contexto de la fuente: se captura al encolar
+        """
+        metrics = _SESSION_METRICS.get()
+        source = _SOURCE_NAME.get()
+        if metrics is None or source is None:
+            return operation
+        
+        def measured(conn):
+            start = time.perf_counter()
+            try:
+                result = operation(conn)
+            except Exception:
+                metrics.record(source, "write", time.perf_counter() - start, errors=1)
+                raise
+            metrics.record(source, "write", time.perf_counter() - start, rows)
+            return result
+        
+        return measured
+    
+    @staticmethod
+    def _record_phase(phase: str, seconds: float, rows: int = 0, errors: int = 0):
+        """Anotar la duración de una fase (fetch, tokenize, categorize, write) de la fuente en curso"""
+        metrics = _SESSION_METRICS.get()
+        source = _SOURCE_NAME.get()
+        if metrics is not None and source is not None:
+            metrics.record(source, phase, seconds, rows, errors)
+    
+    def _categorize_counts(self, counts: Counter, categories: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """Categorías de las palabras de un lote, calculadas antes de encolar la escritura"""
+        start = time.perf_counter()
+        categories = dict(categories or {})
+        for word in counts:
+            if word not in categories:
+                categories[word] = categorize_word(word)
+        self._record_phase("categorize", time.perf_counter() - start, len(counts))
+        return categories
+    
+    @staticmethod
+    def _report_progress(cursor: Optional[str] = None, words: int = 0, expressions: int = 0,
+                         status: str = 'running', cpu_seconds: float = 0.0, new_words: int = 0):
+        """
+        Informar a la sesión del avance ya confirmado de la fuente en curso;
+        `new_words` son las palabras que esa escritura insertó por primera vez
+        """
+        progress = _SESSION_PROGRESS.get()
+        source = _SOURCE_NAME.get()
+        if progress is not None and source is not None:
+            progress(source, cursor, words, expressions, status, cpu_seconds, new_words)
+    
+    def _yield_to_traffic(self):
+        """Entre porciones de trabajo: esperar mientras el servidor esté ocupado (salvo plazo o parada)"""
+        self.throttle.wait_for_capacity(self._deadline_passed)
+    
+    @staticmethod
+    def _deadline_passed() -> bool:
+        """True si la fuente en curso agotó su tiempo o se pidió detener la sesión"""
+        stop = _STOP_REQUESTED.get()
+        if stop is not None and stop.is_set():
+            return True
+        deadline = _SOURCE_DEADLINE.get()
+        return deadline is not None and time.monotonic() >= deadline
+    
+    def _wait_before_deadline(self, future):
+        """Resultado de un trabajo en otro proceso, o FutureTimeoutError si llega el plazo o la parada"""
+        while True:
+            if self._deadline_passed():
+                raise FutureTimeoutError()
+            deadline = _SOURCE_DEADLINE.get()
+            timeout = STOP_POLL_SECONDS
+            if deadline is not None:
+                timeout = min(timeout, max(0.0, deadline - time.monotonic()))
+            try:
+                return future.result(timeout=timeout)
+            except FutureTimeoutError:
+                continue
+    
+    def _seen_batch(self) -> Optional[SeenContentBatch]:
+        """Lote de textos nuevos para una escritura (None si el filtro está desactivado)"""
+        return self.seen_content.batch() if self.config.enable_seen_content_filter else None
+    
+    @staticmethod
+    def _new_content(seen: Optional[SeenContentBatch], texts: List[str], namespace: str = "") -> List[str]:
+        """Textos que no se habían aprendido (todos si el filtro está desactivado)"""
+        return texts if seen is None else seen.filter_new(texts, namespace)
+    
+    def _learn_words(self, words: List[str], source: str, seen: Optional[SeenContentBatch] = None) -> int:
+        """Aprender una lista de palabras con una inserción masiva y devolver cuántas se aprendieron"""
+        counts = Counter(w for w in (word.strip().lower() for word in words) if len(w) >= 3)
+        categories = self._categorize_counts(counts)
+        
+        def save(conn):
+            return self._upsert_word_counts(conn, counts, source, categories)
+        
+        new_words = self._write(save, rows=len(counts), seen=seen)
+        self._report_progress(words=sum(counts.values()), new_words=new_words)
+        return sum(counts.values())
+    
     async def learn_from_text_files(self) -> Dict:
-        """Aprender desde archivos de texto"""
+        """Aprender desde archivos de texto (solo el contenido nuevo desde la última sesión)"""
         if not self.config.enable_text_files:
             return {"status": "disabled", "words_learned": 0}
         
@@ -122,25 +528,14 @@ class AutoVocabularyLearner:
             words_learned = 0
             expressions_learned = 0
             
-            # Aprender desde archivo de vocabulario
-            vocab_file = Path(self.config.text_files_path) / self.config.vocabulary_file
-            if vocab_file.exists():
-                with open(vocab_file, 'r', encoding='utf-8') as f:
-                    words = f.read().splitlines()
-                    for word in words[:self.config.max_words_per_session]:
-                        if self._learn_word(word, "text_file"):
-                            words_learned += 1
-            
-            # Aprender desde archivo de expresiones
-            expr_file = Path(self.config.text_files_path) / self.config.expressions_file
-            if expr_file.exists():
-                with open(expr_file, 'r', encoding='utf-8') as f:
-                    expressions = f.read().splitlines()
-                    for expr in expressions[:self.config.max_words_per_session//2]:
-                        if self._learn_expression(expr, "text_file"):
-                            expressions_learned += 1
+            for file_name in (self.config.vocabulary_file, self.config.expressions_file):
+                file_path = Path(self.config.text_files_path) / file_name
+                if file_path.exists():
+                    result = await self._run_in_pool(self.learn_from_text_file, str(file_path))
+                    words_learned += result["words"]
+                    expressions_learned += result["expressions"]
             
-            self._log_learning_session("text_files", words_learned, expressions_learned)
+            await self._log_learning_session("text_files", words_learned, expressions_learned)
             return {
                 "status": "success",
                 "words_learned": words_learned,
@@ -151,62 +546,182 @@ class AutoVocabularyLearner:
             logger.error(f"Error aprendiendo desde archivos: {e}")
             return {"status": "error", "error": str(e)}
     
-    async def learn_from_api_data(self) -> Dict:
-        """Aprender desde datos de APIs"""
+    def learn_from_text_file(self, file_path: str, as_expressions: Optional[bool] = None) -> Dict:
+        """
+        Aprender las líneas de un archivo de texto añadidas desde la última lectura.
+        
+        El punto de control guarda tamaño, mtime, byte leído y un hash de los
+        primeros bytes ya leídos. Un archivo sin cambios no se abre; uno que creció continúa
+        desde el byte guardado; uno truncado o reescrito se lee desde el
+        principio. Cada sesión procesa como mucho max_words_per_session líneas
+        (la mitad para expresiones) y la siguiente continúa donde quedó.
+        Lanza FileNotFoundError si el archivo no existe.
+        """
+        if as_expressions is None:
+            as_expressions = Path(file_path).name == self.config.expressions_file
+        line_limit = self.config.max_words_per_session // 2 if as_expressions else self.config.max_words_per_session
+        
+        stat = os.stat(file_path)
+        checkpoint = self._load_text_file_checkpoint(file_path)
+        if checkpoint and checkpoint[0] == stat.st_size and checkpoint[1] == stat.st_mtime_ns \
+                and checkpoint[2] >= stat.st_size:
+            return {"words": 0, "expressions": 0, "byte_offset": checkpoint[2], "completed": True}
+        
+        words = Counter()
+        expressions = Counter()
+        seen = self._seen_batch()
+        tokenize_start = time.perf_counter()
+        
+        with open(file_path, 'rb') as f:
+            # Se compara solo el prefijo ya leído: añadir líneas no cambia su hash
+            byte_offset = 0
+            if checkpoint and checkpoint[2] <= stat.st_size:
+                head = f.read(min(checkpoint[2], self.config.text_file_head_bytes))
+                if hashlib.sha256(head).hexdigest() == checkpoint[3]:
+                    byte_offset = checkpoint[2]
+            f.seek(byte_offset)
+            
+            lines_read = 0
+            while lines_read < line_limit and not self._deadline_passed():
+                raw = f.readline()
+                if not raw:
+                    break
+                byte_offset += len(raw)
+                lines_read += 1
+                if lines_read % self.config.throttle_slice_lines == 0:
+                    self._yield_to_traffic()
+                line = raw.decode('utf-8', errors='replace').strip()
+                if not self._new_content(seen, [line], "expression" if as_expressions else ""):
+                    continue
+                
+                if as_expressions:
+                    if len(line) >= 5:
+                        expressions[line] += 1
+                else:
+                    words.update(word for word in CORPUS_WORD_PATTERN.findall(line.lower()) if len(word) >= 3)
+            
+            f.seek(0)
+            head_hash = hashlib.sha256(f.read(min(byte_offset, self.config.text_file_head_bytes))).hexdigest()
+        self._record_phase("tokenize", time.perf_counter() - tokenize_start, lines_read)
+        categories = self._categorize_counts(words)
+        
+        def save(conn):
+            new_words = self._upsert_word_counts(conn, words, "text_file", categories)
+            self._upsert_expression_counts(conn, expressions, "text_file")
+            conn.execute("""
+                INSERT INTO text_file_checkpoints (path, size, mtime_ns, byte_offset, head_hash, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET
+                    size = excluded.size,
+                    mtime_ns = excluded.mtime_ns,
+                    byte_offset = excluded.byte_offset,
+                    head_hash = excluded.head_hash,
+                    updated_at = excluded.updated_at
+            """, (file_path, stat.st_size, stat.st_mtime_ns, byte_offset, head_hash, datetime.now().isoformat()))
+            return new_words
+        
+        new_words = self._write(save, rows=len(words) + len(expressions), seen=seen)
+        self._report_progress(f"{file_path}@{byte_offset}", sum(words.values()), sum(expressions.values()),
+                              new_words=new_words)
+        
+        return {
+            "words": sum(words.values()),
+            "expressions": sum(expressions.values()),
+            "byte_offset": byte_offset,
+            "completed": byte_offset >= stat.st_size
+        }
+    
+    def _load_text_file_checkpoint(self, file_path: str) -> Optional[tuple]:
+        """(size, mtime_ns, byte_offset, head_hash) guardados de un archivo"""
+        try:
+            with self.store.connection() as conn:
+                return conn.execute(
+                    "SELECT size, mtime_ns, byte_offset, head_hash FROM text_file_checkpoints WHERE path = ?",
+                    (file_path,)
+                ).fetchone()
+        except Exception as e:
+            logger.warning(f"No se pudo leer el punto de control de {file_path}: {e}")
+            return None
+    
+    async def learn_from_api_data(self, urls: Optional[List[str]] = None) -> Dict:
+        """Aprender desde datos de APIs (las respuestas idénticas a la anterior se omiten)"""
         if not self.config.enable_api_learning:
             return {"status": "disabled", "words_learned": 0}
         
         try:
             words_learned = 0
+            skipped_sources = 0
+            urls = urls if urls is not None else self.config.api_endpoints
+            fetched = await asyncio.gather(
+                *(self._fetch_to_cache(url, self.config.api_timeout_seconds) for url in urls)
+            )
             
-            for endpoint in self.config.api_endpoints:
+            for endpoint, (status, cache_file) in zip(urls, fetched):
+                if status != "changed":
+                    skipped_sources += status != "error"
+                    continue
                 try:
-                    response = requests.get(endpoint, timeout=10)
-                    if response.status_code == 200:
-                        data = response.json()
-                        words = self._extract_words_from_json(data)
-                        for word in words[:100]:  # Límite por API
-                            if self._learn_word(word, "api_data"):
-                                words_learned += 1
+                    # Límite de 100 palabras por API; se tokeniza fuera del bucle de eventos
+                    words_learned += await self._run_in_pool(self._learn_from_json_file, cache_file, "api_data", 100)
                 except Exception as e:
                     logger.warning(f"Error con API {endpoint}: {e}")
                     continue
             
-            self._log_learning_session("api_data", words_learned, 0)
-            return {"status": "success", "words_learned": words_learned}
+            await self._log_learning_session("api_data", words_learned, 0)
+            return {"status": "success", "words_learned": words_learned, "unchanged_sources": skipped_sources}
             
         except Exception as e:
             logger.error(f"Error aprendiendo desde APIs: {e}")
             return {"status": "error", "error": str(e)}
     
+    def _learn_from_json_file(self, path: Path, source: str, limit: int) -> int:
+        """
+        Extraer y aprender las palabras de los textos nuevos de una respuesta
+        JSON guardada, como mucho `limit` palabras distintas en orden de
+        aparición. Solo se marcan como vistos los textos cuyas palabras se
+        escribieron enteras; el resto sigue contando como nuevo.
+        """
+        start = time.perf_counter()
+        seen = self._seen_batch()
+        try:
+            texts = self._extract_texts_from_json(json.loads(path.read_bytes()))
+        except ValueError:
+            self._record_phase("tokenize", time.perf_counter() - start, errors=1)
+            raise
+        if seen is not None:
+            texts = seen.unseen(texts)
+        
+        words: Dict[str, None] = {}
+        taken = []
+        for text in texts:
+            text_words = [word for word in text.lower().split() if word not in words]
+            if len(words) + len(set(text_words)) > limit:
+                if not taken:
+                    # Un primer texto más largo que el límite se aprende en parte y sin marcar
+                    for word in text_words[:limit]:
+                        words[word] = None
+                break
+            words.update(dict.fromkeys(text_words))
+            taken.append(text)
+        self._new_content(seen, taken)
+        self._record_phase("tokenize", time.perf_counter() - start, len(taken))
+        return self._learn_words(list(words), source, seen)
+    
     async def learn_from_synthetic_data(self) -> Dict:
         """Aprender desde datos sintéticos"""
         if not self.config.enable_synthetic_data:
             return {"status": "disabled", "words_learned": 0}
         
         try:
-            words_learned = 0
-            expressions_learned = 0
-            
-            # Mensajes sintéticos predefinidos
-            for message in self.config.synthetic_messages:
-                words = message.lower().split()
-                for word in words:
-                    if self._learn_word(word, "synthetic_data"):
-                        words_learned += 1
-                
-                if self._learn_expression(message, "synthetic_data"):
-                    expressions_learned += 1
+            # Mensajes predefinidos (también como expresiones) y mensajes generados
+            words_learned, expressions_learned = await self._run_in_pool(
+                self._learn_from_messages,
+                self.config.synthetic_messages + self._generate_synthetic_messages(),
+                self.config.synthetic_messages,
+                "synthetic_data"
+            )
             
-            # Generar más mensajes sintéticos
-            additional_messages = self._generate_synthetic_messages()
-            for message in additional_messages:
-                words = message.lower().split()
-                for word in words:
-                    if self._learn_word(word, "synthetic_data"):
-                        words_learned += 1
-            
-            self._log_learning_session("synthetic_data", words_learned, expressions_learned)
+            await self._log_learning_session("synthetic_data", words_learned, expressions_learned)
             return {
                 "status": "success",
                 "words_learned": words_learned,
@@ -217,141 +732,281 @@ class AutoVocabularyLearner:
             logger.error(f"Error aprendiendo desde datos sintéticos: {e}")
             return {"status": "error", "error": str(e)}
     
-    async def learn_from_spanish_corpus(self) -> Dict:
-        """Aprender desde corpus de español"""
+    def _learn_from_messages(self, messages: List[str], expressions: List[str], source: str) -> tuple:
+        """Contar palabras de los mensajes y expresiones nuevos, y escribirlas en una sola operación"""
+        start = time.perf_counter()
+        seen = self._seen_batch()
+        messages = self._new_content(seen, messages)
+        expressions = self._new_content(seen, expressions, "expression")
+        word_counts = Counter(
+            word for message in messages
+            for word in CORPUS_WORD_PATTERN.findall(message.lower()) if len(word) >= 3
+        )
+        expression_counts = Counter(e.strip() for e in expressions if len(e.strip()) >= 5)
+        self._record_phase("tokenize", time.perf_counter() - start, len(messages) + len(expressions))
+        categories = self._categorize_counts(word_counts)
+        
+        def save(conn):
+            new_words = self._upsert_word_counts(conn, word_counts, source, categories)
+            self._upsert_expression_counts(conn, expression_counts, source)
+            return new_words
+        
+        new_words = self._write(save, rows=len(word_counts) + len(expression_counts), seen=seen)
+        self._report_progress(words=sum(word_counts.values()), expressions=sum(expression_counts.values()),
+                              new_words=new_words)
+        return sum(word_counts.values()), sum(expression_counts.values())
+    
+    async def learn_from_spanish_corpus(self, urls: Optional[List[str]] = None) -> Dict:
+        """Aprender desde corpus de español (los que no cambiaron desde su última lectura se omiten)"""
         if not self.config.enable_spanish_corpus:
             return {"status": "disabled", "words_learned": 0}
         
         try:
-            words_learned = 0
+            urls = urls if urls is not None else self.config.spanish_corpus_urls
+            results = await asyncio.gather(
+                *(self.ingest_corpus(url, "spanish_corpus") for url in urls),
+                return_exceptions=True
+            )
             
-            for url in self.config.spanish_corpus_urls:
-                try:
-                    response = requests.get(url, timeout=15)
-                    if response.status_code == 200:
-                        content = response.text
-                        words = content.split('\n')
-                        for word in words[:500]:  # Límite por corpus
-                            if word.strip() and self._learn_word(word.strip(), "spanish_corpus"):
-                                words_learned += 1
-                except Exception as e:
-                    logger.warning(f"Error con corpus {url}: {e}")
+            words_learned = 0
+            skipped_sources = 0
+            for url, result in zip(urls, results):
+                if isinstance(result, Exception):
+                    logger.warning(f"Error con corpus {url}: {result}")
                     continue
+                words_learned += result["words_learned"]
+                skipped_sources += result["skipped"]
             
-            self._log_learning_session("spanish_corpus", words_learned, 0)
-            return {"status": "success", "words_learned": words_learned}
+            await self._log_learning_session("spanish_corpus", words_learned, 0)
+            return {"status": "success", "words_learned": words_learned, "unchanged_sources": skipped_sources}
             
         except Exception as e:
             logger.error(f"Error aprendiendo desde corpus español: {e}")
             return {"status": "error", "error": str(e)}
     
-    def _learn_word(self, word: str, source: str) -> bool:
-        """Aprender una palabra"""
-        try:
-            word = word.strip().lower()
-            if len(word) < 3:
-                return False
-            
-            with sqlite3.connect(self.db_path) as conn:
-                # Verificar si ya existe
-                existing = conn.execute(
-                    "SELECT frequency FROM vocabulary WHERE word = ?", 
-                    (word,)
-                ).fetchone()
+    async def ingest_corpus(self, url: str, source: str, start_offset: Optional[int] = None,
+                            start_line: Optional[int] = None) -> Dict:
+        """
+        Descargar un corpus a la caché local y aprender sus palabras por lotes.
+        
+        Si el contenido no cambió desde la última lectura completa no se vuelve a
+        tokenizar. Si cambió se lee desde el principio; si una lectura anterior
+        quedó a medias continúa desde la posición guardada. Sin red, se sigue
+        leyendo la copia en caché.
+        """
+        fetch_status, cache_file = await self._fetch_to_cache(url, self.config.corpus_timeout_seconds)
+        if cache_file is None:
+            raise RuntimeError(f"No se pudo descargar {url}")
+        
+        result = await self._run_in_pool(self._ingest_cached_corpus, url, cache_file, source,
+                                         start_offset, start_line)
+        result["fetch_status"] = fetch_status
+        return result
+    
+    def _ingest_cached_corpus(self, url: str, cache_file: Path, source: str,
+                              start_offset: Optional[int], start_line: Optional[int]) -> Dict:
+        """
+        Leer la copia local de un corpus línea a línea con memoria acotada.
+        
+        Cada lote se escribe junto con la posición alcanzada (byte y línea) y el
+        hash del contenido, así que una lectura interrumpida o limitada por
+        sesión continúa desde ahí. start_line sin start_offset salta esa
+        cantidad de líneas desde el principio.
+        """
+        content_hash = self._cached_content_hash(url)
+        if start_offset is None and start_line is None:
+            position = self._load_corpus_position(url, content_hash)
+            if position is None:
+                return {"words_learned": 0, "completed": True, "skipped": True}
+            start_offset, start_line = position
+        
+        byte_offset = start_offset or 0
+        line_offset = start_line or 0
+        skip_lines = line_offset if not byte_offset else 0
+        word_limit = self.config.max_corpus_words_per_session
+        
+        min_sharded = self.config.sharded_ingestion_min_bytes
+        if min_sharded and not byte_offset and not line_offset and os.path.getsize(cache_file) >= min_sharded:
+            return self._ingest_sharded(url, cache_file, source, content_hash)
+        words_learned = 0
+        batch = Counter()
+        seen = self._seen_batch()
+        completed = True
+        # La tokenización se mide por tramos entre lotes escritos
+        slice_start = time.perf_counter()
+        slice_lines = 0
+        
+        with open(cache_file, 'rb') as f:
+            f.seek(byte_offset)
+            position = byte_offset
+            for line, position in iter_corpus_lines(f, byte_offset, self.config.max_corpus_line_bytes):
+                line_offset += 1
+                if skip_lines:
+                    skip_lines -= 1
+                    continue
+                if line_offset % self.config.throttle_slice_lines == 0:
+                    self._yield_to_traffic()
+                slice_lines += 1
+                if not self._new_content(seen, [line]):
+                    continue
                 
-                if existing:
-                    # Actualizar frecuencia
-                    conn.execute(
-                        "UPDATE vocabulary SET frequency = frequency + 1, last_used = ? WHERE word = ?",
-                        (datetime.now().isoformat(), word)
-                    )
-                else:
-                    # Insertar nueva palabra
-                    conn.execute("""
-                        INSERT INTO vocabulary (word, frequency, contexts, learned_date, last_used, category, source)
-                        VALUES (?, 1, ?, ?, ?, ?, ?)
-                    """, (word, json.dumps([source]), datetime.now().isoformat(),
-                          datetime.now().isoformat(), self._categorize_word(word), source))
+                for word in CORPUS_WORD_PATTERN.findall(line.lower()):
+                    if len(word) >= 3:
+                        batch[word] += 1
+                        words_learned += 1
                 
-                return True
+                if len(batch) >= self.config.corpus_batch_size:
+                    self._record_phase("tokenize", time.perf_counter() - slice_start, slice_lines)
+                    self._save_corpus_batch(batch, source, url, position, line_offset, False, content_hash,
+                                            seen=seen)
+                    batch = Counter()
+                    seen = self._seen_batch()
+                    slice_start = time.perf_counter()
+                    slice_lines = 0
                 
-        except Exception as e:
-            logger.error(f"Error aprendiendo palabra '{word}': {e}")
-            return False
+                if (word_limit and words_learned >= word_limit) or self._deadline_passed():
+                    completed = position >= os.fstat(f.fileno()).st_size
+                    break
+        
+        self._record_phase("tokenize", time.perf_counter() - slice_start, slice_lines)
+        self._save_corpus_batch(batch, source, url, position, line_offset, completed, content_hash, seen=seen)
+        logger.info(f"Corpus {url}: {words_learned} palabras (byte {position}, línea {line_offset})")
+        return {"words_learned": words_learned, "byte_offset": position,
+                "line_offset": line_offset, "completed": completed, "skipped": False}
     
-    def _learn_expression(self, expression: str, source: str) -> bool:
-        """Aprender una expresión"""
+    def _ingest_sharded(self, url: str, cache_file: Path, source: str, content_hash: Optional[str]) -> Dict:
+        """
+        Ingesta map-reduce de un corpus grande leído desde el principio.
+        
+        El archivo se divide en fragmentos alineados a líneas; un
+        ProcessPoolExecutor tokeniza, cuenta y categoriza cada uno fuera del GIL
+        del servidor, los conteos parciales se suman en orden y el resultado se
+        escribe con una sola inserción masiva. Cada proceso recibe una copia
+        del filtro de contenido visto y omite las líneas ya aprendidas; los
+        hashes de las nuevas se marcan con la escritura (una línea repetida
+        en dos fragmentos cuenta en ambos). Aquí no se aplica el límite de
+        palabras por sesión. Si vence el plazo de la fuente solo se escribe el
+        prefijo de fragmentos terminados y la siguiente sesión continúa desde su
+        último byte.
+        """
+        path = str(cache_file)
+        max_line = self.config.max_corpus_line_bytes
+        boundaries = shard_boundaries(path, self.config.shard_size_bytes, max_line)
+        counts = Counter()
+        categories: Dict[str, str] = {}
+        position = 0
+        lines = 0
+        completed = True
+        seen = self._seen_batch()
+        tokenize_start = time.perf_counter()
+        
+        pool = ProcessPoolExecutor(max_workers=self.config.shard_workers or None,
+                                   mp_context=shard_process_context(), initializer=init_shard_worker,
+                                   initargs=(self.seen_content.snapshot() if seen is not None else None,))
         try:
-            expression = expression.strip()
-            if len(expression) < 5:
-                return False
+            futures = [pool.submit(count_corpus_shard, path, start, end, max_line)
+                       for start, end in zip(boundaries, boundaries[1:])]
             
-            with sqlite3.connect(self.db_path) as conn:
-                # Verificar si ya existe
-                existing = conn.execute(
-                    "SELECT frequency FROM expressions WHERE expression = ?", 
-                    (expression,)
+            for future, end in zip(futures, boundaries[1:]):
+                self._yield_to_traffic()
+                try:
+                    shard_counts, shard_categories, shard_lines, shard_digests = self._wait_before_deadline(future)
+                except FutureTimeoutError:
+                    completed = False
+                    break
+                counts.update(shard_counts)
+                categories.update(shard_categories)
+                position = end
+                lines += shard_lines
+                if seen is not None:
+                    seen.stage_packed(shard_digests, shard_lines)
+        finally:
+            pool.shutdown(wait=completed, cancel_futures=True)
+        self._record_phase("tokenize", time.perf_counter() - tokenize_start, lines)
+        
+        self._save_corpus_batch(counts, source, url, position, lines, completed, content_hash, categories,
+                                seen=seen)
+        words_learned = sum(counts.values())
+        logger.info(f"Corpus {url}: {words_learned} palabras en {len(boundaries) - 1} fragmentos "
+                    f"(byte {position}, línea {lines})")
+        return {"words_learned": words_learned, "byte_offset": position, "line_offset": lines,
+                "completed": completed, "skipped": False, "shards": len(boundaries) - 1}
+    
+    def _load_corpus_position(self, url: str, content_hash: Optional[str]) -> Optional[tuple]:
+        """
+        Posición desde la que continuar un corpus, o None si ya se leyó
+        completo con el mismo contenido
+        """
+        try:
+            with self.store.connection() as conn:
+                row = conn.execute(
+                    "SELECT byte_offset, line_offset, completed, content_hash FROM corpus_ingest_state WHERE url = ?",
+                    (url,)
                 ).fetchone()
-                
-                if existing:
-                    # Actualizar frecuencia
-                    conn.execute(
-                        "UPDATE expressions SET frequency = frequency + 1, last_used = ? WHERE expression = ?",
-                        (datetime.now().isoformat(), expression)
-                    )
-                else:
-                    # Insertar nueva expresión
-                    conn.execute("""
-                        INSERT INTO expressions (expression, frequency, contexts, learned_date, last_used, source)
-                        VALUES (?, 1, ?, ?, ?, ?)
-                    """, (expression, json.dumps([source]), datetime.now().isoformat(),
-                          datetime.now().isoformat(), source))
-                
-                return True
-                
         except Exception as e:
-            logger.error(f"Error aprendiendo expresión '{expression}': {e}")
-            return False
-    
-    def _categorize_word(self, word: str) -> str:
-        """Categorizar una palabra"""
-        business_keywords = [
-            "consulta", "cita", "pedido", "factura", "pago", "servicio",
-            "producto", "precio", "descuento", "garantía", "devolución",
-            "cliente", "atención", "soporte", "problema", "solución",
-            "urgente", "importante", "especial", "personalizado"
-        ]
+            logger.warning(f"No se pudo leer la posición del corpus {url}: {e}")
+            row = None
         
-        if word in business_keywords:
-            return "business"
-        elif any(keyword in word for keyword in ["ayuda", "soporte", "atención"]):
-            return "customer_service"
-        elif any(keyword in word for keyword in ["hora", "día", "semana", "mes"]):
-            return "time"
-        elif any(keyword in word for keyword in ["gracias", "por favor", "disculpa"]):
-            return "emotion"
-        elif any(keyword in word for keyword in ["sistema", "error", "problema", "funcionar"]):
-            return "technical"
-        else:
-            return "general"
+        if not row or row[3] != content_hash:
+            return 0, 0
+        if row[2]:
+            return None
+        return row[0], row[1]
     
-    def _extract_words_from_json(self, data) -> List[str]:
-        """Extraer palabras de datos JSON"""
-        words = []
+    def _save_corpus_batch(self, counts: Counter, source: str, url: str, byte_offset: int,
+                           line_offset: int, completed: bool, content_hash: Optional[str],
+                           categories: Optional[Dict[str, str]] = None,
+                           seen: Optional[SeenContentBatch] = None):
+        """Escribir un lote de palabras y la posición alcanzada en una sola transacción"""
+        categories = self._categorize_counts(counts, categories)
+        
+        def save(conn):
+            new_words = self._upsert_word_counts(conn, counts, source, categories)
+            conn.execute("""
+                INSERT INTO corpus_ingest_state
+                (url, byte_offset, line_offset, completed, updated_at, content_hash)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    byte_offset = excluded.byte_offset,
+                    line_offset = excluded.line_offset,
+                    completed = excluded.completed,
+                    updated_at = excluded.updated_at,
+                    content_hash = excluded.content_hash
+            """, (url, byte_offset, line_offset, int(completed), datetime.now().isoformat(), content_hash))
+            return new_words
+        
+        new_words = self._write(save, rows=len(counts), seen=seen)
+        self._report_progress(f"{url}@{byte_offset}", sum(counts.values()), new_words=new_words)
+    
+    def _upsert_word_counts(self, conn: sqlite3.Connection, counts: Counter, source: str,
+                            categories: Optional[Dict[str, str]] = None) -> int:
+        """
+        Inserción masiva: palabras nuevas con su conteo, existentes suman
+        frecuencia; devuelve cuántas palabras no existían
+        """
+        return self.store.upsert_words(counts, source, categories=categories, categorize=categorize_word, conn=conn)
+    
+    def _upsert_expression_counts(self, conn: sqlite3.Connection, counts: Counter, source: str):
+        """Inserción masiva de expresiones con la misma semántica que las palabras"""
+        self.store.upsert_expressions(counts, source, conn=conn)
+    
+    def _extract_texts_from_json(self, data) -> List[str]:
+        """Claves y valores de texto de datos JSON, en orden"""
+        texts = []
         
         def extract_from_obj(obj):
             if isinstance(obj, dict):
                 for key, value in obj.items():
-                    words.extend(str(key).lower().split())
+                    texts.append(str(key))
                     extract_from_obj(value)
             elif isinstance(obj, list):
                 for item in obj:
                     extract_from_obj(item)
             elif isinstance(obj, str):
-                words.extend(obj.lower().split())
+                texts.append(obj)
         
         extract_from_obj(data)
-        return list(set(words))  # Eliminar duplicados
+        return texts
     
     def _generate_synthetic_messages(self) -> List[str]:
         """Generar mensajes sintéticos adicionales"""
@@ -400,52 +1055,126 @@ class AutoVocabularyLearner:
         
         return messages
     
-    def _log_learning_session(self, source: str, words_learned: int, expressions_learned: int):
+    async def _log_learning_session(self, source: str, words_learned: int, expressions_learned: int):
         """Registrar sesión de aprendizaje"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute("""
-                    INSERT INTO auto_learning_log (source, words_learned, expressions_learned, learning_date)
-                    VALUES (?, ?, ?, ?)
-                """, (source, words_learned, expressions_learned, datetime.now().isoformat()))
+            await self._awrite(lambda conn: conn.execute("""
+                INSERT INTO auto_learning_log (source, words_learned, expressions_learned, learning_date)
+                VALUES (?, ?, ?, ?)
+            """, (source, words_learned, expressions_learned, datetime.now().isoformat())))
         except Exception as e:
             logger.error(f"Error registrando sesión de aprendizaje: {e}")
     
     async def run_full_learning_session(self) -> Dict:
-        """Ejecutar sesión completa de aprendizaje automático"""
+        """
+        Ejecutar sesión completa de aprendizaje automático.
+        
+        Las fuentes corren a la vez, cada una con su plazo; la tokenización va al
+        pool de trabajo y todas las escrituras pasan por un único escritor por
+        lotes. El resultado incluye la duración de cada fuente.
+        """
         logger.info("Iniciando sesión de aprendizaje automático...")
         
+        # Aprender desde todas las fuentes
+        return await self.run_sources([
+            ("text_files", self.learn_from_text_files),
+            ("api_data", self.learn_from_api_data),
+            ("synthetic_data", self.learn_from_synthetic_data),
+            ("spanish_corpus", self.learn_from_spanish_corpus)
+        ])
+    
+    async def run_sources(self, sources: List[Tuple[str, Callable[[], Awaitable[Dict]]]],
+                          deadline: Optional[float] = None,
+                          stop: Optional[threading.Event] = None,
+                          progress: Optional[Callable[..., None]] = None,
+                          metrics: Optional[PhaseMetrics] = None) -> Dict:
+        """
+        Ejecutar varias fuentes a la vez bajo un plazo común opcional.
+        
+        `deadline` (time.monotonic) acota el plazo de cada fuente: al llegar,
+        las fuentes dejan de leer y confirman lo ya contado (compromiso parcial,
+        reanudable en la próxima sesión); tras el margen de gracia se cancelan.
+        `stop` tiene el mismo efecto inmediato cuando se activa. `progress`
+        recibe (fuente, cursor, palabras, expresiones, estado, segundos de CPU,
+        palabras nuevas) tras cada lote confirmado, tras cada trabajo en el pool y al terminar
+        cada fuente, para guardar puntos de control. `metrics`
+        (learning_metrics.PhaseMetrics) recibe la duración, filas y errores de
+        cada fase de cada fuente.
+        """
+        session_start = time.perf_counter()
+        
         results = {
             "total_words_learned": 0,
             "total_expressions_learned": 0,
-            "sources": {}
+            "sources": {},
+            "timings": {}
         }
         
-        # Aprender desde todas las fuentes
-        sources = [
-            ("text_files", self.learn_from_text_files()),
-            ("api_data", self.learn_from_api_data()),
-            ("synthetic_data", self.learn_from_synthetic_data()),
-            ("spanish_corpus", self.learn_from_spanish_corpus())
-        ]
+        writer_before = dict(self.store.writer.stats)
+        # Las tareas de gather copian el contexto: heredan plazo y parada
+        deadline_token = _SOURCE_DEADLINE.set(deadline)
+        stop_token = _STOP_REQUESTED.set(stop)
+        progress_token = _SESSION_PROGRESS.set(progress)
+        metrics = metrics if metrics is not None else PhaseMetrics()
+        metrics_token = _SESSION_METRICS.set(metrics)
+        try:
+            outcomes = await asyncio.gather(*(self._run_source(name, learn) for name, learn in sources))
+            # Lo encolado por las fuentes queda confirmado antes de responder
+            await asyncio.wrap_future(self.store.flush())
+        finally:
+            _SOURCE_DEADLINE.reset(deadline_token)
+            _STOP_REQUESTED.reset(stop_token)
+            _SESSION_PROGRESS.reset(progress_token)
+            _SESSION_METRICS.reset(metrics_token)
+            await self.close()
         
-        for source_name, coro in sources:
-            try:
-                result = await coro
-                results["sources"][source_name] = result
-                results["total_words_learned"] += result.get("words_learned", 0)
-                results["total_expressions_learned"] += result.get("expressions_learned", 0)
-            except Exception as e:
-                logger.error(f"Error en fuente {source_name}: {e}")
-                results["sources"][source_name] = {"status": "error", "error": str(e)}
+        for source_name, result in outcomes:
+            results["sources"][source_name] = result
+            results["timings"][source_name] = result["duration_seconds"]
+            results["total_words_learned"] += result.get("words_learned", 0)
+            results["total_expressions_learned"] += result.get("expressions_learned", 0)
+        
+        results["timings"]["session"] = round(time.perf_counter() - session_start, 3)
+        results["phases"] = metrics.summary()
+        results["writer"] = {key: value - writer_before.get(key, 0)
+                             for key, value in self.store.writer.stats.items()}
         
         logger.info(f"Sesión de aprendizaje completada. Palabras aprendidas: {results['total_words_learned']}")
         return results
     
+    async def _run_source(self, source_name: str, learn) -> tuple:
+        """Ejecutar una fuente con su plazo y medir cuánto tarda"""
+        # Cada fuente corre en su propia tarea: el nombre no se mezcla con las demás
+        _SOURCE_NAME.set(source_name)
+        deadline = _SOURCE_DEADLINE.get()
+        source_seconds = self.config.source_deadlines.get(source_name)
+        if source_seconds:
+            source_deadline = time.monotonic() + source_seconds
+            deadline = source_deadline if deadline is None else min(deadline, source_deadline)
+        timeout = None
+        if deadline is not None:
+            # La fuente deja de leer en el plazo; el margen permite confirmar su último lote
+            _SOURCE_DEADLINE.set(deadline)
+            timeout = max(0.0, deadline - time.monotonic()) + self.config.source_deadline_grace_seconds
+        
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(learn(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Fuente {source_name} cancelada tras {timeout:.0f}s")
+            result = {"status": "timeout", "words_learned": 0}
+        except Exception as e:
+            logger.error(f"Error en fuente {source_name}: {e}")
+            result = {"status": "error", "error": str(e)}
+        
+        result["duration_seconds"] = round(time.perf_counter() - start, 3)
+        self._report_progress(status=result.get("status", "success"))
+        return source_name, result
+    
     def get_learning_stats(self) -> Dict:
         """Obtener estadísticas de aprendizaje automático"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.store.connection() as conn:
                 # Estadísticas generales
                 total_sessions = conn.execute("SELECT COUNT(*) FROM auto_learning_log").fetchone()[0]
                 total_words = conn.execute("SELECT SUM(words_learned) FROM auto_learning_log").fetchone()[0] or 0
@@ -486,7 +1215,8 @@ class AutoVocabularyLearner:
                             "total_expressions": total_expressions
                         }
                         for source, sessions, total_words, total_expressions in source_stats
-                    }
+                    },
+                    "seen_content": self.seen_content.get_stats()
                 }
                 
         except Exception as e:
@@ -0,0 +1,173 @@
+"""
+Modelo de contexto por bigramas para el corrector ortográfico
+Se construye de forma incremental a partir de la tabla de conversaciones
+"""
+
+import re
+import sqlite3
+import logging
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Palabras tal como se cuentan en el modelo
+WORD_PATTERN = re.compile(r'[a-záéíóúñü]+')
+
+
+class BigramContextModel:
+    """
+    Conteos de unigramas y bigramas con claves enteras.
+
+    Cada palabra recibe un id entero; los unigramas se guardan en un array
+    indexado por id. Los bigramas, con clave (id_anterior << 32) | id_siguiente,
+    se guardan en dos arrays paralelos ordenados por clave (bigram_keys y
+    bigram_counts) y se buscan por bisección. Las actualizaciones se acumulan
+    en un diccionario pequeño que se mezcla en los arrays cuando crece más de
+    `merge_threshold` o de una cuarta parte de los bigramas ya guardados.
+    """
+
+    def __init__(self, db_path: str = "chatbot_optimized.db", smoothing: float = 0.1,
+                 merge_threshold: int = 4096):
+        self.db_path = db_path
+        self.smoothing = smoothing
+        self.merge_threshold = merge_threshold
+        self.word_ids: Dict[str, int] = {}
+        self.unigram_counts = array('L')
+        self.bigram_keys = array('Q')
+        self.bigram_counts = array('L')
+        self._pending_bigrams: Dict[int, int] = {}
+        self.total_tokens = 0
+        self._conversations_watermark = 0
+        self._lock = threading.Lock()
+
+    def refresh(self) -> int:
+        """Incorporar los mensajes guardados desde la última lectura"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                rows = conn.execute("""
+                    SELECT id, message
+                    FROM conversations
+                    WHERE id > ?
+                    ORDER BY id
+                """, (self._conversations_watermark,)).fetchall()
+        except Exception as e:
+            logger.debug(f"No se pudo leer conversaciones para el modelo de contexto: {e}")
+            return 0
+
+        for row_id, message in rows:
+            self.add_text(message or "")
+            self._conversations_watermark = row_id
+
+        return len(rows)
+
+    def add_text(self, text: str):
+        """Actualizar los conteos con un texto"""
+        self.add_words(WORD_PATTERN.findall(text.lower()))
+
+    def add_words(self, words: Iterable[str]):
+        """Actualizar los conteos con una secuencia de palabras ya normalizadas"""
+        with self._lock:
+            previous_id = None
+            for word in words:
+                word_id = self._word_id(word)
+                self.unigram_counts[word_id] += 1
+                self.total_tokens += 1
+                if previous_id is not None:
+                    key = (previous_id << 32) | word_id
+                    self._pending_bigrams[key] = self._pending_bigrams.get(key, 0) + 1
+                previous_id = word_id
+            if len(self._pending_bigrams) >= max(self.merge_threshold, len(self.bigram_keys) // 4):
+                self._merge_pending()
+
+    def likelihood(self, word: str, previous: Optional[str] = None,
+                   following: Optional[str] = None) -> float:
+        """P(word | previous) * P(following | word) con suavizado aditivo"""
+        with self._lock:
+            return self._likelihood(word, previous, following)
+
+    def _likelihood(self, word: str, previous: Optional[str], following: Optional[str]) -> float:
+        vocabulary_size = len(self.word_ids) + 1
+        word_id = self.word_ids.get(word)
+        word_count = self.unigram_counts[word_id] if word_id is not None else 0
+        probability = 1.0
+
+        if previous is not None:
+            previous_id = self.word_ids.get(previous)
+            previous_count = self.unigram_counts[previous_id] if previous_id is not None else 0
+            pair_count = self._bigram(previous_id, word_id)
+            probability *= (pair_count + self.smoothing) / (previous_count + self.smoothing * vocabulary_size)
+
+        if following is not None:
+            following_id = self.word_ids.get(following)
+            pair_count = self._bigram(word_id, following_id)
+            probability *= (pair_count + self.smoothing) / (word_count + self.smoothing * vocabulary_size)
+
+        return probability
+
+    def context_scores(self, candidates: List[str], previous: Optional[str] = None,
+                       following: Optional[str] = None) -> Optional[Dict[str, float]]:
+        """Probabilidad de contexto normalizada entre candidatos (None si no hay contexto útil)"""
+        if not self.total_tokens or (previous is None and following is None):
+            return None
+
+        likelihoods = {c: self.likelihood(c, previous, following) for c in candidates}
+        total = sum(likelihoods.values())
+        if not total:
+            return None
+        return {candidate: value / total for candidate, value in likelihoods.items()}
+
+    def get_stats(self) -> Dict:
+        """Obtener tamaño del modelo"""
+        with self._lock:
+            self._merge_pending()
+        return {
+            'words': len(self.word_ids),
+            'bigrams': len(self.bigram_keys),
+            'tokens': self.total_tokens,
+            'conversations_watermark': self._conversations_watermark
+        }
+
+    def _word_id(self, word: str) -> int:
+        """Id entero de una palabra, asignando uno nuevo si hace falta"""
+        word_id = self.word_ids.get(word)
+        if word_id is None:
+            word_id = len(self.word_ids)
+            self.word_ids[word] = word_id
+            self.unigram_counts.append(0)
+        return word_id
+
+    def _bigram(self, first_id: Optional[int], second_id: Optional[int]) -> int:
+        """Conteo del bigrama (first, second): el de los arrays más el pendiente de mezclar"""
+        if first_id is None or second_id is None:
+            return 0
+        key = (first_id << 32) | second_id
+        count = self._pending_bigrams.get(key, 0)
+        index = bisect_left(self.bigram_keys, key)
+        if index < len(self.bigram_keys) and self.bigram_keys[index] == key:
+            count += self.bigram_counts[index]
+        return count
+
+    def _merge_pending(self):
+        """Mezclar los bigramas pendientes en los arrays ordenados (una pasada lineal)"""
+        if not self._pending_bigrams:
+            return
+        keys, counts = self.bigram_keys, self.bigram_counts
+        merged_keys, merged_counts = array('Q'), array('L')
+        position = 0
+        for key, count in sorted(self._pending_bigrams.items()):
+            index = bisect_left(keys, key, position)
+            merged_keys.extend(keys[position:index])
+            merged_counts.extend(counts[position:index])
+            if index < len(keys) and keys[index] == key:
+                count += counts[index]
+                index += 1
+            merged_keys.append(key)
+            merged_counts.append(count)
+            position = index
+        merged_keys.extend(keys[position:])
+        merged_counts.extend(counts[position:])
+        self.bigram_keys, self.bigram_counts = merged_keys, merged_counts
+        self._pending_bigrams.clear()
@@ -4,34 +4,82 @@ Sistema de Aprendizaje Continuo
 Ejecuta el entrenamiento automático en segundo plano de forma continua
 """
 import asyncio
+import os
 import threading
 import time
 import logging
-import sqlite3
-import requests
 import random
+import sqlite3
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 from dataclasses import dataclass
+from adaptive_schedule import MIGRATIONS as SCHEDULE_MIGRATIONS, AdaptiveSchedule
 from auto_learning import AutoVocabularyLearner, AutoLearningConfig
+from learning_events import LEARNING_STATE, SESSION_ENDED, SESSION_PROGRESS, SESSION_STARTED, STATS_DELTA
+from learning_metrics import MIGRATIONS as METRICS_MIGRATIONS, PhaseMetrics, phase_histograms
+from session_checkpoints import MIGRATIONS as CHECKPOINT_MIGRATIONS
+from session_checkpoints import FINISHED_SOURCE_STATUSES, SessionCheckpointer, recover_stale_sessions
+from vocabulary_store import get_store
 
-# Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('continuous_learning.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
+
+def configure_logging():
+    """
+    Registro en consola y en continuous_learning.log. Lo llama el proceso que
+    ejecuta el aprendizaje, no quien solo importa el módulo (el servidor)
+    """
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('continuous_learning.log'),
+            logging.StreamHandler()
+        ]
+    )
+
+
+def _migration_continuous_learning(conn: sqlite3.Connection):
+    """Registro de sesiones del aprendizaje continuo"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS continuous_learning_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_start TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            session_end TIMESTAMP,
+            words_learned INTEGER DEFAULT 0,
+            expressions_learned INTEGER DEFAULT 0,
+            source_type TEXT,
+            duration_seconds REAL,
+            status TEXT DEFAULT 'completed',
+            error_message TEXT
+        )
+    """)
+
+
+# Registro de sesiones y, detrás, las tablas y columnas que le añaden los demás módulos
+MIGRATIONS = [_migration_continuous_learning, *CHECKPOINT_MIGRATIONS, *SCHEDULE_MIGRATIONS, *METRICS_MIGRATIONS]
+
 @dataclass
 class ContinuousLearningConfig:
     """Configuración del aprendizaje continuo"""
     # Intervalos de entrenamiento
     training_interval_minutes: int = 30  # Cada 30 minutos
-    max_training_time_minutes: int = 10  # Máximo 10 minutos por sesión
+    max_training_time_minutes: float = 10  # Máximo 10 minutos por sesión (plazo estricto)
+    start_jitter_seconds: float = 60.0  # Retraso aleatorio máximo de cada inicio
+    checkpoint_interval_seconds: float = 15.0  # Cada cuánto se guarda el avance de la sesión
+    stale_session_seconds: float = 120.0  # Sin latido durante este tiempo, una sesión se da por abortada
+    
+    # Intervalo adaptativo: se alarga si las sesiones aportan poco y se acorta si aparece contenido nuevo
+    adaptive_interval: bool = True
+    min_interval_minutes: float = 10
+    max_interval_minutes: float = 240
+    interval_step_factor: float = 1.5
+    low_yield_new_words: int = 10  # Media de palabras nuevas por sesión por debajo de la cual se alarga
+    high_yield_new_words: int = 200  # Media por encima de la cual se acorta
+    yield_window: int = 3  # Sesiones (o ejecuciones de una fuente) que se promedian
+    min_source_words_per_cpu_second: float = 1.0  # Por debajo, la fuente se salta un tiempo
+    source_cooldown_sessions: int = 4  # Sesiones que se salta una fuente de bajo rendimiento
+    metrics_window_sessions: int = 20  # Sesiones que se agregan en los histogramas por fase
     
     # Fuentes de aprendizaje
     enable_text_files: bool = True
@@ -69,6 +117,15 @@ class ContinuousLearningSystem:
         self.auto_learner = AutoVocabularyLearner(self.config.db_path)
         self.is_running = False
         self.last_training = None
+        self.next_run_at: Optional[datetime] = None
+        self._session_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._scheduler_task: Optional[asyncio.Task] = None
+        # Aviso opcional al terminar una sesión que escribió vocabulario
+        self.on_session_end: Optional[Callable[[Dict], None]] = None
+        # Aviso opcional de cada evento de aprendizaje {"event": tipo, ...} (inicio, avance, fin...)
+        self.on_event: Optional[Callable[[Dict], None]] = None
         self.training_stats = {
             'total_sessions': 0,
             'total_words_learned': 0,
@@ -76,29 +133,9 @@ class ContinuousLearningSystem:
             'last_session_time': None,
             'errors': 0
         }
-        self._init_database()
-    
-    def _init_database(self):
-        """Inicializar tabla para seguimiento del aprendizaje continuo"""
-        try:
-            with sqlite3.connect(self.config.db_path) as conn:
-                conn.execute("""
-                    CREATE TABLE IF NOT EXISTS continuous_learning_log (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        session_start TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        session_end TIMESTAMP,
-                        words_learned INTEGER DEFAULT 0,
-                        expressions_learned INTEGER DEFAULT 0,
-                        source_type TEXT,
-                        duration_seconds REAL,
-                        status TEXT DEFAULT 'completed',
-                        error_message TEXT
-                    )
-                """)
-                conn.commit()
-                logger.info("Base de datos de aprendizaje continuo inicializada")
-        except Exception as e:
-            logger.error(f"Error inicializando base de datos: {e}")
+        self.store = get_store(self.config.db_path)
+        self.store.migrate(MIGRATIONS)
+        self.schedule = AdaptiveSchedule(self.store, self.config)
     
     def start_continuous_learning(self):
         """Iniciar el aprendizaje continuo en segundo plano"""
@@ -109,193 +146,327 @@ class ContinuousLearningSystem:
         self.is_running = True
         logger.info("🚀 Iniciando sistema de aprendizaje continuo...")
         
-        # Ejecutar en un hilo separado
+        # El planificador corre en su propio bucle de eventos, en un hilo aparte;
+        # cada arranque tiene su evento de parada para no reactivar sesiones viejas
+        self._stop_event = threading.Event()
+        self._loop = asyncio.new_event_loop()
+        self._scheduler_task = None
+        scheduler_ready = threading.Event()
         self.learning_thread = threading.Thread(
-            target=self._continuous_learning_loop,
+            target=self._run_scheduler_loop,
+            args=(self._loop, self._stop_event, scheduler_ready),
+            name="continuous-learning",
             daemon=True
         )
         self.learning_thread.start()
+        scheduler_ready.wait()
+        self._emit_state()
         
         logger.info(f"✅ Aprendizaje continuo iniciado (intervalo: {self.config.training_interval_minutes} minutos)")
     
     def stop_continuous_learning(self):
-        """Detener el aprendizaje continuo"""
+        """Detener el aprendizaje continuo (también la sesión en curso, conservando lo ya escrito)"""
+        if not self.is_running:
+            return
+        
         self.is_running = False
+        self.next_run_at = None
+        self._stop_event.set()
+        try:
+            # Cancelar la espera o la sesión en curso sin esperar al intervalo
+            self._loop.call_soon_threadsafe(self._scheduler_task.cancel)
+        except (AttributeError, RuntimeError):
+            pass  # El planificador ya terminó
+        self._emit_state()
         logger.info("🛑 Deteniendo sistema de aprendizaje continuo...")
     
-    def _continuous_learning_loop(self):
+    def _run_scheduler_loop(self, loop: asyncio.AbstractEventLoop, stop: threading.Event,
+                            ready: threading.Event):
+        """Hilo del planificador: ejecuta el bucle de eventos hasta que se detenga"""
+        asyncio.set_event_loop(loop)
+        try:
+            self._scheduler_task = loop.create_task(self._continuous_learning_loop(stop))
+            ready.set()
+            loop.run_until_complete(self._scheduler_task)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Error en el planificador de aprendizaje continuo: {e}")
+        finally:
+            ready.set()
+            loop.close()
+            logger.info("🛑 Planificador de aprendizaje continuo detenido")
+    
+    async def _continuous_learning_loop(self, stop: threading.Event):
         """Bucle principal del aprendizaje continuo"""
-        while self.is_running:
+        # El primer inicio también lleva variación para no coincidir con otros procesos
+        delay = self._jitter()
+        while not stop.is_set():
+            self.next_run_at = datetime.now() + timedelta(seconds=delay)
+            logger.info(f"⏰ Próxima sesión en {delay / 60:.1f} minutos ({self.next_run_at:%H:%M:%S})")
+            self._emit_state()
+            await asyncio.sleep(delay)
+            self.next_run_at = None
+            
+            session_started = time.monotonic()
             try:
-                # Ejecutar sesión de entrenamiento
-                self._run_training_session()
-                
-                # Esperar hasta la próxima sesión
-                logger.info(f"⏰ Esperando {self.config.training_interval_minutes} minutos hasta la próxima sesión...")
-                time.sleep(self.config.training_interval_minutes * 60)
-                
+                await self._run_training_session(stop)
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logger.error(f"Error en bucle de aprendizaje continuo: {e}")
                 self.training_stats['errors'] += 1
-                time.sleep(60)  # Esperar 1 minuto antes de reintentar
+            
+            # Intervalo medido desde el inicio de la sesión; si se pasó, la siguiente va enseguida
+            interval = await asyncio.to_thread(self._next_interval_seconds)
+            delay = max(0.0, session_started + interval - time.monotonic()) + self._jitter()
+    
+    def _next_interval_seconds(self) -> float:
+        """Intervalo hasta la próxima sesión (adaptativo salvo que se desactive)"""
+        try:
+            return self.schedule.next_interval_minutes() * 60
+        except Exception as e:
+            logger.error(f"Error calculando el intervalo adaptativo: {e}")
+            return self.config.training_interval_minutes * 60
+    
+    def _paused_sources(self) -> Dict[str, int]:
+        """Fuentes de bajo rendimiento que esta sesión se salta"""
+        try:
+            return self.schedule.paused_sources()
+        except Exception as e:
+            logger.error(f"Error calculando el rendimiento por fuente: {e}")
+            return {}
     
-    def _run_training_session(self):
-        """Ejecutar una sesión de entrenamiento"""
+    def _jitter(self) -> float:
+        """Retraso aleatorio añadido a cada inicio de sesión"""
+        return random.uniform(0, self.config.start_jitter_seconds)
+    
+    async def _run_training_session(self, stop: Optional[threading.Event] = None):
+        """
+        Ejecutar una sesión de entrenamiento con plazo estricto.
+        
+        Al agotar max_training_time_minutes (o al detener el sistema) las fuentes
+        dejan de leer y confirman lo ya contado; la sesión queda registrada como
+        'partial' o 'stopped' y las fuentes reanudables continúan en la siguiente.
+        """
+        # Nunca dos sesiones a la vez, aunque se reinicie el planificador con una en curso
+        if not self._session_lock.acquire(blocking=False):
+            logger.warning("Sesión anterior aún en curso; se omite esta ejecución")
+            return
+        
         session_start = datetime.now()
         session_id = None
+        status = 'completed'
+        total_words = 0
+        total_expressions = 0
+        deadline = time.monotonic() + self.config.max_training_time_minutes * 60
+        heartbeat = None
+        checkpointer = None
+        new_words = None
         
         try:
             logger.info("🎯 Iniciando sesión de entrenamiento automático...")
             
-            # Registrar inicio de sesión
-            session_id = self._log_session_start(session_start)
-            
-            # Ejecutar diferentes fuentes de aprendizaje
-            total_words = 0
-            total_expressions = 0
-            
-            # 1. Aprendizaje de archivos de texto
-            if self.config.enable_text_files:
-                words, expressions = self._learn_from_text_files()
-                total_words += words
-                total_expressions += expressions
-            
-            # 2. Aprendizaje de APIs
-            if self.config.enable_api_learning:
-                words, expressions = self._learn_from_apis()
-                total_words += words
-                total_expressions += expressions
-            
-            # 3. Aprendizaje de datos sintéticos
-            if self.config.enable_synthetic_data:
-                words, expressions = self._learn_from_synthetic_data()
-                total_words += words
-                total_expressions += expressions
+            # Una sesión interrumpida (reinicio, caída) se cierra y se retoma con sus fuentes pendientes
+            resumed_from, finished_sources = await asyncio.to_thread(self._recover_interrupted_session)
+            paused = await asyncio.to_thread(self._paused_sources)
+            if paused:
+                logger.info(f"⏸️ Fuentes de bajo rendimiento en pausa: {paused}")
+            sources = [(name, learn) for name, learn in self._enabled_sources()
+                       if name not in finished_sources and name not in paused]
             
-            # 4. Aprendizaje de corpus español
-            if self.config.enable_spanish_corpus:
-                words, expressions = self._learn_from_spanish_corpus()
-                total_words += words
-                total_expressions += expressions
+            # Registrar inicio de sesión
+            session_id = await asyncio.to_thread(self._log_session_start, session_start, resumed_from)
+            checkpointer = SessionCheckpointer(
+                self.store, session_id, self.config.checkpoint_interval_seconds, metrics=PhaseMetrics(),
+                on_save=lambda progress: self._emit_progress(session_id, progress))
+            self._emit(SESSION_STARTED, session_id=session_id, resumed_from=resumed_from,
+                       sources=[name for name, _ in sources], started_at=session_start.isoformat())
+            heartbeat = asyncio.ensure_future(self._heartbeat(checkpointer))
             
-            # Actualizar estadísticas
-            self.training_stats['total_sessions'] += 1
-            self.training_stats['total_words_learned'] += total_words
-            self.training_stats['total_expressions_learned'] += total_expressions
-            self.training_stats['last_session_time'] = datetime.now()
-            self.last_training = datetime.now()
+            # Las fuentes pendientes corren a la vez bajo el plazo de la sesión
+            results = await self.auto_learner.run_sources(sources, deadline=deadline, stop=stop,
+                                                          progress=checkpointer.report,
+                                                          metrics=checkpointer.metrics)
+            total_words = results['total_words_learned']
+            total_expressions = results['total_expressions_learned']
+            # Solo las inserciones de esta sesión: otros procesos escriben vocabulario a la vez
+            new_words = checkpointer.new_words()
             
-            # Registrar fin de sesión
-            session_duration = (datetime.now() - session_start).total_seconds()
-            self._log_session_end(session_id, total_words, total_expressions, session_duration)
+            if stop is not None and stop.is_set():
+                status = 'stopped'
+            elif time.monotonic() >= deadline:
+                status = 'partial'
             
-            logger.info(f"✅ Sesión completada: {total_words} palabras, {total_expressions} expresiones")
+            logger.info(f"✅ Sesión {status}: {total_words} palabras, {total_expressions} expresiones")
             
+        except asyncio.CancelledError:
+            status = 'stopped'
+            logger.info("🛑 Sesión detenida; lo ya escrito se conserva")
+            raise
         except Exception as e:
+            status = 'error'
             logger.error(f"❌ Error en sesión de entrenamiento: {e}")
             if session_id:
                 self._log_session_error(session_id, str(e))
             self.training_stats['errors'] += 1
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
+            if checkpointer is not None:
+                # Últimos puntos de control y métricas antes del fin de sesión
+                checkpointer.save()
+            if status != 'error':
+                # Actualizar estadísticas
+                self.training_stats['total_sessions'] += 1
+                self.training_stats['total_words_learned'] += total_words
+                self.training_stats['total_expressions_learned'] += total_expressions
+                self.training_stats['last_session_time'] = datetime.now()
+                self.last_training = datetime.now()
+                
+                # Registrar fin de sesión (sin esperar: puede ejecutarse durante una cancelación)
+                if session_id:
+                    session_duration = (datetime.now() - session_start).total_seconds()
+                    self._log_session_end(session_id, total_words, total_expressions, session_duration,
+                                          status, wait=False, new_words=new_words)
+                if self.on_session_end is not None and (total_words or total_expressions):
+                    self._notify_session_end(session_id, status, total_words, total_expressions)
+            if session_id:
+                self._emit(SESSION_ENDED, session_id=session_id, status=status, words_learned=total_words,
+                           expressions_learned=total_expressions, new_words=new_words,
+                           duration_seconds=round((datetime.now() - session_start).total_seconds(), 3))
+                self._emit(STATS_DELTA, total_sessions=1, total_words_learned=total_words,
+                           total_expressions_learned=total_expressions,
+                           error_sessions=1 if status == 'error' else 0,
+                           last_training=self.last_training.isoformat() if self.last_training else None)
+            self._session_lock.release()
     
-    def _learn_from_text_files(self) -> tuple:
-        """Aprender de archivos de texto locales"""
-        words_learned = 0
-        expressions_learned = 0
-        
+    async def _heartbeat(self, checkpointer: SessionCheckpointer):
+        """Guardar el avance periódicamente aunque ninguna fuente confirme lotes"""
+        while True:
+            await asyncio.sleep(self.config.checkpoint_interval_seconds)
+            checkpointer.save()
+    
+    def _recover_interrupted_session(self) -> tuple:
+        """
+        Marcar como abortadas las sesiones abandonadas; devuelve (id de la más
+        reciente, fuentes que ya había terminado) para reanudarla, o (None, ())
+        """
         try:
-            # Archivos de vocabulario local
-            text_files = [
-                "learning_data/spanish_vocabulary.txt",
-                "learning_data/spanish_expressions.txt",
-                "learning_data/business_terms.txt",
-                "learning_data/customer_service.txt"
-            ]
-            
-            for file_path in text_files:
-                try:
-                    result = self.auto_learner.learn_from_text_file(file_path)
-                    words_learned += result.get('words', 0)
-                    expressions_learned += result.get('expressions', 0)
-                    logger.info(f"📄 Aprendido de {file_path}: {result.get('words', 0)} palabras")
-                except FileNotFoundError:
-                    logger.debug(f"Archivo no encontrado: {file_path}")
-                except Exception as e:
-                    logger.warning(f"Error leyendo {file_path}: {e}")
-            
+            recovered = recover_stale_sessions(self.store, self.config.stale_session_seconds)
         except Exception as e:
-            logger.error(f"Error en aprendizaje de archivos: {e}")
-        
-        return words_learned, expressions_learned
+            logger.error(f"Error recuperando sesiones interrumpidas: {e}")
+            return None, ()
+        if not recovered:
+            return None, ()
+        # Las palabras de las sesiones abortadas no se suman: el monitor las toma de la próxima instantánea
+        self._emit(STATS_DELTA, total_sessions=len(recovered), aborted_sessions=len(recovered))
+        session_id, sources = recovered[-1]
+        finished = {source for source, status in sources.items() if status in FINISHED_SOURCE_STATUSES}
+        logger.info(f"♻️ Reanudando la sesión {session_id}; se omiten las fuentes ya terminadas: {sorted(finished)}")
+        return session_id, finished
     
-    def _learn_from_apis(self) -> tuple:
-        """Aprender de APIs públicas"""
-        words_learned = 0
-        expressions_learned = 0
-        
+    def _notify_session_end(self, session_id: Optional[int], status: str, words: int, expressions: int):
+        """Avisar de una sesión que cambió el vocabulario (lo escrito ya está confirmado)"""
         try:
-            # APIs para obtener datos
-            api_sources = [
-                "https://jsonplaceholder.typicode.com/posts",
-                "https://jsonplaceholder.typicode.com/comments",
-                "https://api.github.com/repos/octocat/Hello-World/contents",
-                "https://httpbin.org/json"
-            ]
-            
-            for api_url in api_sources:
-                try:
-                    response = requests.get(api_url, timeout=self.config.api_timeout_seconds)
-                    if response.status_code == 200:
-                        result = self.auto_learner.learn_from_api_data(response.text)
-                        words_learned += result.get('words', 0)
-                        expressions_learned += result.get('expressions', 0)
-                        logger.info(f"🌐 Aprendido de API {api_url}: {result.get('words', 0)} palabras")
-                except Exception as e:
-                    logger.warning(f"Error con API {api_url}: {e}")
-            
+            self.on_session_end({
+                'session_id': session_id,
+                'status': status,
+                'words_learned': words,
+                'expressions_learned': expressions,
+                'vocabulary_seq': self.store.change_feed.latest_seq()
+            })
         except Exception as e:
-            logger.error(f"Error en aprendizaje de APIs: {e}")
-        
-        return words_learned, expressions_learned
+            logger.warning(f"No se pudo notificar el fin de sesión: {e}")
     
-    def _learn_from_synthetic_data(self) -> tuple:
-        """Aprender de datos sintéticos generados"""
-        words_learned = 0
-        expressions_learned = 0
-        
+    def _emit(self, event: str, **data):
+        """Avisar de un evento de aprendizaje si hay alguien escuchando"""
+        if self.on_event is None:
+            return
         try:
-            # Generar datos sintéticos
-            synthetic_data = self._generate_synthetic_data()
-            result = self.auto_learner.learn_from_synthetic_data(synthetic_data)
-            words_learned += result.get('words', 0)
-            expressions_learned += result.get('expressions', 0)
-            logger.info(f"🤖 Aprendido de datos sintéticos: {result.get('words', 0)} palabras")
-            
+            self.on_event({'event': event, **data})
         except Exception as e:
-            logger.error(f"Error en aprendizaje sintético: {e}")
-        
-        return words_learned, expressions_learned
+            logger.warning(f"No se pudo avisar del evento {event}: {e}")
+    
+    def _emit_state(self):
+        """Avisar de si el aprendizaje está activo y de cuándo es la próxima sesión"""
+        self._emit(LEARNING_STATE, is_running=self.is_running,
+                   next_training_at=self.next_run_at.isoformat() if self.next_run_at else None,
+                   next_training_in_minutes=self._get_next_training_time())
     
-    def _learn_from_spanish_corpus(self) -> tuple:
-        """Aprender de corpus español en línea"""
+    def _emit_progress(self, session_id: int, progress: Dict[str, Dict]):
+        """Avisar del avance confirmado de cada fuente de la sesión en curso"""
+        self._emit(SESSION_PROGRESS, session_id=session_id, sources=progress,
+                   words_learned=sum(entry['words_learned'] for entry in progress.values()),
+                   expressions_learned=sum(entry['expressions_learned'] for entry in progress.values()))
+    
+    def _enabled_sources(self) -> list:
+        """(nombre, corrutina) de las fuentes habilitadas en la configuración"""
+        sources = [
+            ("text_files", self.config.enable_text_files, self._learn_from_text_files),
+            ("api_data", self.config.enable_api_learning, self._learn_from_apis),
+            ("synthetic_data", self.config.enable_synthetic_data, self._learn_from_synthetic_data),
+            ("spanish_corpus", self.config.enable_spanish_corpus, self._learn_from_spanish_corpus)
+        ]
+        return [(name, learn) for name, enabled, learn in sources if enabled]
+    
+    async def _learn_from_text_files(self) -> Dict:
+        """Aprender de archivos de texto locales (solo lo añadido desde la última sesión)"""
         words_learned = 0
         expressions_learned = 0
         
-        try:
-            for corpus_url in self.config.spanish_corpus_urls:
-                try:
-                    response = requests.get(corpus_url, timeout=self.config.api_timeout_seconds)
-                    if response.status_code == 200:
-                        result = self.auto_learner.learn_from_spanish_corpus(response.text)
-                        words_learned += result.get('words', 0)
-                        expressions_learned += result.get('expressions', 0)
-                        logger.info(f"📚 Aprendido de corpus {corpus_url}: {result.get('words', 0)} palabras")
-                except Exception as e:
-                    logger.warning(f"Error con corpus {corpus_url}: {e}")
-            
-        except Exception as e:
-            logger.error(f"Error en aprendizaje de corpus: {e}")
+        # Archivos de vocabulario local
+        text_files = [
+            "learning_data/spanish_vocabulary.txt",
+            "learning_data/spanish_expressions.txt",
+            "learning_data/business_terms.txt",
+            "learning_data/customer_service.txt"
+        ]
+        
+        for file_path in text_files:
+            if self.auto_learner._deadline_passed():
+                break
+            try:
+                result = await self.auto_learner._run_in_pool(self.auto_learner.learn_from_text_file, file_path)
+                words_learned += result.get('words', 0)
+                expressions_learned += result.get('expressions', 0)
+                logger.info(f"📄 Aprendido de {file_path}: {result.get('words', 0)} palabras")
+            except FileNotFoundError:
+                logger.debug(f"Archivo no encontrado: {file_path}")
+            except Exception as e:
+                logger.warning(f"Error leyendo {file_path}: {e}")
+        
+        return {"status": "success", "words_learned": words_learned, "expressions_learned": expressions_learned}
+    
+    async def _learn_from_apis(self) -> Dict:
+        """Aprender de APIs públicas (las respuestas sin cambios se omiten)"""
+        # APIs para obtener datos
+        api_sources = [
+            "https://jsonplaceholder.typicode.com/posts",
+            "https://jsonplaceholder.typicode.com/comments",
+            "https://api.github.com/repos/octocat/Hello-World/contents",
+            "https://httpbin.org/json"
+        ]
         
-        return words_learned, expressions_learned
+        result = await self.auto_learner.learn_from_api_data(api_sources)
+        logger.info(f"🌐 Aprendido de APIs: {result.get('words_learned', 0)} palabras "
+                    f"({result.get('unchanged_sources', 0)} fuentes sin cambios)")
+        return result
+    
+    async def _learn_from_synthetic_data(self) -> Dict:
+        """Aprender de datos sintéticos generados"""
+        words_learned, expressions_learned = await self.auto_learner._run_in_pool(
+            self.auto_learner._learn_from_messages, self._generate_synthetic_data(), [], "synthetic_data"
+        )
+        logger.info(f"🤖 Aprendido de datos sintéticos: {words_learned} palabras")
+        return {"status": "success", "words_learned": words_learned, "expressions_learned": expressions_learned}
+    
+    async def _learn_from_spanish_corpus(self) -> Dict:
+        """Aprender de corpus español en línea (descarga en streaming y reanudable)"""
+        result = await self.auto_learner.learn_from_spanish_corpus(self.config.spanish_corpus_urls)
+        logger.info(f"📚 Aprendido de corpus español: {result.get('words_learned', 0)} palabras "
+                    f"({result.get('unchanged_sources', 0)} fuentes sin cambios)")
+        return result
     
     def _generate_synthetic_data(self) -> List[str]:
         """Generar datos sintéticos para entrenamiento"""
@@ -345,63 +516,61 @@ class ContinuousLearningSystem:
         
         return synthetic_messages
     
-    def _log_session_start(self, start_time: datetime) -> int:
-        """Registrar inicio de sesión"""
+    def _log_session_start(self, start_time: datetime, resumed_from: Optional[int] = None) -> int:
+        """Registrar inicio de sesión (con el proceso dueño y el primer latido)"""
         try:
-            with sqlite3.connect(self.config.db_path) as conn:
-                cursor = conn.execute("""
-                    INSERT INTO continuous_learning_log 
-                    (session_start, status) VALUES (?, 'running')
-                """, (start_time,))
-                conn.commit()
-                return cursor.lastrowid
+            return self.store.write(lambda conn: conn.execute("""
+                INSERT INTO continuous_learning_log 
+                (session_start, status, heartbeat_at, owner_pid, resumed_from) VALUES (?, 'running', ?, ?, ?)
+            """, (start_time, datetime.now().isoformat(), os.getpid(), resumed_from)).lastrowid).result()
         except Exception as e:
             logger.error(f"Error registrando inicio de sesión: {e}")
             return None
     
-    def _log_session_end(self, session_id: int, words: int, expressions: int, duration: float):
-        """Registrar fin de sesión"""
+    def _log_session_end(self, session_id: int, words: int, expressions: int, duration: float,
+                         status: str = 'completed', wait: bool = True, new_words: Optional[int] = None):
+        """Registrar fin de sesión ('completed', 'partial' si agotó el plazo o 'stopped')"""
         try:
-            with sqlite3.connect(self.config.db_path) as conn:
-                conn.execute("""
-                    UPDATE continuous_learning_log 
-                    SET session_end = CURRENT_TIMESTAMP,
-                        words_learned = ?,
-                        expressions_learned = ?,
-                        duration_seconds = ?,
-                        status = 'completed'
-                    WHERE id = ?
-                """, (words, expressions, duration, session_id))
-                conn.commit()
+            ack = self.store.write(lambda conn: conn.execute("""
+                UPDATE continuous_learning_log 
+                SET session_end = CURRENT_TIMESTAMP,
+                    words_learned = ?,
+                    expressions_learned = ?,
+                    duration_seconds = ?,
+                    status = ?,
+                    new_words = ?
+                WHERE id = ?
+            """, (words, expressions, duration, status, new_words, session_id)), description="fin de sesión")
+            if wait:
+                ack.result()
         except Exception as e:
             logger.error(f"Error registrando fin de sesión: {e}")
     
     def _log_session_error(self, session_id: int, error_message: str):
         """Registrar error de sesión"""
         try:
-            with sqlite3.connect(self.config.db_path) as conn:
-                conn.execute("""
-                    UPDATE continuous_learning_log 
-                    SET session_end = CURRENT_TIMESTAMP,
-                        status = 'error',
-                        error_message = ?
-                    WHERE id = ?
-                """, (error_message, session_id))
-                conn.commit()
+            self.store.write(lambda conn: conn.execute("""
+                UPDATE continuous_learning_log 
+                SET session_end = CURRENT_TIMESTAMP,
+                    status = 'error',
+                    error_message = ?
+                WHERE id = ?
+            """, (error_message, session_id))).result()
         except Exception as e:
             logger.error(f"Error registrando error de sesión: {e}")
     
     def get_learning_stats(self) -> Dict:
         """Obtener estadísticas del aprendizaje continuo"""
         try:
-            with sqlite3.connect(self.config.db_path) as conn:
+            with self.store.connection() as conn:
                 cursor = conn.execute("""
                     SELECT 
                         COUNT(*) as total_sessions,
                         SUM(words_learned) as total_words,
                         SUM(expressions_learned) as total_expressions,
                         AVG(duration_seconds) as avg_duration,
-                        COUNT(CASE WHEN status = 'error' THEN 1 END) as error_sessions
+                        COUNT(CASE WHEN status = 'error' THEN 1 END) as error_sessions,
+                        COUNT(CASE WHEN status = 'aborted' THEN 1 END) as aborted_sessions
                     FROM continuous_learning_log
                     WHERE session_end IS NOT NULL
                 """)
@@ -413,23 +582,47 @@ class ContinuousLearningSystem:
                     'total_expressions_learned': row[2] or 0,
                     'avg_duration_seconds': row[3] or 0,
                     'error_sessions': row[4] or 0,
+                    'aborted_sessions': row[5] or 0,
                     'is_running': self.is_running,
+                    'session_in_progress': self._session_lock.locked(),
                     'last_training': self.last_training.isoformat() if self.last_training else None,
-                    'next_training_in_minutes': self._get_next_training_time()
+                    'next_training_at': self.next_run_at.isoformat() if self.next_run_at else None,
+                    'next_training_in_minutes': self._get_next_training_time(),
+                    'throttle': self.auto_learner.throttle.get_stats(),
+                    'schedule': self.schedule.get_stats(),
+                    'phases': phase_histograms(conn, self.config.metrics_window_sessions)
                 }
         except Exception as e:
             logger.error(f"Error obteniendo estadísticas: {e}")
             return {}
 
-    def _get_next_training_time(self) -> Optional[int]:
-        """Calcular minutos hasta la próxima sesión"""
-        if not self.last_training:
-            return 0
-        
-        next_training = self.last_training + timedelta(minutes=self.config.training_interval_minutes)
-        minutes_until_next = (next_training - datetime.now()).total_seconds() / 60
+    def _get_next_training_time(self) -> Optional[float]:
+        """
+        Minutos hasta la próxima sesión programada por el planificador
+        (None si está detenido o hay una sesión en curso)
+        """
+        if not self.is_running or self.next_run_at is None:
+            return None
         
-        return max(0, int(minutes_until_next))
+        minutes_until_next = (self.next_run_at - datetime.now()).total_seconds() / 60
+        return round(max(0.0, minutes_until_next), 2)
+
+_continuous_learner: Optional[ContinuousLearningSystem] = None
+_continuous_learner_lock = threading.Lock()
+
+
+def get_continuous_learner() -> ContinuousLearningSystem:
+    """Sistema global del proceso, creado en el primer uso"""
+    global _continuous_learner
+    with _continuous_learner_lock:
+        if _continuous_learner is None:
+            configure_logging()
+            _continuous_learner = ContinuousLearningSystem()
+        return _continuous_learner
+
 
-# Instancia global del sistema
-continuous_learner = ContinuousLearningSystem() 
\ No newline at end of file
+def __getattr__(name: str):
+    # `from continuous_learning import continuous_learner` sigue devolviendo la instancia global
+    if name == "continuous_learner":
+        return get_continuous_learner()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
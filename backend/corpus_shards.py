@@ -0,0 +1,141 @@
+"""
+Lectura de corpus por fragmentos
+Tokenización, conteo y categorización de palabras que ejecutan los procesos
+de la ingesta map-reduce. El módulo no crea conexiones ni instancias
+globales: los procesos hijos lo importan sin efectos secundarios.
+"""
+
+import multiprocessing
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from seen_content import content_digest, filter_from_snapshot, pack_digests
+
+# Palabras que se extraen de cada línea de un corpus
+CORPUS_WORD_PATTERN = re.compile(r'[a-záéíóúñü]+')
+
+# Separadores donde se puede cortar una línea demasiado larga sin partir palabras
+CORPUS_SPLIT_BYTES = (b' ', b',', b'\t', b'"')
+
+BUSINESS_KEYWORDS = frozenset([
+    "consulta", "cita", "pedido", "factura", "pago", "servicio",
+    "producto", "precio", "descuento", "garantía", "devolución",
+    "cliente", "atención", "soporte", "problema", "solución",
+    "urgente", "importante", "especial", "personalizado"
+])
+
+
+def categorize_word(word: str) -> str:
+    """Categorizar una palabra"""
+    if word in BUSINESS_KEYWORDS:
+        return "business"
+    elif any(keyword in word for keyword in ["ayuda", "soporte", "atención"]):
+        return "customer_service"
+    elif any(keyword in word for keyword in ["hora", "día", "semana", "mes"]):
+        return "time"
+    elif any(keyword in word for keyword in ["gracias", "por favor", "disculpa"]):
+        return "emotion"
+    elif any(keyword in word for keyword in ["sistema", "error", "problema", "funcionar"]):
+        return "technical"
+    else:
+        return "general"
+
+
+def iter_corpus_lines(f, position: int, max_line: int, end: Optional[int] = None):
+    """
+    Producir (línea, byte final) hasta el final del archivo o hasta el byte end;
+    las líneas demasiado largas se cortan en un separador
+    """
+    while end is None or position < end:
+        limit = max_line if end is None else min(max_line, end - position)
+        raw = f.readline(limit)
+        if not raw:
+            return
+
+        # Corpus sin saltos de línea (p. ej. un JSON minificado): no partir palabras
+        if len(raw) == limit and not raw.endswith(b'\n') and position + limit != end:
+            cut = max(raw.rfind(separator) for separator in CORPUS_SPLIT_BYTES) + 1
+            if cut:
+                f.seek(cut - len(raw), os.SEEK_CUR)
+                raw = raw[:cut]
+
+        position += len(raw)
+        yield raw.decode('utf-8', errors='replace'), position
+
+
+def shard_boundaries(path: str, shard_bytes: int, max_line: int) -> List[int]:
+    """
+    Offsets que dividen un archivo en fragmentos de unos shard_bytes.
+
+    Cada corte se mueve al siguiente salto de línea (o separador, si la línea es
+    demasiado larga) para que ninguna palabra quede partida entre dos fragmentos.
+    """
+    size = os.path.getsize(path)
+    boundaries = [0]
+    with open(path, 'rb') as f:
+        offset = shard_bytes
+        while offset < size:
+            f.seek(offset)
+            window = f.read(max_line)
+            cut = window.find(b'\n')
+            if cut == -1:
+                cut = min((i for i in (window.find(sep) for sep in CORPUS_SPLIT_BYTES) if i != -1), default=-1)
+            offset += cut + 1 if cut != -1 else len(window)
+            if offset >= size:
+                break
+            boundaries.append(offset)
+            offset += shard_bytes
+    boundaries.append(size)
+    return boundaries
+
+
+# Contenido ya visto en el proceso de trabajo de los fragmentos (lo fija init_shard_worker)
+_shard_seen_content = None
+
+
+def init_shard_worker(seen_snapshot):
+    """Inicializador de los procesos de fragmentos: recibe una vez las capas del filtro de contenido visto"""
+    global _shard_seen_content
+    _shard_seen_content = filter_from_snapshot(seen_snapshot) if seen_snapshot is not None else None
+
+
+def count_corpus_shard(path: str, start: int, end: int, max_line: int
+                       ) -> Tuple[Counter, Dict[str, str], int, Optional[bytes]]:
+    """
+    Tokenizar y contar un fragmento [start, end) de un corpus en un proceso de trabajo.
+
+    Devuelve (conteos, categoría de cada palabra, líneas leídas, hashes
+    empaquetados de las líneas nuevas). Con filtro de contenido visto se
+    omiten las líneas ya aprendidas y las repetidas dentro del fragmento;
+    sin él, el último valor es None.
+    """
+    counts = Counter()
+    lines = 0
+    seen = _shard_seen_content
+    new_digests = {} if seen is not None else None
+    with open(path, 'rb') as f:
+        f.seek(start)
+        for line, _ in iter_corpus_lines(f, start, max_line, end):
+            lines += 1
+            if seen is not None:
+                digest = content_digest(line)
+                if digest is None or digest in seen or digest in new_digests:
+                    continue
+                new_digests[digest] = None
+            counts.update(word for word in CORPUS_WORD_PATTERN.findall(line.lower()) if len(word) >= 3)
+    packed = pack_digests(new_digests) if new_digests is not None else None
+    return counts, {word: categorize_word(word) for word in counts}, lines, packed
+
+
+def shard_process_context():
+    """
+    forkserver donde exista, si no spawn. Nunca fork: el proceso de
+    aprendizaje tiene hilos (escritor, planificador, lector del canal) y un
+    hijo creado con fork podría heredar un cerrojo tomado y bloquearse. Los
+    hijos solo importan este módulo.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
@@ -0,0 +1,148 @@
+"""
+Escritor único para SQLite
+Un hilo dedicado es dueño de la única conexión de escritura y agrupa en
+transacciones las operaciones que le llegan por una cola
+"""
+
+import queue
+import sqlite3
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Una operación recibe la conexión del escritor y devuelve cualquier resultado
+WriteOperation = Callable[[sqlite3.Connection], Any]
+
+# Marcas de control que viajan por la cola junto con las operaciones
+_FLUSH = object()
+_STOP = object()
+
+
+class SingleWriter:
+    """
+    Actor de escritura: todas las escrituras de un proceso pasan por su cola.
+
+    submit() devuelve un Future que se resuelve cuando la transacción que
+    contiene la operación se confirma (ack); flush() devuelve uno que se
+    resuelve cuando todo lo encolado antes ya está confirmado. Cada operación
+    va en su propio SAVEPOINT, así que el fallo de una no deshace las demás
+    del lote. Los llamadores que no necesitan durabilidad no esperan.
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection], max_batch: int = 256,
+                 name: str = "sqlite-writer",
+                 on_commit: Optional[Callable[[], None]] = None):
+        self.max_batch = max_batch
+        self.name = name
+        self.stats: Dict[str, int] = {'batches': 0, 'operations': 0, 'errors': 0, 'flushes': 0}
+        self._connect = connect
+        self._on_commit = on_commit
+        self._queue: "queue.Queue[Tuple[Any, Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def submit(self, operation: WriteOperation) -> Future:
+        """Encolar una operación; el Future devuelve su resultado tras el COMMIT"""
+        return self._enqueue(operation)
+
+    def flush(self) -> Future:
+        """Future que se resuelve cuando todas las operaciones previas están confirmadas"""
+        return self._enqueue(_FLUSH)
+
+    def queue_depth(self) -> int:
+        """Operaciones pendientes de escribir"""
+        return self._queue.qsize()
+
+    def close(self, timeout: Optional[float] = None):
+        """Escribir lo pendiente y detener el hilo"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put((_STOP, Future()))
+            thread.join(timeout)
+
+    def _enqueue(self, item: Any) -> Future:
+        """Poner un elemento en la cola arrancando el hilo la primera vez"""
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("El escritor ya está cerrado")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            self._queue.put((item, future))
+        return future
+
+    def _run(self):
+        """Consumir la cola agrupando las operaciones pendientes"""
+        conn = self._connect()
+        try:
+            while True:
+                batch = [self._queue.get()]
+                while batch[-1][0] not in (_FLUSH, _STOP) and len(batch) < self.max_batch:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                operations = [(op, future) for op, future in batch if op not in (_FLUSH, _STOP)]
+                if operations:
+                    self._execute(conn, operations)
+
+                # Las marcas cierran el lote: todo lo anterior ya está confirmado
+                for item, future in batch:
+                    if item is _FLUSH:
+                        self.stats['flushes'] += 1
+                        _resolve(future, True, None)
+                    elif item is _STOP:
+                        _resolve(future, True, None)
+                        return
+        finally:
+            conn.close()
+
+    def _execute(self, conn: sqlite3.Connection, batch: List[Tuple[WriteOperation, Future]]):
+        """Ejecutar un lote en una transacción, aislando cada operación"""
+        outcomes = []
+        try:
+            conn.execute("BEGIN")
+            for operation, _ in batch:
+                conn.execute("SAVEPOINT operation")
+                try:
+                    outcomes.append((True, operation(conn)))
+                    conn.execute("RELEASE operation")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO operation")
+                    conn.execute("RELEASE operation")
+                    self.stats['errors'] += 1
+                    outcomes.append((False, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            logger.error(f"Error confirmando lote de escritura: {e}")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            self.stats['errors'] += len(batch)
+            outcomes = [(False, e)] * len(batch)
+        else:
+            self.stats['batches'] += 1
+            self.stats['operations'] += len(batch)
+            if self._on_commit is not None:
+                self._on_commit()
+
+        for (_, future), (ok, value) in zip(batch, outcomes):
+            _resolve(future, ok, value)
+
+
+def _resolve(future: Future, ok: bool, value: Any):
+    """Completar un Future salvo que el llamador lo haya cancelado"""
+    if future.set_running_or_notify_cancel():
+        if ok:
+            future.set_result(value)
+        else:
+            future.set_exception(value)
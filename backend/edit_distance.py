@@ -0,0 +1,174 @@
+"""
+Motor de distancia de edición para el corrector ortográfico
+Damerau-Levenshtein acotado con prefiltrado por longitud de palabra
+"""
+
+from typing import Dict, Iterable, List, Set, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:  # NumPy es opcional
+    np = None
+    NUMPY_AVAILABLE = False
+
+
+def damerau_levenshtein(source: str, target: str, max_distance: int) -> int:
+    """
+    Distancia Damerau-Levenshtein (transposiciones adyacentes) acotada.
+
+    Solo se calcula la banda |i - j| <= max_distance y se abandona en cuanto
+    ningún camino puede quedar dentro del umbral. Si la distancia supera
+    max_distance se devuelve max_distance + 1.
+    """
+    if source == target:
+        return 0
+
+    limit = max_distance + 1
+    len_source, len_target = len(source), len(target)
+    if abs(len_source - len_target) > max_distance:
+        return limit
+
+    previous_previous = None
+    previous = [j if j <= max_distance else limit for j in range(len_target + 1)]
+    previous_min = 0
+
+    for i in range(1, len_source + 1):
+        current = [limit] * (len_target + 1)
+        current[0] = i if i <= max_distance else limit
+        row_min = current[0]
+        source_char = source[i - 1]
+
+        for j in range(max(1, i - max_distance), min(len_target, i + max_distance) + 1):
+            cost = 0 if source_char == target[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+
+            # Transposición de dos letras contiguas ("porducto" -> "producto")
+            if (i > 1 and j > 1 and source_char == target[j - 2]
+                    and source[i - 2] == target[j - 1]):
+                value = min(value, previous_previous[j - 2] + 1)
+
+            current[j] = value if value < limit else limit
+            if current[j] < row_min:
+                row_min = current[j]
+
+        # Una transposición salta una fila: hacen falta dos filas fuera del umbral
+        if row_min > max_distance and previous_min > max_distance:
+            return limit
+
+        previous_previous, previous, previous_min = previous, current, row_min
+
+    return previous[len_target]
+
+
+def encode_words(words: List[str]):
+    """Codificar palabras de igual longitud como matriz (n, longitud) de códigos Unicode"""
+    length = len(words[0]) if words else 0
+    buffer = ''.join(words).encode('utf-32-le')
+    return np.frombuffer(buffer, dtype=np.uint32).reshape(len(words), length)
+
+
+def batch_damerau_levenshtein(source: str, encoded, max_distance: int):
+    """
+    Versión vectorizada con NumPy: calcula la distancia de `source` a todas las
+    palabras de una matriz codificada con `encode_words` a la vez.
+
+    Devuelve un array con max_distance + 1 para las palabras fuera del umbral.
+    """
+    count, len_target = encoded.shape
+    limit = max_distance + 1
+    if abs(len(source) - len_target) > max_distance:
+        return np.full(count, limit, dtype=np.int32)
+
+    source_codes = np.frombuffer(source.encode('utf-32-le'), dtype=np.uint32)
+    columns = np.arange(len_target + 1, dtype=np.int32)
+
+    previous_previous = None
+    previous = np.tile(np.minimum(columns, limit), (count, 1))
+    previous_alive = np.ones(count, dtype=bool)
+
+    for i in range(1, len(source) + 1):
+        mismatch = (encoded != source_codes[i - 1]).astype(np.int32)
+
+        # Sustitución y borrado dependen solo de la fila anterior
+        best = np.minimum(previous[:, :-1] + mismatch, previous[:, 1:] + 1)
+
+        if i > 1 and len_target > 1:
+            swapped = ((encoded[:, :-1] == source_codes[i - 1])
+                       & (encoded[:, 1:] == source_codes[i - 2]))
+            best[:, 1:] = np.where(
+                swapped,
+                np.minimum(best[:, 1:], previous_previous[:, :-2] + 1),
+                best[:, 1:]
+            )
+
+        # Inserciones: current[j] = j + min_{k<=j}(valor_k - k), con un mínimo acumulado
+        current = np.empty_like(previous)
+        current[:, 0] = min(i, limit)
+        current[:, 1:] = best - columns[1:]
+        np.minimum.accumulate(current, axis=1, out=current)
+        current += columns
+        np.minimum(current, limit, out=current)
+
+        alive = current.min(axis=1) <= max_distance
+        if not (alive | previous_alive).any():
+            return np.full(count, limit, dtype=np.int32)
+
+        previous_previous, previous, previous_alive = previous, current, alive
+
+    return previous[:, len_target]
+
+
+class LengthBucketIndex:
+    """Vocabulario agrupado por longitud para visitar solo candidatos con |Δlen| <= k"""
+
+    def __init__(self, words: Iterable[str] = (), numpy_min_bucket: int = 256):
+        self.buckets: Dict[int, Set[str]] = {}
+        self.numpy_min_bucket = numpy_min_bucket
+        self._encoded: Dict[int, Tuple[List[str], object]] = {}
+        for word in words:
+            self.add(word)
+
+    def add(self, word: str):
+        """Agregar una palabra a su cubeta de longitud"""
+        bucket = self.buckets.setdefault(len(word), set())
+        if word not in bucket:
+            bucket.add(word)
+            self._encoded.pop(len(word), None)
+
+    def discard(self, word: str):
+        """Eliminar una palabra de su cubeta de longitud"""
+        bucket = self.buckets.get(len(word))
+        if bucket is not None and word in bucket:
+            bucket.discard(word)
+            self._encoded.pop(len(word), None)
+
+    def search(self, word: str, max_distance: int) -> List[Tuple[str, int]]:
+        """Devolver (palabra, distancia) de las palabras a distancia <= max_distance"""
+        matches = []
+        length = len(word)
+
+        for candidate_length in range(max(1, length - max_distance), length + max_distance + 1):
+            bucket = self.buckets.get(candidate_length)
+            if not bucket:
+                continue
+
+            if NUMPY_AVAILABLE and len(bucket) >= self.numpy_min_bucket:
+                words, encoded = self._encoded_bucket(candidate_length)
+                distances = batch_damerau_levenshtein(word, encoded, max_distance)
+                for index in np.nonzero(distances <= max_distance)[0]:
+                    matches.append((words[index], int(distances[index])))
+            else:
+                for candidate in bucket:
+                    distance = damerau_levenshtein(word, candidate, max_distance)
+                    if distance <= max_distance:
+                        matches.append((candidate, distance))
+
+        return matches
+
+    def _encoded_bucket(self, length: int):
+        """Matriz codificada de una cubeta, reconstruida solo si la cubeta cambió"""
+        if length not in self._encoded:
+            words = list(self.buckets[length])
+            self._encoded[length] = (words, encode_words(words))
+        return self._encoded[length]
@@ -0,0 +1,131 @@
+"""
+Bus de eventos del aprendizaje continuo
+Los avisos del proceso de aprendizaje (inicio, avance y fin de sesión,
+variaciones de las estadísticas) se reparten en memoria a los clientes
+suscritos al flujo SSE, así un monitor no tiene que consultar la base de
+datos periódicamente.
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Tipos de evento que emite el sistema de aprendizaje continuo
+SESSION_STARTED = "session_started"
+SESSION_PROGRESS = "session_progress"
+SESSION_ENDED = "session_ended"
+STATS_DELTA = "stats_delta"
+LEARNING_STATE = "learning_state"
+STATS_SNAPSHOT = "stats"
+
+LEARNING_EVENTS = (SESSION_STARTED, SESSION_PROGRESS, SESSION_ENDED, STATS_DELTA, LEARNING_STATE)
+
+
+class EventSubscription:
+    """Cola de eventos de un cliente; se lee con get()"""
+
+    def __init__(self, bus: "LearningEventBus", loop: asyncio.AbstractEventLoop, max_queue: int):
+        self.bus = bus
+        self.loop = loop
+        self.dropped = 0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+
+    def offer(self, event: Dict):
+        """Encolar (en el bucle del cliente); si va atrasado se descarta el evento más antiguo"""
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(event)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict]:
+        """Siguiente evento, o None si pasan `timeout` segundos sin ninguno"""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class LearningEventBus:
+    """
+    Reparto en memoria de los eventos de aprendizaje.
+
+    publish() se puede llamar desde cualquier hilo (el lector del canal del
+    proceso de trabajo); cada suscriptor recibe el evento en su propio bucle
+    de eventos. Se guardan los últimos `history_size` eventos numerados para
+    que un cliente que se reconecta con Last-Event-ID recupere lo perdido.
+    """
+
+    def __init__(self, history_size: int = 256, max_queue: int = 100):
+        self.max_queue = max_queue
+        self._history: deque = deque(maxlen=history_size)
+        self._subscribers: List[EventSubscription] = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def publish(self, event: Dict):
+        """Numerar un evento {"event": tipo, ...} y entregarlo a los suscriptores"""
+        if event.get("event") not in LEARNING_EVENTS:
+            return
+        with self._lock:
+            event = {**event, "id": next(self._ids)}
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # El bucle del cliente ya se cerró
+                self.unsubscribe(subscription)
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> tuple:
+        """
+        Suscribirse desde el bucle de eventos actual; devuelve (suscripción,
+        eventos posteriores a `last_event_id` o None si ya no están todos)
+        """
+        subscription = EventSubscription(self, asyncio.get_running_loop(), self.max_queue)
+        with self._lock:
+            self._subscribers.append(subscription)
+            missed = None
+            if (last_event_id is not None and self._history
+                    and self._history[0]["id"] <= last_event_id + 1 <= self._history[-1]["id"] + 1):
+                missed = [event for event in self._history if event["id"] > last_event_id]
+        return subscription, missed
+
+    def unsubscribe(self, subscription: EventSubscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    def latest_id(self) -> int:
+        """Número del último evento publicado (0 si no hay ninguno)"""
+        with self._lock:
+            return self._history[-1]["id"] if self._history else 0
+
+    def get_stats(self) -> Dict:
+        """Suscriptores conectados y eventos publicados"""
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'last_event_id': self._history[-1]["id"] if self._history else 0,
+                'dropped': sum(s.dropped for s in self._subscribers)
+            }
+
+
+def format_sse(event: Dict) -> str:
+    """Un evento en formato text/event-stream"""
+    data = {name: value for name, value in event.items() if name not in ("event", "id")}
+    lines = []
+    if event.get("id") is not None:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['event']}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
@@ -0,0 +1,140 @@
+"""
+Métricas por fuente y fase del aprendizaje
+Cada sesión acumula, por fuente y fase (fetch, tokenize, categorize, write),
+llamadas, tiempo, filas y errores, más un histograma de duraciones. Se guardan
+en learning_phase_metrics junto con los puntos de control de la sesión.
+"""
+
+import bisect
+import json
+import sqlite3
+import threading
+from typing import Dict
+
+PHASES = ("fetch", "tokenize", "categorize", "write")
+
+# Límites superiores (segundos) de los intervalos del histograma; el último es abierto
+HISTOGRAM_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0)
+HISTOGRAM_LABELS = tuple(f"<={bound:g}s" for bound in HISTOGRAM_BUCKETS) + (f">{HISTOGRAM_BUCKETS[-1]:g}s",)
+
+
+def _migration_phase_metrics(conn: sqlite3.Connection):
+    """Duración, filas, errores e histograma por sesión, fuente y fase del aprendizaje"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS learning_phase_metrics (
+            session_id INTEGER NOT NULL,
+            source TEXT NOT NULL,
+            phase TEXT NOT NULL,
+            calls INTEGER DEFAULT 0,
+            total_seconds REAL DEFAULT 0,
+            max_seconds REAL DEFAULT 0,
+            rows INTEGER DEFAULT 0,
+            errors INTEGER DEFAULT 0,
+            histogram TEXT,
+            PRIMARY KEY (session_id, source, phase)
+        )
+    """)
+
+
+MIGRATIONS = [_migration_phase_metrics]
+
+
+def _empty_entry() -> Dict:
+    return {"calls": 0, "total_seconds": 0.0, "max_seconds": 0.0, "rows": 0, "errors": 0,
+            "histogram": [0] * len(HISTOGRAM_LABELS)}
+
+
+class PhaseMetrics:
+    """Acumulador de una sesión; record() se llama desde cualquier hilo"""
+
+    def __init__(self):
+        self._entries: Dict[tuple, Dict] = {}
+        self._lock = threading.Lock()
+
+    def record(self, source: str, phase: str, seconds: float, rows: int = 0, errors: int = 0):
+        """Sumar una medición de `phase` para `source`"""
+        with self._lock:
+            entry = self._entries.setdefault((source, phase), _empty_entry())
+            entry["calls"] += 1
+            entry["total_seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            entry["rows"] += rows
+            entry["errors"] += errors
+            entry["histogram"][bisect.bisect_left(HISTOGRAM_BUCKETS, seconds)] += 1
+
+    def snapshot(self) -> Dict[tuple, Dict]:
+        """Copia de lo acumulado por (fuente, fase)"""
+        with self._lock:
+            return {key: {**entry, "histogram": list(entry["histogram"])} for key, entry in self._entries.items()}
+
+    def summary(self) -> Dict[str, Dict[str, Dict]]:
+        """{fuente: {fase: llamadas, segundos, filas, errores}} de lo acumulado"""
+        result: Dict[str, Dict[str, Dict]] = {}
+        for (source, phase), entry in sorted(self.snapshot().items(),
+                                             key=lambda item: (item[0][0], _phase_order(item[0][1]))):
+            result.setdefault(source, {})[phase] = {
+                "calls": entry["calls"],
+                "seconds": round(entry["total_seconds"], 3),
+                "rows": entry["rows"],
+                "errors": entry["errors"]
+            }
+        return result
+
+    def save(self, conn: sqlite3.Connection, session_id: int):
+        """Guardar lo acumulado de la sesión (reemplaza lo guardado antes)"""
+        conn.executemany("""
+            INSERT INTO learning_phase_metrics
+            (session_id, source, phase, calls, total_seconds, max_seconds, rows, errors, histogram)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(session_id, source, phase) DO UPDATE SET
+                calls = excluded.calls,
+                total_seconds = excluded.total_seconds,
+                max_seconds = excluded.max_seconds,
+                rows = excluded.rows,
+                errors = excluded.errors,
+                histogram = excluded.histogram
+        """, [(session_id, source, phase, entry["calls"], entry["total_seconds"], entry["max_seconds"],
+               entry["rows"], entry["errors"], json.dumps(entry["histogram"]))
+              for (source, phase), entry in self.snapshot().items()])
+
+
+def phase_histograms(conn: sqlite3.Connection, sessions: int = 20) -> Dict[str, Dict[str, Dict]]:
+    """
+    {fuente: {fase: resumen}} de las últimas `sessions` sesiones: llamadas,
+    tiempo total y máximo, filas, filas por segundo, errores e histograma de
+    duraciones {intervalo: llamadas}
+    """
+    rows = conn.execute("""
+        SELECT source, phase, calls, total_seconds, max_seconds, rows, errors, histogram
+        FROM learning_phase_metrics
+        WHERE session_id IN (SELECT DISTINCT session_id FROM learning_phase_metrics
+                             ORDER BY session_id DESC LIMIT ?)
+    """, (sessions,)).fetchall()
+
+    merged: Dict[tuple, Dict] = {}
+    for source, phase, calls, total, longest, row_count, errors, histogram in rows:
+        entry = merged.setdefault((source, phase), _empty_entry())
+        entry["calls"] += calls
+        entry["total_seconds"] += total
+        entry["max_seconds"] = max(entry["max_seconds"], longest)
+        entry["rows"] += row_count
+        entry["errors"] += errors
+        for i, count in enumerate(json.loads(histogram or "[]")[:len(HISTOGRAM_LABELS)]):
+            entry["histogram"][i] += count
+
+    result: Dict[str, Dict[str, Dict]] = {}
+    for (source, phase), entry in sorted(merged.items(), key=lambda item: (item[0][0], _phase_order(item[0][1]))):
+        result.setdefault(source, {})[phase] = {
+            "calls": entry["calls"],
+            "total_seconds": round(entry["total_seconds"], 3),
+            "max_seconds": round(entry["max_seconds"], 3),
+            "rows": entry["rows"],
+            "rows_per_second": round(entry["rows"] / entry["total_seconds"], 1) if entry["total_seconds"] else None,
+            "errors": entry["errors"],
+            "histogram": dict(zip(HISTOGRAM_LABELS, entry["histogram"]))
+        }
+    return result
+
+
+def _phase_order(phase: str) -> int:
+    return PHASES.index(phase) if phase in PHASES else len(PHASES)
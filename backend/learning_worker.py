@@ -0,0 +1,385 @@
+"""
+Proceso de aprendizaje continuo
+El servidor arranca y supervisa un proceso aparte que ejecuta las sesiones de
+aprendizaje, para que tokenizar y escribir vocabulario no compita por el GIL
+con las peticiones del chat. Se controla por un canal IPC autenticado
+(multiprocessing.connection) y avisa al servidor cada vez que una sesión
+cambia el vocabulario.
+"""
+
+import atexit
+import itertools
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Any, Callable, Dict, List, Optional
+
+from continuous_learning import ContinuousLearningConfig, ContinuousLearningSystem, configure_logging
+from traffic_load import LoadSignal
+
+logger = logging.getLogger(__name__)
+
+# Campos de configuración que se pueden cambiar en caliente
+CONFIGURABLE_FIELDS = (
+    "training_interval_minutes",
+    "max_training_time_minutes",
+    "enable_text_files",
+    "enable_api_learning",
+    "enable_synthetic_data",
+    "enable_spanish_corpus",
+    "adaptive_interval",
+    "min_interval_minutes",
+    "max_interval_minutes",
+)
+
+VOCABULARY_CHANGED = "vocabulary_changed"
+
+# Arranque del proceso de trabajo en un intérprete nuevo. Con -c su __main__ no
+# tiene archivo ni spec, así que ni él ni los procesos de fragmentos que cree
+# vuelven a ejecutar el script con el que se lanzó el servidor.
+_WORKER_BOOTSTRAP = "import sys; sys.path.insert(0, {path!r}); import learning_worker; learning_worker.main()"
+
+
+def config_summary(config: ContinuousLearningConfig) -> Dict:
+    """Configuración visible en los endpoints de aprendizaje continuo"""
+    return {name: getattr(config, name) for name in CONFIGURABLE_FIELDS}
+
+
+def run_worker(channel: Connection, config: ContinuousLearningConfig, load_signal: Optional[LoadSignal] = None):
+    """
+    Punto de entrada del proceso de trabajo.
+
+    Atiende órdenes {"id", "command", "args"} y responde {"id", "ok", "result"}
+    o {"id", "ok": False, "error"}; los avisos (vocabulario cambiado y eventos
+    de sesión para el flujo SSE) van como {"event", ...}. Termina
+    con la orden "shutdown" o cuando el servidor cierra su extremo del canal.
+    `load_signal` es la carga que publica el servidor; las sesiones ceden
+    ante ella.
+    """
+    system = ContinuousLearningSystem(config)
+    system.auto_learner.throttle.signal = load_signal
+    send_lock = threading.Lock()
+
+    def send(message: Dict):
+        # El aviso de fin de sesión llega desde el hilo del planificador
+        with send_lock:
+            channel.send(message)
+
+    system.on_session_end = lambda summary: send({"event": VOCABULARY_CHANGED, **summary})
+    system.on_event = send
+
+    try:
+        while True:
+            try:
+                message = channel.recv()
+            except (EOFError, OSError):
+                logger.info("El servidor cerró el canal de control; terminando el proceso de aprendizaje")
+                break
+
+            command = message.get("command")
+            try:
+                result = _handle_command(system, command, message.get("args") or {})
+                send({"id": message.get("id"), "ok": True, "result": result})
+            except Exception as e:
+                logger.error(f"Error atendiendo la orden {command!r}: {e}")
+                send({"id": message.get("id"), "ok": False, "error": str(e)})
+
+            if command == "shutdown":
+                break
+    finally:
+        system.stop_continuous_learning()
+        system.store.close()
+        channel.close()
+
+
+def main():
+    """
+    Proceso de trabajo lanzado por LearningWorkerClient: lee por la entrada
+    estándar la dirección y la clave del canal, se conecta y recibe la
+    configuración y la señal de carga como primer mensaje
+    """
+    configure_logging()
+    handshake = json.loads(sys.stdin.readline())
+    sys.stdin.close()
+    address = handshake["address"]
+    channel = Client(tuple(address) if isinstance(address, list) else address,
+                     authkey=bytes.fromhex(handshake["authkey"]))
+    setup = channel.recv()
+    run_worker(channel, setup["config"], setup["load_signal"])
+
+
+def _handle_command(system: ContinuousLearningSystem, command: str, args: Dict) -> Any:
+    """Ejecutar una orden de control en el proceso de trabajo"""
+    if command == "start":
+        system.start_continuous_learning()
+        return {"is_running": system.is_running, "interval_minutes": system.config.training_interval_minutes}
+
+    if command == "stop":
+        system.stop_continuous_learning()
+        return {"is_running": system.is_running}
+
+    if command == "config":
+        for name, value in args.items():
+            if name not in CONFIGURABLE_FIELDS:
+                raise ValueError(f"Campo de configuración desconocido: {name}")
+            setattr(system.config, name, value)
+        return config_summary(system.config)
+
+    if command == "stats":
+        return {
+            "continuous_learning_stats": system.get_learning_stats(),
+            "is_running": system.is_running,
+            "config": config_summary(system.config)
+        }
+
+    if command == "shutdown":
+        system.stop_continuous_learning()
+        return {"is_running": False}
+
+    raise ValueError(f"Orden desconocida: {command}")
+
+
+class LearningWorkerClient:
+    """
+    Lado del servidor: arranca el proceso de trabajo, le envía órdenes y
+    recibe sus avisos.
+
+    Si el proceso termina inesperadamente se vuelve a arrancar con la última
+    configuración y, si el aprendizaje estaba activo, se reanuda.
+    """
+
+    def __init__(self, config: Optional[ContinuousLearningConfig] = None, request_timeout: float = 10.0,
+                 load_signal: Optional[LoadSignal] = None, start_timeout: float = 30.0):
+        self.config = config or ContinuousLearningConfig()
+        self.load_signal = load_signal
+        self.request_timeout = request_timeout
+        self.start_timeout = start_timeout
+        self.restarts = 0
+        self.last_notification: Optional[Dict] = None
+        self._process: Optional[subprocess.Popen] = None
+        self._channel: Optional[Connection] = None
+        self._lock = threading.RLock()
+        self._send_lock = threading.Lock()
+        self._pending: Dict[int, Future] = {}
+        self._ids = itertools.count(1)
+        self._listeners: List[Callable[[Dict], None]] = []
+        self._wanted_running = False
+        self._closing = False
+
+    def add_listener(self, callback: Callable[[Dict], None]):
+        """Registrar una función que recibe los avisos del proceso de trabajo"""
+        self._listeners.append(callback)
+
+    def is_alive(self) -> bool:
+        """True si el proceso de trabajo está en marcha"""
+        return self._process is not None and self._process.poll() is None
+
+    def ensure_started(self):
+        """Arrancar el proceso de trabajo si no está en marcha"""
+        with self._lock:
+            if self.is_alive():
+                return
+            # Un intérprete nuevo (_WORKER_BOOTSTRAP) no hereda los hilos, las
+            # conexiones ni el módulo principal del servidor. Se conecta al
+            # canal con la clave que recibe por la entrada estándar.
+            authkey = os.urandom(32)
+            with Listener(authkey=authkey) as listener:
+                bootstrap = _WORKER_BOOTSTRAP.format(path=os.path.dirname(os.path.abspath(__file__)))
+                process = subprocess.Popen([sys.executable, "-c", bootstrap], stdin=subprocess.PIPE)
+                process.stdin.write(json.dumps({"address": listener.address, "authkey": authkey.hex()}).encode() + b"\n")
+                process.stdin.close()
+                parent_channel = _accept_worker(listener, authkey, process, self.start_timeout)
+            parent_channel.send({"config": self.config, "load_signal": self.load_signal})
+            self._process = process
+            self._channel = parent_channel
+            self._closing = False
+            threading.Thread(target=self._read_loop, args=(parent_channel, process),
+                             name="learning-worker-reader", daemon=True).start()
+            logger.info(f"Proceso de aprendizaje continuo iniciado (pid {process.pid})")
+
+    def start(self) -> Dict:
+        """Iniciar el aprendizaje continuo en el proceso de trabajo"""
+        self._wanted_running = True
+        return self.request("start")
+
+    def stop(self) -> Dict:
+        """Detener el aprendizaje continuo (el proceso sigue disponible)"""
+        self._wanted_running = False
+        return self.request("stop")
+
+    def update_config(self, **changes) -> Dict:
+        """Cambiar la configuración; se conserva para los reinicios del proceso"""
+        changes = {name: value for name, value in changes.items() if value is not None}
+        for name, value in changes.items():
+            if name not in CONFIGURABLE_FIELDS:
+                raise ValueError(f"Campo de configuración desconocido: {name}")
+            setattr(self.config, name, value)
+        return self.request("config", **changes)
+
+    def stats(self) -> Dict:
+        """Estadísticas y configuración del aprendizaje continuo"""
+        stats = self.request("stats")
+        stats["worker"] = {
+            "pid": self._process.pid if self._process else None,
+            "alive": self.is_alive(),
+            "restarts": self.restarts,
+            "last_notification": self.last_notification
+        }
+        if self.load_signal is not None:
+            stats["server_load"] = self.load_signal.read()
+        return stats
+
+    def request(self, command: str, timeout: Optional[float] = None, **args) -> Dict:
+        """Enviar una orden y esperar su respuesta"""
+        self.ensure_started()
+        future: Future = Future()
+        request_id = next(self._ids)
+        self._pending[request_id] = future
+        try:
+            with self._send_lock:
+                self._channel.send({"id": request_id, "command": command, "args": args})
+            return future.result(timeout=timeout or self.request_timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    def shutdown(self, timeout: float = 10.0):
+        """Detener el proceso de trabajo ordenadamente"""
+        with self._lock:
+            process = self._process
+            if process is None:
+                return
+            self._closing = True
+            if process.poll() is None:
+                try:
+                    self.request("shutdown", timeout=timeout)
+                except Exception as e:
+                    logger.warning(f"El proceso de aprendizaje no respondió al apagado: {e}")
+                if not _wait_process(process, timeout):
+                    process.terminate()
+                    _wait_process(process, timeout)
+            self._channel.close()
+            self._process = None
+
+    def _read_loop(self, channel: Connection, process: subprocess.Popen):
+        """Recibir respuestas y avisos hasta que el proceso termine"""
+        while True:
+            try:
+                message = channel.recv()
+            except (EOFError, OSError):
+                break
+
+            if "event" in message:
+                self._dispatch(message)
+                continue
+
+            future = self._pending.get(message.get("id"))
+            if future is None or future.done():
+                continue
+            if message.get("ok"):
+                future.set_result(message.get("result"))
+            else:
+                future.set_exception(RuntimeError(message.get("error")))
+
+        # El canal se cerró: las órdenes en vuelo ya no tendrán respuesta
+        for future in list(self._pending.values()):
+            if not future.done():
+                future.set_exception(ConnectionError("El proceso de aprendizaje terminó"))
+
+        if not self._closing and process is self._process:
+            _wait_process(process, 1)
+            logger.warning(f"El proceso de aprendizaje terminó inesperadamente (código {process.returncode})")
+            self._restart()
+
+    def _restart(self):
+        """Volver a arrancar el proceso y restaurar el estado deseado"""
+        with self._lock:
+            if self._closing:
+                return
+            self.restarts += 1
+            self._process = None
+            try:
+                self.ensure_started()
+                if self._wanted_running:
+                    self.request("start")
+            except Exception as e:
+                logger.error(f"No se pudo reiniciar el proceso de aprendizaje: {e}")
+
+    def _dispatch(self, event: Dict):
+        """Entregar un aviso del proceso de trabajo a los oyentes"""
+        # Los eventos de avance y de estadísticas no cuentan como cambio de vocabulario
+        if event.get("event") == VOCABULARY_CHANGED:
+            self.last_notification = event
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logger.error(f"Error atendiendo aviso {event.get('event')}: {e}")
+
+
+def _accept_worker(listener: Listener, authkey: bytes, process: subprocess.Popen, timeout: float) -> Connection:
+    """
+    Esperar a que el proceso recién lanzado se conecte al canal. accept() no
+    tiene plazo: si el proceso termina o no se conecta a tiempo, una
+    conexión propia lo desbloquea y se lanza un error.
+    """
+    accepted: Future = Future()
+
+    def accept():
+        try:
+            accepted.set_result(listener.accept())
+        except Exception as e:
+            accepted.set_exception(e)
+
+    threading.Thread(target=accept, name="learning-worker-accept", daemon=True).start()
+    deadline = time.monotonic() + timeout
+    while process.poll() is None and time.monotonic() < deadline:
+        try:
+            return accepted.result(timeout=0.1)
+        except FutureTimeoutError:
+            continue
+
+    if not accepted.done():
+        Client(listener.address, authkey=authkey).close()
+    if accepted.exception() is None:
+        accepted.result().close()
+    if process.poll() is None:
+        process.kill()
+        process.wait()
+    raise RuntimeError(f"El proceso de aprendizaje no se conectó al canal (código {process.returncode})")
+
+
+def _wait_process(process: subprocess.Popen, timeout: float) -> bool:
+    """Esperar a que el proceso termine; False si sigue vivo tras `timeout`"""
+    try:
+        process.wait(timeout)
+        return True
+    except subprocess.TimeoutExpired:
+        return False
+
+
+_clients: List[LearningWorkerClient] = []
+
+
+def create_learning_worker(config: Optional[ContinuousLearningConfig] = None,
+                           load_signal: Optional[LoadSignal] = None) -> LearningWorkerClient:
+    """Crear un cliente cuyo proceso se apaga al terminar el servidor"""
+    client = LearningWorkerClient(config, load_signal=load_signal)
+    _clients.append(client)
+    return client
+
+
+@atexit.register
+def _shutdown_workers():
+    """No dejar procesos de aprendizaje huérfanos"""
+    for client in _clients:
+        try:
+            client.shutdown()
+        except Exception as e:
+            logger.error(f"Error apagando el proceso de aprendizaje: {e}")
@@ -13,6 +13,30 @@ from typing import Dict, List, Set, Tuple
 import requests
 import time
 
+# Patrones de errores ortográficos comunes en español (grafía -> errores frecuentes)
+SPELLING_ERROR_PATTERNS = {
+    'h': ['j', ''],  # hola -> ola, jola
+    'v': ['b'],      # vender -> bender
+    'b': ['v'],      # buscar -> vuscar
+    'c': ['k', 's'], # casa -> kasa, sasa
+    'k': ['c', 'qu'], # kilo -> cilo, quilo
+    'z': ['s'],      # zapato -> sapato
+    's': ['z'],      # casa -> caza
+    'll': ['y'],     # llave -> yave
+    'ñ': ['ni'],     # año -> anio
+    'rr': ['r'],     # perro -> pero
+    'qu': ['k'],     # que -> ke
+    'gu': ['g'],     # guerra -> gerra
+    'ch': ['sh'],    # chico -> shico
+    'j': ['h'],      # jamón -> hamón
+    'g': ['j'],      # gente -> jente
+    'x': ['ks'],     # taxi -> taksi
+    'w': ['gu'],     # web -> gueb
+    'y': ['ll'],     # yo -> llo
+    'i': ['y'],      # día -> dya
+    'u': ['w'],      # agua -> agwa
+}
+
 class MassiveVocabularyManager:
     """Gestor de vocabulario masivo para el chatbot"""
     
@@ -184,30 +208,6 @@ class MassiveVocabularyManager:
         """Generar variaciones ortográficas comunes"""
         variations = set()
         
-        # Patrones de errores comunes
-        error_patterns = {
-            'h': ['j', ''],  # hola -> ola, jola
-            'v': ['b'],      # vender -> bender
-            'b': ['v'],      # buscar -> vuscar
-            'c': ['k', 's'], # casa -> kasa, sasa
-            'k': ['c', 'qu'], # kilo -> cilo, quilo
-            'z': ['s'],      # zapato -> sapato
-            's': ['z'],      # casa -> caza
-            'll': ['y'],     # llave -> yave
-            'ñ': ['ni'],     # año -> anio
-            'rr': ['r'],     # perro -> pero
-            'qu': ['k'],     # que -> ke
-            'gu': ['g'],     # guerra -> gerra
-            'ch': ['sh'],    # chico -> shico
-            'j': ['h'],      # jamón -> hamón
-            'g': ['j'],      # gente -> jente
-            'x': ['ks'],     # taxi -> taksi
-            'w': ['gu'],     # web -> gueb
-            'y': ['ll'],     # yo -> llo
-            'i': ['y'],      # día -> dya
-            'u': ['w'],      # agua -> agwa
-        }
-        
         # Aplicar variaciones a palabras comunes
         common_words = [
             "hola", "buenos", "dias", "tardes", "noches", "gracias", "por favor",
@@ -222,7 +222,7 @@ class MassiveVocabularyManager:
             variations.add(word)
             
             # Generar variaciones con errores comunes
-            for original, replacements in error_patterns.items():
+            for original, replacements in SPELLING_ERROR_PATTERNS.items():
                 if original in word:
                     for replacement in replacements:
                         new_word = word.replace(original, replacement)
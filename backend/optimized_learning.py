@@ -4,8 +4,8 @@ Permite que el chatbot aprenda nuevas palabras y expresiones de forma eficiente
 """
 
 import json
-import sqlite3
 import re
+from collections import Counter
 from typing import Dict, List, Set, Optional, Tuple
 from dataclasses import dataclass, field
 from functools import lru_cache
@@ -13,6 +13,8 @@ import hashlib
 from datetime import datetime, timedelta
 import logging
 
+from vocabulary_store import get_store
+
 # Configurar logging optimizado
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -23,6 +25,7 @@ class LearningConfig:
     # Configuración de vocabulario
     max_vocabulary_size: int = 0  # 0 = Sin límite (ilimitado)
     min_word_length: int = 3
+    max_word_length: int = 30
     learning_threshold: int = 2  # Mínimo de apariciones para aprender
     
     # Configuración de cache
@@ -62,74 +65,22 @@ class OptimizedVocabularyLearner:
         self.similarity_cache = {}
         self.last_backup = datetime.now()
         
-        # Inicializar base de datos
-        self._init_database()
+        # El almacén compartido crea el esquema y aplica las migraciones
+        self.store = get_store(self.db_path)
+        self.change_feed = self.store.change_feed
         self._load_vocabulary_cache()
     
-    def _init_database(self):
-        """Inicializar base de datos optimizada"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute("""
-                    CREATE TABLE IF NOT EXISTS vocabulary (
-                        word TEXT PRIMARY KEY,
-                        frequency INTEGER DEFAULT 1,
-                        contexts TEXT,
-                        learned_date TEXT,
-                        last_used TEXT,
-                        category TEXT DEFAULT 'general'
-                    )
-                """)
-                
-                conn.execute("""
-                    CREATE TABLE IF NOT EXISTS expressions (
-                        expression TEXT PRIMARY KEY,
-                        frequency INTEGER DEFAULT 1,
-                        contexts TEXT,
-                        learned_date TEXT,
-                        last_used TEXT,
-                        category TEXT DEFAULT 'general'
-                    )
-                """)
-                
-                conn.execute("""
-                    CREATE TABLE IF NOT EXISTS learning_stats (
-                        date TEXT PRIMARY KEY,
-                        new_words INTEGER DEFAULT 0,
-                        new_expressions INTEGER DEFAULT 0,
-                        total_learned INTEGER DEFAULT 0
-                    )
-                """)
-                
-                # Crear índices para optimizar consultas
-                conn.execute("CREATE INDEX IF NOT EXISTS idx_vocabulary_frequency ON vocabulary(frequency)")
-                conn.execute("CREATE INDEX IF NOT EXISTS idx_vocabulary_category ON vocabulary(category)")
-                conn.execute("CREATE INDEX IF NOT EXISTS idx_expressions_frequency ON expressions(frequency)")
-                
-                conn.commit()
-        except Exception as e:
-            logger.error(f"Error inicializando base de datos: {e}")
-    
     def _load_vocabulary_cache(self):
         """Cargar vocabulario en cache de forma optimizada"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                # Cargar solo las palabras más frecuentes para optimizar memoria
-                cursor = conn.execute("""
-                    SELECT word, frequency, contexts, category 
-                    FROM vocabulary 
-                    ORDER BY frequency DESC 
-                    LIMIT 1000
-                """)
+            # Cargar solo las palabras más frecuentes para optimizar memoria
+            for word, frequency, contexts, category in self.store.top_words(1000):
+                self.vocabulary_cache[word] = {
+                    'frequency': frequency,
+                    'contexts': contexts,
+                    'category': category
+                }
                 
-                for row in cursor:
-                    word, frequency, contexts, category = row
-                    self.vocabulary_cache[word] = {
-                        'frequency': frequency,
-                        'contexts': json.loads(contexts) if contexts else [],
-                        'category': category
-                    }
-                    
         except Exception as e:
             logger.error(f"Error cargando vocabulario: {e}")
     
@@ -187,8 +138,13 @@ class OptimizedVocabularyLearner:
         
         return expressions
     
-    def learn_from_text(self, text: str, context: str = "general") -> Dict[str, int]:
-        """Aprender nuevas palabras y expresiones del texto"""
+    def learn_from_text(self, text: str, context: str = "general", wait: bool = False) -> Dict[str, int]:
+        """
+        Aprender nuevas palabras y expresiones del texto.
+        
+        La escritura se encola en el escritor del almacén y el cache se actualiza
+        al momento; con wait=True se espera a que la transacción se confirme.
+        """
         if not text:
             return {"words": 0, "expressions": 0}
         
@@ -196,100 +152,53 @@ class OptimizedVocabularyLearner:
         words = self.extract_words(text)
         expressions = self.extract_expressions(text)
         
-        learned_words = 0
-        learned_expressions = 0
+        word_counts = Counter(words)
+        expression_counts = Counter(expressions)
         
-        # Aprender palabras
-        for word in words:
-            if self._learn_word(word, context):
-                learned_words += 1
+        # Solo limpiar si hay demasiadas palabras en cache para optimizar memoria
+        if len(self.vocabulary_cache) >= 10000:
+            self._cleanup_old_words()
         
-        # Aprender expresiones
-        for expression in expressions:
-            if self._learn_expression(expression, context):
-                learned_expressions += 1
+        def save(conn):
+            # Palabras, expresiones y estadísticas en una sola operación; como
+            # antes, cada aparición en el chat vuelve a categorizar la palabra
+            self.store.upsert_words(word_counts, source=context, categorize=self._categorize_word,
+                                    context=context, conn=conn, recategorize=True)
+            self.store.upsert_expressions(expression_counts, source=context, category=context,
+                                          context=context, conn=conn)
+            self.store.add_learning_stats(len(words), len(expressions), conn=conn)
         
-        # Actualizar estadísticas
-        self._update_learning_stats(learned_words, learned_expressions)
+        try:
+            ack = self.store.write(save, description="aprendizaje del texto")
+            if wait:
+                ack.result()
+        except Exception as e:
+            logger.error(f"Error aprendiendo del texto: {e}")
+            return {"words": 0, "expressions": 0, "total_vocabulary": len(self.vocabulary_cache)}
+        
+        # Actualizar el cache sin esperar a la base de datos
+        for word, count in word_counts.items():
+            entry = self.vocabulary_cache.get(word)
+            if entry is None:
+                self.vocabulary_cache[word] = {
+                    'frequency': count,
+                    'contexts': [context],
+                    'category': self._categorize_word(word)
+                }
+            else:
+                entry['frequency'] += count
+                entry['contexts'] = (entry['contexts'] + [context])[-10:]
+                entry['category'] = self._categorize_word(word)
         
         # Backup periódico
         self._check_backup()
         
         return {
-            "words": learned_words,
-            "expressions": learned_expressions,
+            "words": len(words),
+            "expressions": len(expressions),
             "total_vocabulary": len(self.vocabulary_cache)
         }
     
-    def _learn_word(self, word: str, context: str) -> bool:
-        """Aprender una nueva palabra con categorización inteligente"""
-        if not word or len(word) < self.config.min_word_length:
-            return False
-            
-        # Determinar categoría de la palabra
-        category = self._categorize_word(word)
-        
-        # Verificar si ya está en cache
-        if word in self.vocabulary_cache:
-            # Actualizar frecuencia en cache
-            self.vocabulary_cache[word]['frequency'] += 1
-            self.vocabulary_cache[word]['last_used'] = datetime.now().isoformat()
-            return True
-            
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.execute("SELECT frequency, contexts, category FROM vocabulary WHERE word = ?", (word,))
-                row = cursor.fetchone()
-                
-                if row:
-                    frequency, contexts, existing_category = row
-                    contexts_list = json.loads(contexts) if contexts else []
-                    contexts_list.append(context)
-                    contexts_list = contexts_list[-10:]  # Mantener solo los últimos 10 contextos
-                    
-                    # Actualizar en base de datos
-                    conn.execute("""
-                        UPDATE vocabulary
-                        SET frequency = ?, contexts = ?, last_used = ?, category = ?
-                        WHERE word = ?
-                    """, (frequency + 1, json.dumps(contexts_list), datetime.now().isoformat(), category, word))
-                    
-                    # Actualizar cache
-                    self.vocabulary_cache[word] = {
-                        'frequency': frequency + 1,
-                        'contexts': contexts_list,
-                        'category': category,
-                        'last_used': datetime.now().isoformat()
-                    }
-                else:
-                    # Insertar nueva palabra (sin límite)
-                    # Solo limpiar si hay demasiadas palabras en cache para optimizar memoria
-                    if len(self.vocabulary_cache) >= 10000:  # Límite de cache para memoria
-                        self._cleanup_old_words()
-                    
-                    # Insertar nueva palabra
-                    conn.execute("""
-                        INSERT INTO vocabulary (word, frequency, contexts, learned_date, last_used, category)
-                        VALUES (?, 1, ?, ?, ?, ?)
-                    """, (word, json.dumps([context]), datetime.now().isoformat(),
-                          datetime.now().isoformat(), category))
-                    
-                    # Agregar al cache
-                    self.vocabulary_cache[word] = {
-                        'frequency': 1,
-                        'contexts': [context],
-                        'category': category,
-                        'learned_date': datetime.now().isoformat(),
-                        'last_used': datetime.now().isoformat()
-                    }
-                
-                conn.commit()
-                return True
-                
-        except Exception as e:
-            logger.error(f"Error aprendiendo palabra '{word}': {e}")
-            return False
-    
     def _categorize_word(self, word: str) -> str:
         """Categorizar palabra según su relevancia"""
         word_lower = word.lower()
@@ -319,87 +228,17 @@ class OptimizedVocabularyLearner:
         
         return 'general'
     
-    def _learn_expression(self, expression: str, context: str) -> bool:
-        """Aprender una nueva expresión"""
-        if not expression:
-            return False
-        
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                # Verificar si ya existe
-                cursor = conn.execute("SELECT frequency, contexts FROM expressions WHERE expression = ?", (expression,))
-                row = cursor.fetchone()
-                
-                if row:
-                    # Actualizar frecuencia y contexto
-                    frequency, contexts = row
-                    contexts_list = json.loads(contexts) if contexts else []
-                    contexts_list.append(context)
-                    contexts_list = contexts_list[-10:]  # Mantener solo los últimos
-                    
-                    conn.execute("""
-                        UPDATE expressions 
-                        SET frequency = ?, contexts = ?, last_used = ? 
-                        WHERE expression = ?
-                    """, (frequency + 1, json.dumps(contexts_list), datetime.now().isoformat(), expression))
-                else:
-                    # Nueva expresión
-                    conn.execute("""
-                        INSERT INTO expressions (expression, frequency, contexts, learned_date, last_used, category)
-                        VALUES (?, 1, ?, ?, ?, ?)
-                    """, (expression, json.dumps([context]), datetime.now().isoformat(), 
-                          datetime.now().isoformat(), context))
-                
-                conn.commit()
-                return True
-                
-        except Exception as e:
-            logger.error(f"Error aprendiendo expresión '{expression}': {e}")
-            return False
-    
-    def _update_learning_stats(self, new_words: int, new_expressions: int):
-        """Actualizar estadísticas de aprendizaje"""
-        today = datetime.now().strftime('%Y-%m-%d')
-        
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.execute("SELECT new_words, new_expressions, total_learned FROM learning_stats WHERE date = ?", (today,))
-                row = cursor.fetchone()
-                
-                if row:
-                    # Actualizar estadísticas existentes
-                    current_words, current_expressions, total_learned = row
-                    conn.execute("""
-                        UPDATE learning_stats 
-                        SET new_words = ?, new_expressions = ?, total_learned = ?
-                        WHERE date = ?
-                    """, (current_words + new_words, current_expressions + new_expressions, 
-                          total_learned + new_words + new_expressions, today))
-                else:
-                    # Crear nueva entrada
-                    conn.execute("""
-                        INSERT INTO learning_stats (date, new_words, new_expressions, total_learned)
-                        VALUES (?, ?, ?, ?)
-                    """, (today, new_words, new_expressions, new_words + new_expressions))
-                
-                conn.commit()
-                
-        except Exception as e:
-            logger.error(f"Error actualizando estadísticas: {e}")
-    
     def _check_backup(self):
         """Verificar si es necesario hacer backup"""
         if datetime.now() - self.last_backup > timedelta(seconds=self.config.backup_interval):
             self._backup_vocabulary()
+            self.change_feed.compact()
             self.last_backup = datetime.now()
     
     def _backup_vocabulary(self):
         """Backup del vocabulario aprendido"""
         try:
-            backup_path = f"{self.db_path}.backup"
-            with sqlite3.connect(self.db_path) as source_conn:
-                with sqlite3.connect(backup_path) as backup_conn:
-                    source_conn.backup(backup_conn)
+            self.store.backup(f"{self.db_path}.backup")
             logger.info("Backup del vocabulario completado")
         except Exception as e:
             logger.error(f"Error en backup: {e}")
@@ -407,46 +246,21 @@ class OptimizedVocabularyLearner:
     def get_learning_stats(self) -> Dict:
         """Obtener estadísticas de aprendizaje"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                # Estadísticas generales
-                total_words = conn.execute("SELECT COUNT(*) FROM vocabulary").fetchone()[0]
-                total_expressions = conn.execute("SELECT COUNT(*) FROM expressions").fetchone()[0]
-                
-                # Estadísticas de hoy
-                today = datetime.now().strftime('%Y-%m-%d')
-                today_stats = conn.execute("""
-                    SELECT new_words, new_expressions, total_learned 
-                    FROM learning_stats 
-                    WHERE date = ?
-                """, (today,)).fetchone()
-                
-                # Palabras más frecuentes
-                top_words = conn.execute("""
-                    SELECT word, frequency 
-                    FROM vocabulary 
-                    ORDER BY frequency DESC 
-                    LIMIT 10
-                """).fetchall()
-                
-                # Expresiones más frecuentes
-                top_expressions = conn.execute("""
-                    SELECT expression, frequency 
-                    FROM expressions 
-                    ORDER BY frequency DESC 
-                    LIMIT 10
-                """).fetchall()
-                
-                return {
-                    "total_words": total_words,
-                    "total_expressions": total_expressions,
-                    "today_words": today_stats[0] if today_stats else 0,
-                    "today_expressions": today_stats[1] if today_stats else 0,
-                    "total_learned_today": today_stats[2] if today_stats else 0,
-                    "top_words": [{"word": w, "frequency": f} for w, f in top_words],
-                    "top_expressions": [{"expression": e, "frequency": f} for e, f in top_expressions],
-                    "cache_size": len(self.vocabulary_cache)
-                }
-                
+            # Estadísticas de hoy
+            today = datetime.now().strftime('%Y-%m-%d')
+            today_stats = self.store.learning_stats_for(today)
+            
+            return {
+                "total_words": self.store.count_words(),
+                "total_expressions": self.store.count_expressions(),
+                "today_words": today_stats[0] if today_stats else 0,
+                "today_expressions": today_stats[1] if today_stats else 0,
+                "total_learned_today": today_stats[2] if today_stats else 0,
+                "top_words": [{"word": w, "frequency": f} for w, f, _, _ in self.store.top_words(10)],
+                "top_expressions": [{"expression": e, "frequency": f} for e, f in self.store.top_expressions(10)],
+                "cache_size": len(self.vocabulary_cache)
+            }
+            
         except Exception as e:
             logger.error(f"Error obteniendo estadísticas: {e}")
             return {}
@@ -493,21 +307,17 @@ class OptimizedVocabularyLearner:
     def get_vocabulary_summary(self) -> Dict:
         """Obtener resumen del vocabulario aprendido"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                total_words_db = conn.execute("SELECT COUNT(*) FROM vocabulary").fetchone()[0]
-                total_expressions_db = conn.execute("SELECT COUNT(*) FROM expressions").fetchone()[0]
-                
-                return {
-                    "total_words": total_words_db,  # Total en base de datos
-                    "cache_size": len(self.vocabulary_cache),  # Palabras en cache
-                    "total_expressions": total_expressions_db,
-                    "config": {
-                        "max_vocabulary_size": "ilimitado" if self.config.max_vocabulary_size == 0 else self.config.max_vocabulary_size,
-                        "cache_size": self.config.cache_size,
-                        "min_word_length": self.config.min_word_length,
-                        "learning_threshold": self.config.learning_threshold
-                    }
+            return {
+                "total_words": self.store.count_words(),  # Total en base de datos
+                "cache_size": len(self.vocabulary_cache),  # Palabras en cache
+                "total_expressions": self.store.count_expressions(),
+                "config": {
+                    "max_vocabulary_size": "ilimitado" if self.config.max_vocabulary_size == 0 else self.config.max_vocabulary_size,
+                    "cache_size": self.config.cache_size,
+                    "min_word_length": self.config.min_word_length,
+                    "learning_threshold": self.config.learning_threshold
                 }
+            }
         except Exception as e:
             logger.error(f"Error obteniendo resumen: {e}")
             return {
@@ -523,32 +333,22 @@ class OptimizedVocabularyLearner:
     def _cleanup_old_words(self):
         """Limpieza inteligente de palabras antiguas y poco relevantes (solo para optimizar memoria)"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                # Obtener estadísticas actuales
-                cursor = conn.execute("SELECT COUNT(*) FROM vocabulary")
-                total_words = cursor.fetchone()[0]
+            # Solo limpiar si hay demasiadas palabras en cache para optimizar memoria
+            # NO eliminar palabras de la base de datos, solo del cache
+            if len(self.vocabulary_cache) > 8000:  # Reducir cache si es muy grande
+                # Mantener solo las palabras más frecuentes en cache
+                top_words = self.store.top_words(5000)
                 
-                # Solo limpiar si hay demasiadas palabras en cache para optimizar memoria
-                # NO eliminar palabras de la base de datos, solo del cache
-                if len(self.vocabulary_cache) > 8000:  # Reducir cache si es muy grande
-                    # Mantener solo las palabras más frecuentes en cache
-                    top_words = conn.execute("""
-                        SELECT word, frequency, contexts, category 
-                        FROM vocabulary 
-                        ORDER BY frequency DESC 
-                        LIMIT 5000
-                    """).fetchall()
-                    
-                    # Limpiar cache y recargar solo las más frecuentes
-                    self.vocabulary_cache.clear()
-                    for word, frequency, contexts, category in top_words:
-                        self.vocabulary_cache[word] = {
-                            'frequency': frequency,
-                            'contexts': json.loads(contexts) if contexts else [],
-                            'category': category
-                        }
-                    
-                    logger.info(f"Cache optimizado. Palabras en cache: {len(self.vocabulary_cache)}")
+                # Limpiar cache y recargar solo las más frecuentes
+                self.vocabulary_cache.clear()
+                for word, frequency, contexts, category in top_words:
+                    self.vocabulary_cache[word] = {
+                        'frequency': frequency,
+                        'contexts': contexts,
+                        'category': category
+                    }
+                
+                logger.info(f"Cache optimizado. Palabras en cache: {len(self.vocabulary_cache)}")
                 
         except Exception as e:
             logger.error(f"Error en limpieza de cache: {e}")
@@ -558,23 +358,13 @@ class OptimizedVocabularyLearner:
         try:
             cutoff_date = (datetime.now() - timedelta(days=days)).isoformat()
             
-            with sqlite3.connect(self.db_path) as conn:
-                # Eliminar palabras antiguas y poco usadas
-                conn.execute("""
-                    DELETE FROM vocabulary 
-                    WHERE last_used < ? AND frequency < ?
-                """, (cutoff_date, self.config.min_frequency_keep))
-                
-                # Eliminar expresiones antiguas
-                conn.execute("""
-                    DELETE FROM expressions 
-                    WHERE last_used < ? AND frequency < ?
-                """, (cutoff_date, self.config.min_frequency_keep))
-                
-                conn.commit()
-                
-                # Limpiar cache
-                self._load_vocabulary_cache()
+            # Eliminar palabras y expresiones antiguas y poco usadas
+            self.store.delete_stale(cutoff_date, self.config.min_frequency_keep)
+            
+            # Limpiar cache
+            self.vocabulary_cache.clear()
+            self._load_vocabulary_cache()
+            self.change_feed.compact()
                 
         except Exception as e:
             logger.error(f"Error limpiando palabras antiguas: {e}")
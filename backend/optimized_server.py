@@ -9,6 +9,7 @@ import asyncio
 import json
 import sqlite3
 import re
+import time
 from typing import Dict, List, Optional
 from dataclasses import dataclass
 from functools import lru_cache
@@ -16,7 +17,7 @@ from datetime import datetime
 import logging
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 import uvicorn
 from pydantic import BaseModel
 
@@ -24,7 +25,11 @@ from pydantic import BaseModel
 from optimized_learning import vocabulary_learner, LearningConfig
 from auto_learning import auto_learner
 from spell_checker import spell_checker
-from continuous_learning import continuous_learner
+from context_model import BigramContextModel
+from continuous_learning import ContinuousLearningConfig
+from learning_events import STATS_SNAPSHOT, LearningEventBus, format_sse
+from learning_worker import VOCABULARY_CHANGED, create_learning_worker
+from traffic_load import LoadSignal, RequestLoadTracker
 
 # Configurar logging optimizado
 logging.basicConfig(level=logging.INFO)
@@ -170,6 +175,10 @@ class OptimizedDatabase:
 # Instancia de base de datos
 db = OptimizedDatabase(config.DATABASE_PATH)
 
+# Modelo de bigramas de las conversaciones para ordenar sugerencias ortográficas
+spell_checker.context_model = BigramContextModel(config.DATABASE_PATH)
+spell_checker.context_model.refresh()
+
 # Patrones de intención optimizados
 INTENT_PATTERNS = {
     "greeting": ["hola", "buenos días", "buenas tardes", "buenas noches", "saludos"],
@@ -276,6 +285,9 @@ class ChatResponse(BaseModel):
     total_vocabulary: int = 0
     spelling_corrections: List[Dict] = []
 
+class SpellingBatchRequest(BaseModel):
+    texts: List[str]
+
 class AppointmentRequest(BaseModel):
     user_id: str
     date: str
@@ -305,6 +317,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Carga del servidor que consulta el aprendizaje en segundo plano para cederle el paso
+load_signal = LoadSignal()
+load_tracker = RequestLoadTracker(load_signal, writer_queue_depth=vocabulary_learner.store.writer.queue_depth)
+auto_learner.throttle.signal = load_signal
+
+# Los endpoints de aprendizaje y salud no cuentan como tráfico del chat
+UNTRACKED_PATHS = ("/continuous-learning", "/auto-learning", "/health")
+
+@app.middleware("http")
+async def track_request_load(request: Request, call_next):
+    """Contar peticiones en vuelo y su latencia"""
+    if request.url.path.startswith(UNTRACKED_PATHS):
+        return await call_next(request)
+    start = time.perf_counter()
+    load_tracker.begin()
+    try:
+        return await call_next(request)
+    finally:
+        load_tracker.end(time.perf_counter() - start)
+
 @app.get("/")
 async def root():
     """Endpoint raíz optimizado"""
@@ -340,21 +372,10 @@ async def chat(request: ChatRequest):
             return ChatResponse(**cached_response)
 
         # Verificar ortografía y obtener correcciones
-        spelling_corrections = []
-        words = request.message.split()
-        
-        for word in words:
-            # Limpiar palabra de puntuación
-            clean_word = re.sub(r'[^\wáéíóúñü]', '', word.lower())
-            if clean_word and len(clean_word) > 2:  # Solo palabras de 3+ caracteres
-                spell_check = spell_checker.check_spelling(clean_word)
-                if not spell_check['is_correct'] and spell_check['suggestions']:
-                    spelling_corrections.append({
-                        'original': word,
-                        'suggestions': spell_check['suggestions'],
-                        'confidence': spell_check['confidence'],
-                        'error_type': spell_check['error_type']
-                    })
+        spelling_corrections = [
+            correction for correction in spell_checker.check_text(request.message)
+            if correction['suggestions']
+        ]
 
         # Procesar mensaje
         intent = understand_intent(request.message)
@@ -469,7 +490,9 @@ async def get_spelling_stats():
             "spelling_variations": stats,
             "total_variations": stats.get('total_variations', 0),
             "unique_words": stats.get('unique_words', 0),
-            "avg_similarity": stats.get('avg_similarity', 0.0)
+            "avg_similarity": stats.get('avg_similarity', 0.0),
+            "result_cache": spell_checker.get_cache_stats(),
+            "context_model": spell_checker.context_model.get_stats() if spell_checker.context_model else {}
         }
     except Exception as e:
         logger.error(f"Error obteniendo estadísticas de ortografía: {e}")
@@ -491,6 +514,22 @@ async def check_spelling(word: str):
         logger.error(f"Error verificando ortografía: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/spelling/check-batch")
+async def check_spelling_batch(request: SpellingBatchRequest):
+    """Verificar ortografía de varios textos completos en una sola llamada"""
+    try:
+        corrections = await asyncio.to_thread(spell_checker.check_texts, request.texts)
+        return {
+            "total_texts": len(request.texts),
+            "results": [
+                {"text": text, "corrections": text_corrections}
+                for text, text_corrections in zip(request.texts, corrections)
+            ]
+        }
+    except Exception as e:
+        logger.error(f"Error verificando ortografía en lote: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/spelling/learn")
 async def learn_spelling_variation(correct_word: str, variation: str, error_type: str = "manual"):
     """Aprender una nueva variación ortográfica manualmente"""
@@ -509,16 +548,50 @@ async def learn_spelling_variation(correct_word: str, variation: str, error_type
 
 # ===== ENDPOINTS DE APRENDIZAJE CONTINUO =====
 
+# El aprendizaje continuo corre en un proceso aparte supervisado por el servidor
+learning_worker = create_learning_worker(ContinuousLearningConfig(), load_signal=load_signal)
+
+def _on_vocabulary_changed(event: Dict):
+    """El proceso de aprendizaje escribió vocabulario: descartar cachés locales"""
+    if event.get("event") != VOCABULARY_CHANGED:
+        return
+    vocabulary_learner.store.invalidate_caches()
+    spell_checker.mark_stale()
+    logger.info(f"Vocabulario actualizado por la sesión {event.get('session_id')}: "
+                f"{event.get('words_learned', 0)} palabras, {event.get('expressions_learned', 0)} expresiones")
+
+learning_worker.add_listener(_on_vocabulary_changed)
+
+# Los eventos de sesión del proceso de aprendizaje se reparten a los clientes SSE
+learning_events = LearningEventBus()
+learning_worker.add_listener(learning_events.publish)
+
+# Comentario SSE que mantiene viva la conexión y detecta clientes desconectados
+EVENTS_KEEPALIVE_SECONDS = 15.0
+
+@app.on_event("startup")
+async def start_learning_worker():
+    """Arrancar el proceso de aprendizaje junto con el servidor"""
+    try:
+        await asyncio.to_thread(learning_worker.ensure_started)
+    except Exception as e:
+        logger.error(f"Error arrancando el proceso de aprendizaje: {e}")
+
+@app.on_event("shutdown")
+async def stop_learning_worker():
+    """Detener el proceso de aprendizaje al apagar el servidor"""
+    await asyncio.to_thread(learning_worker.shutdown)
+
 @app.post("/continuous-learning/start")
 async def start_continuous_learning():
     """Iniciar el aprendizaje continuo en segundo plano"""
     try:
-        continuous_learner.start_continuous_learning()
+        result = await asyncio.to_thread(learning_worker.start)
         return {
             "status": "success",
             "message": "Aprendizaje continuo iniciado",
-            "is_running": continuous_learner.is_running,
-            "interval_minutes": continuous_learner.config.training_interval_minutes
+            "is_running": result["is_running"],
+            "interval_minutes": result["interval_minutes"]
         }
     except Exception as e:
         logger.error(f"Error iniciando aprendizaje continuo: {e}")
@@ -528,11 +601,11 @@ async def start_continuous_learning():
 async def stop_continuous_learning():
     """Detener el aprendizaje continuo"""
     try:
-        continuous_learner.stop_continuous_learning()
+        result = await asyncio.to_thread(learning_worker.stop)
         return {
             "status": "success",
             "message": "Aprendizaje continuo detenido",
-            "is_running": continuous_learner.is_running
+            "is_running": result["is_running"]
         }
     except Exception as e:
         logger.error(f"Error deteniendo aprendizaje continuo: {e}")
@@ -542,53 +615,84 @@ async def stop_continuous_learning():
 async def get_continuous_learning_stats():
     """Obtener estadísticas del aprendizaje continuo"""
     try:
-        stats = continuous_learner.get_learning_stats()
-        return {
-            "continuous_learning_stats": stats,
-            "is_running": continuous_learner.is_running,
-            "config": {
-                "training_interval_minutes": continuous_learner.config.training_interval_minutes,
-                "enable_text_files": continuous_learner.config.enable_text_files,
-                "enable_api_learning": continuous_learner.config.enable_api_learning,
-                "enable_synthetic_data": continuous_learner.config.enable_synthetic_data,
-                "enable_spanish_corpus": continuous_learner.config.enable_spanish_corpus
-            }
-        }
+        stats = await asyncio.to_thread(learning_worker.stats)
+        stats["events"] = learning_events.get_stats()
+        return stats
     except Exception as e:
         logger.error(f"Error obteniendo estadísticas de aprendizaje continuo: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/continuous-learning/events")
+async def stream_continuous_learning_events(request: Request):
+    """
+    Flujo SSE del aprendizaje continuo: primero una instantánea "stats" (la
+    misma respuesta que /continuous-learning/stats) y después los eventos de
+    inicio, avance y fin de sesión y las variaciones de las estadísticas
+    ("stats_delta"). Al reconectar con Last-Event-ID se reenvían los eventos
+    perdidos en lugar de la instantánea, si siguen en memoria.
+    """
+    try:
+        last_event_id = int(request.headers.get("last-event-id", ""))
+    except ValueError:
+        last_event_id = None
+    subscription, missed = learning_events.subscribe(last_event_id)
+
+    async def stream():
+        try:
+            yield f"retry: {int(EVENTS_KEEPALIVE_SECONDS * 1000)}\n\n"
+            skip_until = 0
+            if missed is None:
+                # Lo publicado antes de la instantánea ya está incluido en ella
+                skip_until = learning_events.latest_id()
+                try:
+                    stats = await asyncio.to_thread(learning_worker.stats)
+                    stats["events"] = learning_events.get_stats()
+                    yield format_sse({"event": STATS_SNAPSHOT, "id": skip_until or None, **stats})
+                except Exception as e:
+                    logger.error(f"Error obteniendo estadísticas para el flujo de eventos: {e}")
+            else:
+                for event in missed:
+                    yield format_sse(event)
+            while not await request.is_disconnected():
+                event = await subscription.get(timeout=EVENTS_KEEPALIVE_SECONDS)
+                if event is None:
+                    yield ": keepalive\n\n"
+                elif event["id"] > skip_until:
+                    yield format_sse(event)
+        finally:
+            subscription.close()
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.post("/continuous-learning/config")
 async def update_continuous_learning_config(
     training_interval_minutes: Optional[int] = None,
     enable_text_files: Optional[bool] = None,
     enable_api_learning: Optional[bool] = None,
     enable_synthetic_data: Optional[bool] = None,
-    enable_spanish_corpus: Optional[bool] = None
+    enable_spanish_corpus: Optional[bool] = None,
+    adaptive_interval: Optional[bool] = None,
+    min_interval_minutes: Optional[float] = None,
+    max_interval_minutes: Optional[float] = None
 ):
     """Actualizar configuración del aprendizaje continuo"""
     try:
-        if training_interval_minutes is not None:
-            continuous_learner.config.training_interval_minutes = training_interval_minutes
-        if enable_text_files is not None:
-            continuous_learner.config.enable_text_files = enable_text_files
-        if enable_api_learning is not None:
-            continuous_learner.config.enable_api_learning = enable_api_learning
-        if enable_synthetic_data is not None:
-            continuous_learner.config.enable_synthetic_data = enable_synthetic_data
-        if enable_spanish_corpus is not None:
-            continuous_learner.config.enable_spanish_corpus = enable_spanish_corpus
-        
+        config = await asyncio.to_thread(
+            learning_worker.update_config,
+            training_interval_minutes=training_interval_minutes,
+            enable_text_files=enable_text_files,
+            enable_api_learning=enable_api_learning,
+            enable_synthetic_data=enable_synthetic_data,
+            enable_spanish_corpus=enable_spanish_corpus,
+            adaptive_interval=adaptive_interval,
+            min_interval_minutes=min_interval_minutes,
+            max_interval_minutes=max_interval_minutes
+        )
         return {
             "status": "success",
             "message": "Configuración actualizada",
-            "config": {
-                "training_interval_minutes": continuous_learner.config.training_interval_minutes,
-                "enable_text_files": continuous_learner.config.enable_text_files,
-                "enable_api_learning": continuous_learner.config.enable_api_learning,
-                "enable_synthetic_data": continuous_learner.config.enable_synthetic_data,
-                "enable_spanish_corpus": continuous_learner.config.enable_spanish_corpus
-            }
+            "config": config
         }
     except Exception as e:
         logger.error(f"Error actualizando configuración: {e}")
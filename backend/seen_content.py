@@ -0,0 +1,432 @@
+"""
+Filtro de contenido ya aprendido
+Filtro de Bloom escalable y persistente con los hashes de las líneas y frases
+que ya se ingirieron, para que las fuentes de aprendizaje no vuelvan a contar
+el mismo texto en cada sesión. Los filtros rotan por ventana de tiempo y sus
+bits se guardan en trozos versionados que los procesos combinan al guardar.
+"""
+
+import hashlib
+import logging
+import math
+import sqlite3
+import struct
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Un hash (h1, h2) empaquetado para enviarlo entre procesos
+_PACKED_DIGEST = struct.Struct("<QQ")
+
+# Los bits de cada capa se guardan en trozos de este tamaño; un lote solo reescribe los que tocó
+CHUNK_BYTES = 512
+
+
+class BloomFilter:
+    """Filtro de Bloom de tamaño fijo (doble hash de Kirsch-Mitzenmacher)"""
+
+    def __init__(self, capacity: int, error_rate: float, bits: Optional[bytes] = None,
+                 hash_count: Optional[int] = None, items: int = 0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        size = math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.size = size
+        self.hash_count = hash_count or max(1, round(size / capacity * math.log(2)))
+        self.bits = bytearray(bits) if bits is not None else bytearray((size + 7) // 8)
+        self.items = items
+        # Trozos modificados, elementos añadidos y versión guardada desde la última sincronización
+        self.dirty: set = set()
+        self.unsynced_items = 0
+        self.version = 0
+
+    def _positions(self, digest: Tuple[int, int]):
+        h1, h2 = digest
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def __contains__(self, digest: Tuple[int, int]) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(digest))
+
+    def add(self, digest: Tuple[int, int]):
+        for p in self._positions(digest):
+            self.bits[p >> 3] |= 1 << (p & 7)
+            self.dirty.add((p >> 3) // CHUNK_BYTES)
+        self.items += 1
+        self.unsynced_items += 1
+
+    def chunk(self, index: int) -> bytes:
+        return bytes(self.bits[index * CHUNK_BYTES:(index + 1) * CHUNK_BYTES])
+
+    def merge_chunk(self, index: int, data: bytes):
+        """OR de un trozo guardado (quizá por otro proceso) sobre los bits en memoria"""
+        offset = index * CHUNK_BYTES
+        merged = int.from_bytes(self.bits[offset:offset + len(data)], "little") | int.from_bytes(data, "little")
+        self.bits[offset:offset + len(data)] = merged.to_bytes(len(data), "little")
+
+    @property
+    def full(self) -> bool:
+        return self.items >= self.capacity
+
+
+class ScalableBloomFilter:
+    """
+    Cadena de filtros de Bloom: cuando una capa se llena se añade otra con el
+    doble de capacidad y la mitad de tasa de error, así la tasa total queda
+    acotada por 2 * error_rate sin conocer el volumen de antemano.
+    """
+
+    GROWTH = 2
+    TIGHTENING = 0.5
+
+    def __init__(self, capacity: int, error_rate: float, layers: Optional[List[BloomFilter]] = None):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.layers: List[BloomFilter] = layers or []
+
+    def __contains__(self, digest: Tuple[int, int]) -> bool:
+        return any(digest in layer for layer in self.layers)
+
+    def add(self, digest: Tuple[int, int]):
+        if not self.layers or self.layers[-1].full:
+            self.layers.append(self._new_layer(len(self.layers)))
+        self.layers[-1].add(digest)
+
+    def layer(self, index: int, capacity: int, error_rate: float, hash_count: int) -> BloomFilter:
+        """Capa `index`, creándola (y las anteriores que falten) con los parámetros guardados"""
+        while len(self.layers) < index:
+            self.layers.append(self._new_layer(len(self.layers)))
+        if len(self.layers) == index:
+            self.layers.append(BloomFilter(capacity, error_rate, hash_count=hash_count))
+        return self.layers[index]
+
+    def _new_layer(self, index: int) -> BloomFilter:
+        return BloomFilter(self.capacity * self.GROWTH ** index, self.error_rate * self.TIGHTENING ** index)
+
+    @property
+    def items(self) -> int:
+        return sum(layer.items for layer in self.layers)
+
+
+def content_digest(text: str, namespace: str = "") -> Optional[Tuple[int, int]]:
+    """Hash de un texto normalizado (minúsculas, espacios colapsados); None si está vacío"""
+    normalized = " ".join(text.lower().split())
+    if not normalized:
+        return None
+    digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=16,
+                             person=namespace.encode("utf-8")[:16]).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+
+class SeenContentBatch:
+    """
+    Textos nuevos de un lote de escritura, todavía sin marcar en el filtro.
+
+    Sus hashes solo se añaden al filtro dentro de la escritura que guarda el
+    vocabulario del lote (SeenContentFilter.save(conn, batch)); si el lote no
+    llega a escribirse se descarta y esos textos siguen contando como nuevos.
+    """
+
+    def __init__(self, seen: "SeenContentFilter"):
+        self.seen = seen
+        self.digests: List[Tuple[int, int]] = []
+        self.packed: List[bytes] = []
+        self._staged: set = set()
+
+    def unseen(self, texts: Iterable[str], namespace: str = "") -> List[str]:
+        """Textos no vistos todavía, sin añadirlos al lote"""
+        texts = list(texts)
+        digests = [content_digest(text, namespace) for text in texts]
+        known = self.seen.contains_any(digest for digest in digests if digest is not None)
+        known_iter = iter(known)
+        return [text for text, digest in zip(texts, digests)
+                if digest is not None and not next(known_iter) and digest not in self._staged]
+
+    def filter_new(self, texts: Iterable[str], namespace: str = "") -> List[str]:
+        """
+        Textos no vistos todavía (ni en el filtro ni antes en este lote).
+        `namespace` separa usos del mismo texto (p. ej. una frase aprendida
+        como palabras y como expresión).
+        """
+        new = []
+        digests = []
+        for text in texts:
+            digest = content_digest(text, namespace)
+            if digest is not None:
+                digests.append((text, digest))
+        seen = self.seen.contains_any(digest for _, digest in digests)
+        for (text, digest), known in zip(digests, seen):
+            if known or digest in self._staged:
+                continue
+            self._staged.add(digest)
+            self.digests.append(digest)
+            new.append(text)
+        self.seen.count(len(digests), len(digests) - len(new))
+        return new
+
+    def stage_packed(self, data: bytes, checked: int):
+        """
+        Añadir los hashes nuevos (pack_digests) de `checked` textos filtrados
+        en otro proceso. No se comparan con los del lote: cada proceso
+        descarta sus propios repetidos.
+        """
+        self.packed.append(data)
+        self.seen.count(checked, checked - len(data) // _PACKED_DIGEST.size)
+
+    def __iter__(self):
+        yield from self.digests
+        for data in self.packed:
+            yield from unpack_digests(data)
+
+
+def pack_digests(digests: Iterable[Tuple[int, int]]) -> bytes:
+    """Hashes empaquetados en bytes (16 por hash), más baratos de enviar entre procesos que tuplas"""
+    return b"".join(_PACKED_DIGEST.pack(*digest) for digest in digests)
+
+
+def unpack_digests(data: bytes) -> Iterable[Tuple[int, int]]:
+    return _PACKED_DIGEST.iter_unpack(data)
+
+
+def filter_from_snapshot(snapshot: List[Tuple[int, float, int, int, bytes]]) -> ScalableBloomFilter:
+    """Filtro de solo lectura con las capas de SeenContentFilter.snapshot() (en otro proceso)"""
+    return ScalableBloomFilter(0, 0.0, [BloomFilter(capacity, error_rate, bits, hash_count, items)
+                                        for capacity, error_rate, hash_count, items, bits in snapshot])
+
+
+def _migration_seen_content(conn: sqlite3.Connection):
+    """Capas del filtro de Bloom de contenido ya aprendido, por ventana de tiempo"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS seen_content_filters (
+            window_start INTEGER NOT NULL,
+            layer INTEGER NOT NULL,
+            capacity INTEGER NOT NULL,
+            error_rate REAL NOT NULL,
+            hash_count INTEGER NOT NULL,
+            items INTEGER DEFAULT 0,
+            bits BLOB NOT NULL,
+            PRIMARY KEY (window_start, layer)
+        )
+    """)
+
+
+def _migration_seen_content_chunks(conn: sqlite3.Connection):
+    """Bits del filtro de contenido visto en trozos versionados, combinables entre procesos"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS seen_content_layers (
+            window_start INTEGER NOT NULL,
+            layer INTEGER NOT NULL,
+            capacity INTEGER NOT NULL,
+            error_rate REAL NOT NULL,
+            hash_count INTEGER NOT NULL,
+            items INTEGER DEFAULT 0,
+            version INTEGER DEFAULT 0,
+            PRIMARY KEY (window_start, layer)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS seen_content_chunks (
+            window_start INTEGER NOT NULL,
+            layer INTEGER NOT NULL,
+            chunk INTEGER NOT NULL,
+            version INTEGER NOT NULL,
+            bits BLOB NOT NULL,
+            PRIMARY KEY (window_start, layer, chunk)
+        )
+    """)
+    # Las capas guardadas enteras pasan a la versión 1 (los trozos vacíos no se guardan)
+    for window_start, layer, capacity, error_rate, hash_count, items, bits in conn.execute(
+            "SELECT window_start, layer, capacity, error_rate, hash_count, items, bits FROM seen_content_filters"
+    ).fetchall():
+        conn.execute("""
+            INSERT OR IGNORE INTO seen_content_layers
+            (window_start, layer, capacity, error_rate, hash_count, items, version) VALUES (?, ?, ?, ?, ?, ?, 1)
+        """, (window_start, layer, capacity, error_rate, hash_count, items))
+        conn.executemany("""
+            INSERT OR IGNORE INTO seen_content_chunks (window_start, layer, chunk, version, bits)
+            VALUES (?, ?, ?, 1, ?)
+        """, [(window_start, layer, offset // CHUNK_BYTES, bits[offset:offset + CHUNK_BYTES])
+              for offset in range(0, len(bits), CHUNK_BYTES) if any(bits[offset:offset + CHUNK_BYTES])])
+    conn.execute("DROP TABLE seen_content_filters")
+
+
+MIGRATIONS = [_migration_seen_content, _migration_seen_content_chunks]
+
+
+class SeenContentFilter:
+    """
+    Contenido ya ingerido, compartido por todas las fuentes de aprendizaje.
+
+    Hay un filtro escalable por ventana de `window_seconds`; se consultan las
+    últimas `windows` ventanas y solo se añade a la actual. Al cambiar de
+    ventana se descartan las que quedan fuera, así un texto visto hace
+    mucho vuelve a contar. Las fuentes consultan con un SeenContentBatch y
+    sus hashes se añaden con save(conn, batch) dentro de la misma
+    transacción que el vocabulario que los produjo. Si esa escritura falla
+    hay que llamar a reset(): el filtro se vuelve a cargar de la base de
+    datos y olvida lo que no llegó a confirmarse.
+
+    Cada proceso (servidor y proceso de aprendizaje) tiene su copia en
+    memoria. save() primero combina con OR los trozos que otro proceso
+    guardó desde la última vez (por versión de capa) y después escribe solo
+    los trozos de CHUNK_BYTES que este lote modificó, así ninguno pisa los
+    bits del otro ni reescribe la capa entera.
+    """
+
+    def __init__(self, store, window_seconds: float = 7 * 24 * 3600, windows: int = 2,
+                 capacity: int = 100000, error_rate: float = 0.001):
+        self.store = store
+        store.migrate(MIGRATIONS)
+        self.window_seconds = window_seconds
+        self.windows = windows
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.stats = {'checked': 0, 'skipped': 0, 'chunks_written': 0}
+        self._filters: Optional[Dict[int, ScalableBloomFilter]] = None
+        self._expired: set = set()
+        self._lock = threading.Lock()
+
+    def batch(self) -> SeenContentBatch:
+        """Nuevo lote de textos por confirmar"""
+        return SeenContentBatch(self)
+
+    def contains_any(self, digests: Iterable[Tuple[int, int]]) -> List[bool]:
+        """Si cada hash está en alguna de las ventanas vigentes"""
+        with self._lock:
+            self._current_filter()
+            filters = list(self._filters.values())
+            return [any(digest in f for f in filters) for digest in digests]
+
+    def count(self, checked: int, skipped: int):
+        with self._lock:
+            self.stats['checked'] += checked
+            self.stats['skipped'] += skipped
+
+    def save(self, conn: sqlite3.Connection, batch: Optional[SeenContentBatch] = None):
+        """
+        Combinar la ventana actual con la guardada, añadirle los hashes del
+        lote y guardar los trozos modificados y las ventanas caducadas (en la
+        transacción del llamador)
+        """
+        with self._lock:
+            start, current = self._current_filter()
+            expired, self._expired = self._expired, set()
+            for window_start in expired:
+                conn.execute("DELETE FROM seen_content_layers WHERE window_start = ?", (window_start,))
+                conn.execute("DELETE FROM seen_content_chunks WHERE window_start = ?", (window_start,))
+            self._merge_stored(conn, start, current)
+            for digest in batch if batch is not None else ():
+                # Otro lote (u otro proceso) pudo confirmar el mismo texto mientras tanto
+                if digest not in current:
+                    current.add(digest)
+            self._write_dirty(conn, start, current)
+
+    def _merge_stored(self, conn: sqlite3.Connection, start: int, bloom: ScalableBloomFilter):
+        """OR de los trozos que otros procesos guardaron en la ventana desde la última sincronización"""
+        stored = conn.execute("""
+            SELECT layer, capacity, error_rate, hash_count, items, version
+            FROM seen_content_layers WHERE window_start = ? ORDER BY layer
+        """, (start,)).fetchall()
+        for index, capacity, error_rate, hash_count, items, version in stored:
+            layer = bloom.layer(index, capacity, error_rate, hash_count)
+            if version <= layer.version:
+                continue
+            for chunk, bits in conn.execute("""
+                SELECT chunk, bits FROM seen_content_chunks
+                WHERE window_start = ? AND layer = ? AND version > ?
+            """, (start, index, layer.version)):
+                layer.merge_chunk(chunk, bits)
+            layer.items = items + layer.unsynced_items
+            layer.version = version
+
+    def _write_dirty(self, conn: sqlite3.Connection, start: int, bloom: ScalableBloomFilter):
+        """Guardar los trozos modificados de cada capa con una versión nueva"""
+        for index, layer in enumerate(bloom.layers):
+            if not layer.dirty:
+                continue
+            layer.version += 1
+            conn.execute("""
+                INSERT INTO seen_content_layers
+                (window_start, layer, capacity, error_rate, hash_count, items, version)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(window_start, layer) DO UPDATE SET
+                    items = excluded.items,
+                    version = excluded.version
+            """, (start, index, layer.capacity, layer.error_rate, layer.hash_count, layer.items, layer.version))
+            conn.executemany("""
+                INSERT INTO seen_content_chunks (window_start, layer, chunk, version, bits)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(window_start, layer, chunk) DO UPDATE SET
+                    version = excluded.version,
+                    bits = excluded.bits
+            """, [(start, index, chunk, layer.version, layer.chunk(chunk)) for chunk in sorted(layer.dirty)])
+            self.stats['chunks_written'] += len(layer.dirty)
+            layer.dirty.clear()
+            layer.unsynced_items = 0
+
+    def snapshot(self) -> List[Tuple[int, float, int, int, bytes]]:
+        """Capas de las ventanas vigentes (capacidad, error, hashes, elementos, bits) para otro proceso"""
+        with self._lock:
+            self._current_filter()
+            return [(layer.capacity, layer.error_rate, layer.hash_count, layer.items, bytes(layer.bits))
+                    for bloom in self._filters.values() for layer in bloom.layers]
+
+    def reset(self):
+        """Olvidar el estado en memoria; se vuelve a cargar lo confirmado en la base de datos"""
+        with self._lock:
+            self._filters = None
+            self._expired = set()
+
+    def get_stats(self) -> Dict:
+        """Textos consultados, omitidos y elementos por ventana"""
+        with self._lock:
+            self._current_filter()
+            windows = {start: bloom.items for start, bloom in self._filters.items()}
+            return {**self.stats, 'windows': windows}
+
+    def _window_start(self) -> int:
+        return int(time.time() // self.window_seconds * self.window_seconds)
+
+    def _current_filter(self) -> Tuple[int, ScalableBloomFilter]:
+        """(inicio, filtro) de la ventana actual, cargando y rotando las ventanas si hace falta"""
+        if self._filters is None:
+            self._filters = self._load()
+        start = self._window_start()
+        if start not in self._filters:
+            self._filters[start] = ScalableBloomFilter(self.capacity, self.error_rate)
+            oldest = start - (self.windows - 1) * self.window_seconds
+            for window_start in [w for w in self._filters if w < oldest]:
+                del self._filters[window_start]
+                self._expired.add(window_start)
+        return start, self._filters[start]
+
+    def _load(self) -> Dict[int, ScalableBloomFilter]:
+        """Ventanas guardadas que siguen vigentes"""
+        oldest = self._window_start() - (self.windows - 1) * self.window_seconds
+        filters: Dict[int, ScalableBloomFilter] = {}
+        try:
+            with self.store.connection() as conn:
+                layers = conn.execute("""
+                    SELECT window_start, layer, capacity, error_rate, hash_count, items, version
+                    FROM seen_content_layers WHERE window_start >= ?
+                    ORDER BY window_start, layer
+                """, (oldest,)).fetchall()
+                chunks = conn.execute("""
+                    SELECT window_start, layer, chunk, bits FROM seen_content_chunks WHERE window_start >= ?
+                """, (oldest,)).fetchall()
+                self._expired.update(row[0] for row in conn.execute(
+                    "SELECT DISTINCT window_start FROM seen_content_layers WHERE window_start < ?", (oldest,)
+                ))
+        except Exception as e:
+            logger.warning(f"No se pudo cargar el filtro de contenido visto: {e}")
+            return filters
+        for window_start, index, capacity, error_rate, hash_count, items, version in layers:
+            bloom = filters.setdefault(window_start, ScalableBloomFilter(self.capacity, self.error_rate))
+            layer = bloom.layer(index, capacity, error_rate, hash_count)
+            layer.items = items
+            layer.version = version
+        for window_start, index, chunk, bits in chunks:
+            bloom = filters.get(window_start)
+            if bloom is not None and index < len(bloom.layers):
+                bloom.layers[index].merge_chunk(chunk, bits)
+        return filters
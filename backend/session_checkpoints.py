@@ -0,0 +1,189 @@
+"""
+Puntos de control de las sesiones de aprendizaje continuo
+Cada sesión guarda periódicamente, por fuente, su avance confirmado (cursor,
+palabras, expresiones y estado) y un latido. Al arrancar la siguiente sesión
+las que quedaron 'running' sin latido reciente o sin proceso vivo se marcan
+como 'aborted' y la nueva sesión retoma las fuentes que no terminaron.
+"""
+
+import os
+import sqlite3
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from vocabulary_store import add_column
+
+logger = logging.getLogger(__name__)
+
+# Estados de fuente que no hace falta repetir al reanudar una sesión
+FINISHED_SOURCE_STATUSES = ("success", "disabled")
+
+
+def _migration_session_checkpoints(conn: sqlite3.Connection):
+    """Puntos de control de las sesiones de aprendizaje continuo, para reanudarlas tras un reinicio"""
+    add_column(conn, "continuous_learning_log", "heartbeat_at", "TEXT")
+    add_column(conn, "continuous_learning_log", "owner_pid", "INTEGER")
+    add_column(conn, "continuous_learning_log", "resumed_from", "INTEGER")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS continuous_learning_checkpoints (
+            session_id INTEGER NOT NULL,
+            source TEXT NOT NULL,
+            status TEXT DEFAULT 'running',
+            cursor TEXT,
+            words_learned INTEGER DEFAULT 0,
+            expressions_learned INTEGER DEFAULT 0,
+            updated_at TEXT,
+            PRIMARY KEY (session_id, source)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_continuous_log_status ON continuous_learning_log(status)")
+
+
+# Amplían continuous_learning_log: van detrás de su migración
+MIGRATIONS = [_migration_session_checkpoints]
+
+
+class SessionCheckpointer:
+    """
+    Avance de una sesión en curso.
+
+    report() se llama desde los hilos de las fuentes tras cada lote
+    confirmado; como mucho cada `interval_seconds` (y siempre al terminar una
+    fuente) se encola la escritura de los puntos de control y del latido sin
+    esperarla. El cursor es informativo: las fuentes reanudables continúan
+    desde sus propias posiciones guardadas (corpus y archivos de texto).
+    `on_save`, si se da, recibe {fuente: avance} en cada guardado.
+    """
+
+    def __init__(self, store, session_id: int, interval_seconds: float = 15.0, metrics=None,
+                 on_save: Optional[Callable[[Dict[str, Dict]], None]] = None):
+        self.store = store
+        self.session_id = session_id
+        self.metrics = metrics
+        self.on_save = on_save
+        self.interval_seconds = interval_seconds
+        self.sources: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._last_save = time.monotonic()
+
+    def report(self, source: str, cursor: Optional[str] = None, words: int = 0, expressions: int = 0,
+               status: str = "running", cpu_seconds: float = 0.0, new_words: int = 0):
+        """Sumar el avance (y la CPU gastada) de una fuente y guardarlo si toca"""
+        with self._lock:
+            entry = self.sources.setdefault(source, {"status": "running", "cursor": None, "words_learned": 0,
+                                                     "expressions_learned": 0, "new_words": 0,
+                                                     "cpu_seconds": 0.0})
+            entry["status"] = status
+            if cursor is not None:
+                entry["cursor"] = cursor
+            entry["words_learned"] += words
+            entry["expressions_learned"] += expressions
+            entry["new_words"] += new_words
+            entry["cpu_seconds"] += cpu_seconds
+            due = status != "running" or time.monotonic() - self._last_save >= self.interval_seconds
+        if due:
+            self.save()
+
+    def save(self):
+        """Encolar los puntos de control, las métricas por fase y el latido de la sesión"""
+        with self._lock:
+            self._last_save = time.monotonic()
+            now = datetime.now().isoformat()
+            rows = [(self.session_id, source, entry["status"], entry["cursor"], entry["words_learned"],
+                     entry["expressions_learned"], entry["cpu_seconds"], now)
+                    for source, entry in self.sources.items()]
+            progress = {source: dict(entry) for source, entry in self.sources.items()}
+
+        def save(conn):
+            conn.executemany("""
+                INSERT INTO continuous_learning_checkpoints
+                (session_id, source, status, cursor, words_learned, expressions_learned, cpu_seconds, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(session_id, source) DO UPDATE SET
+                    status = excluded.status,
+                    cursor = excluded.cursor,
+                    words_learned = excluded.words_learned,
+                    expressions_learned = excluded.expressions_learned,
+                    cpu_seconds = excluded.cpu_seconds,
+                    updated_at = excluded.updated_at
+            """, rows)
+            if self.metrics is not None:
+                self.metrics.save(conn, self.session_id)
+            conn.execute("UPDATE continuous_learning_log SET heartbeat_at = ? WHERE id = ?",
+                         (now, self.session_id))
+
+        ack = self.store.write(save, description="punto de control de sesión")
+        if self.on_save is not None:
+            try:
+                self.on_save(progress)
+            except Exception as e:
+                logger.warning(f"No se pudo avisar del avance de la sesión: {e}")
+        return ack
+
+    def new_words(self) -> int:
+        """Palabras que las escrituras de esta sesión insertaron por primera vez"""
+        with self._lock:
+            return sum(entry["new_words"] for entry in self.sources.values())
+
+
+def recover_stale_sessions(store, stale_seconds: float) -> List[Tuple[int, Dict[str, str]]]:
+    """
+    Marcar como 'aborted' las sesiones 'running' abandonadas y devolver
+    (id, {fuente: estado}) de cada una, de la más antigua a la más reciente.
+
+    Una sesión está abandonada si su proceso ya no existe (o es este mismo,
+    que no tiene ninguna en curso al llamar aquí) o si su último latido es
+    más antiguo que `stale_seconds`. Las palabras y expresiones ya
+    confirmadas se toman de sus puntos de control.
+    """
+    def recover(conn):
+        limit = (datetime.now() - timedelta(seconds=stale_seconds)).isoformat()
+        running = conn.execute("""
+            SELECT id, owner_pid, COALESCE(heartbeat_at, session_start) FROM continuous_learning_log
+            WHERE status = 'running' AND session_end IS NULL ORDER BY id
+        """).fetchall()
+        recovered = []
+        for session_id, owner_pid, heartbeat in running:
+            if not (owner_pid is None or owner_pid == os.getpid() or not _process_alive(owner_pid)
+                    or str(heartbeat) < limit):
+                continue
+            checkpoints = conn.execute("""
+                SELECT source, status, words_learned, expressions_learned
+                FROM continuous_learning_checkpoints WHERE session_id = ?
+            """, (session_id,)).fetchall()
+            conn.execute("""
+                UPDATE continuous_learning_log
+                SET session_end = CURRENT_TIMESTAMP,
+                    status = 'aborted',
+                    words_learned = ?,
+                    expressions_learned = ?,
+                    error_message = 'Sesión interrumpida antes de terminar'
+                WHERE id = ?
+            """, (sum(row[2] for row in checkpoints), sum(row[3] for row in checkpoints), session_id))
+            recovered.append((session_id, {row[0]: row[1] for row in checkpoints}))
+        return recovered
+
+    recovered = store.write(recover).result()
+    for session_id, sources in recovered:
+        logger.warning(f"Sesión {session_id} interrumpida marcada como abortada "
+                       f"(fuentes terminadas: {[s for s, st in sources.items() if st in FINISHED_SOURCE_STATUSES]})")
+    return recovered
+
+
+def _process_alive(pid: int) -> bool:
+    """True si existe un proceso con ese pid en esta máquina (en Windows solo cuenta el latido)"""
+    if os.name == "nt":
+        # os.kill(pid, 0) en Windows enviaría CTRL_C_EVENT
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
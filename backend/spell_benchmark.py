@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de precisión y latencia del corrector ortográfico
+Genera errores sintéticos en español y mide precision@k y latencia p50/p99
+de SpellChecker.check_spelling con vocabularios de distinto tamaño
+
+Uso:
+  python spell_benchmark.py --sizes 1000 10000 --queries 300 --output bench.json
+
+El informe es reproducible con la misma semilla; --timestamp añade la fecha
+de generación.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import unicodedata
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from massive_vocabulary import SPELLING_ERROR_PATTERNS
+from spell_checker import SpellChecker, SpellCheckConfig
+from vocabulary_store import release_store
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+DEFAULT_K = [1, 3, 5]
+
+# Palabras reales que siempre forman parte del vocabulario de prueba
+BASE_WORDS = [
+    "hola", "buenos", "días", "tardes", "noches", "gracias", "quiero", "necesito",
+    "busco", "encuentro", "compro", "vendo", "ayudo", "producto", "servicio",
+    "precio", "costo", "valor", "dinero", "pago", "cita", "consulta", "agenda",
+    "reserva", "horario", "fecha", "tiempo", "información", "detalles",
+    "especificaciones", "características", "garantía", "devolución", "reembolso",
+    "envío", "entrega", "llave", "perro", "guerra", "chico", "gente", "jamón",
+    "taxi", "agua", "zapato", "casa", "vender", "buscar", "kilo", "que", "año"
+]
+
+# Sílabas para generar palabras con fonotáctica parecida al español
+SYLLABLES = [
+    "ba", "be", "bi", "bo", "bu", "ca", "co", "cu", "ce", "ci", "cha", "che", "chi",
+    "da", "de", "di", "do", "du", "fa", "fe", "fi", "fo", "ga", "go", "gu", "gue",
+    "ja", "je", "jo", "la", "le", "li", "lo", "lu", "lla", "lle", "llo", "ma", "me",
+    "mi", "mo", "mu", "na", "ne", "ni", "no", "ña", "ño", "pa", "pe", "pi", "po",
+    "que", "qui", "ra", "re", "ri", "ro", "rra", "rre", "rro", "sa", "se", "si",
+    "so", "su", "ta", "te", "ti", "to", "tu", "va", "ve", "vi", "vo", "ya", "yo",
+    "za", "zo", "ción", "tán", "món", "rí", "dé", "al", "en", "es", "ar", "or"
+]
+
+
+def strip_accents(word: str) -> str:
+    """Quitar tildes conservando la ñ"""
+    return ''.join(
+        c for c in unicodedata.normalize('NFD', word.replace('ñ', '\0'))
+        if unicodedata.category(c) != 'Mn'
+    ).replace('\0', 'ñ')
+
+
+def add_accent(word: str, rng: random.Random) -> str:
+    """Poner tilde en una vocal al azar"""
+    accented = {'a': 'á', 'e': 'é', 'i': 'í', 'o': 'ó', 'u': 'ú'}
+    positions = [i for i, c in enumerate(word) if c in accented]
+    if not positions:
+        return word
+    i = rng.choice(positions)
+    return word[:i] + accented[word[i]] + word[i + 1:]
+
+
+def make_typo(word: str, rng: random.Random) -> Optional[Tuple[str, str]]:
+    """
+    Aplicar al azar una de las clases de error de
+    MassiveVocabularyManager.generate_spelling_variations
+    (sustitución de grafías, tildes omitidas o tildes incorrectas).
+
+    Devuelve (palabra con error, clase de error) o None si no aplica ninguna.
+    """
+    options = []
+    for original, replacements in SPELLING_ERROR_PATTERNS.items():
+        start = word.find(original)
+        while start != -1:
+            for replacement in replacements:
+                options.append((start, original, replacement))
+            start = word.find(original, start + 1)
+
+    rng.shuffle(options)
+    for start, original, replacement in options:
+        typo = word[:start] + replacement + word[start + len(original):]
+        if typo != word:
+            return typo, f"{original}->{replacement or 'Ø'}"
+
+    no_accents = strip_accents(word)
+    if no_accents != word:
+        return no_accents, "sin_tilde"
+
+    with_accent = add_accent(word, rng)
+    if with_accent != word:
+        return with_accent, "tilde_incorrecta"
+
+    return None
+
+
+def generate_vocabulary(size: int, rng: random.Random) -> List[str]:
+    """Vocabulario de `size` palabras: las palabras base más palabras sintéticas"""
+    words = set(BASE_WORDS[:size])
+    while len(words) < size:
+        syllable_count = rng.choice((2, 2, 3, 3, 3, 4, 4, 5))
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(syllable_count)))
+    return list(words)
+
+
+def generate_queries(vocabulary: List[str], count: int,
+                     rng: random.Random) -> List[Tuple[str, str, str]]:
+    """Pares (error, palabra correcta, clase) cuyo error no es a su vez una palabra válida"""
+    known = set(vocabulary)
+    candidates = [w for w in vocabulary if len(w) >= 4]
+    queries = []
+    attempts = 0
+
+    while len(queries) < count and attempts < count * 20:
+        attempts += 1
+        target = rng.choice(candidates)
+        typo = make_typo(target, rng)
+        if typo and typo[0] not in known and len(typo[0]) >= 3:
+            queries.append((typo[0], target, typo[1]))
+
+    return queries
+
+
+def build_spell_checker(db_path: str, vocabulary: List[str]) -> SpellChecker:
+    """Crear un SpellChecker sobre una base de datos temporal con el vocabulario dado"""
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS vocabulary (word TEXT PRIMARY KEY, frequency INTEGER DEFAULT 1)")
+        conn.executemany("INSERT OR IGNORE INTO vocabulary (word) VALUES (?)", ((w,) for w in vocabulary))
+        conn.commit()
+
+    # Sin caché de resultados ni sincronización para medir solo la búsqueda de candidatos
+    config = SpellCheckConfig(result_cache_size=0, refresh_seconds=float('inf'))
+    return SpellChecker(db_path=db_path, config=config)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Percentil por rango más cercano"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_size(size: int, query_count: int, ks: List[int], seed: int) -> Dict:
+    """Medir precisión y latencia con un vocabulario de `size` palabras"""
+    rng = random.Random(seed + size)
+    vocabulary = generate_vocabulary(size, rng)
+    queries = generate_queries(vocabulary, query_count, rng)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "benchmark.db")
+        try:
+            build_start = time.perf_counter()
+            checker = build_spell_checker(db_path, vocabulary)
+            build_seconds = time.perf_counter() - build_start
+
+            hits = {k: 0 for k in ks}
+            latencies_ms = []
+            by_error_class: Dict[str, Dict[str, int]] = {}
+
+            for typo, target, error_class in queries:
+                start = time.perf_counter()
+                result = checker.check_spelling(typo)
+                latencies_ms.append((time.perf_counter() - start) * 1000)
+
+                suggestions = result.get('suggestions', [])
+                for k in ks:
+                    if target in suggestions[:k]:
+                        hits[k] += 1
+
+                class_stats = by_error_class.setdefault(error_class, {'queries': 0, 'top1': 0})
+                class_stats['queries'] += 1
+                class_stats['top1'] += int(bool(suggestions) and suggestions[0] == target)
+        finally:
+            # Cerrar escritor y conexiones antes de borrar la base de datos temporal
+            release_store(db_path)
+
+    total = len(queries) or 1
+    return {
+        'vocabulary_size': size,
+        'queries': len(queries),
+        'build_seconds': round(build_seconds, 3),
+        'precision_at_k': {str(k): round(hits[k] / total, 4) for k in ks},
+        'latency_ms': {
+            'p50': round(percentile(latencies_ms, 0.50), 3),
+            'p99': round(percentile(latencies_ms, 0.99), 3),
+            'mean': round(sum(latencies_ms) / total, 3),
+            'max': round(max(latencies_ms, default=0.0), 3)
+        },
+        'by_error_class': dict(sorted(by_error_class.items()))
+    }
+
+
+def run_benchmark(sizes: List[int], query_count: int, ks: List[int], seed: int,
+                  timestamp: bool = False) -> Dict:
+    """
+    Ejecutar el benchmark completo y devolver un informe serializable
+    (con timestamp=True incluye la fecha de generación)
+    """
+    config = SpellCheckConfig()
+    report = {
+        'seed': seed,
+        'queries_per_size': query_count,
+        'spell_check_config': {
+            'min_similarity': config.min_similarity,
+            'max_edit_distance': config.max_edit_distance,
+            'context_weight': config.context_weight,
+            'max_confusion_edits': config.max_confusion_edits,
+            'max_confusion_candidates': config.max_confusion_candidates
+        },
+        'results': []
+    }
+    if timestamp:
+        report['generated_at'] = datetime.now().isoformat()
+
+    for size in sizes:
+        print(f"📏 Vocabulario de {size:,} palabras...")
+        result = run_size(size, query_count, ks, seed)
+        report['results'].append(result)
+        print(f"   precision@k: {result['precision_at_k']} | "
+              f"p50: {result['latency_ms']['p50']} ms | p99: {result['latency_ms']['p99']} ms")
+
+    return report
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Benchmark del corrector ortográfico")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="Tamaños de vocabulario a medir")
+    parser.add_argument("--queries", type=int, default=500, help="Errores sintéticos por tamaño")
+    parser.add_argument("--k", type=int, nargs="+", default=DEFAULT_K, help="Valores de k para precision@k")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla para resultados reproducibles")
+    parser.add_argument("--output", default="spell_benchmark.json", help="Archivo JSON de resultados")
+    parser.add_argument("--timestamp", action="store_true", help="Incluir la fecha de generación en el informe")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.sizes, args.queries, sorted(args.k), args.seed, timestamp=args.timestamp)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+    print(f"✅ Resultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,14 +4,33 @@ Para hacer el chatbot más robusto con errores de escritura
 """
 
 import re
-import difflib
-from typing import List, Dict, Tuple, Optional
+import math
+from typing import List, Dict, Tuple, Optional, Set, Iterable, Iterator
 from dataclasses import dataclass
-import sqlite3
 import logging
+import time
+import threading
+from collections import OrderedDict
+
+from edit_distance import LengthBucketIndex, damerau_levenshtein
+from vocabulary_store import get_store
+from context_model import BigramContextModel
 
 logger = logging.getLogger(__name__)
 
+# Mapeo de sonidos para español (Soundex simplificado)
+SOUNDEX_MAP = {
+    'b': '1', 'f': '1', 'p': '1', 'v': '1',
+    'c': '2', 'g': '2', 'j': '2', 'k': '2', 'q': '2', 's': '2', 'x': '2', 'z': '2',
+    'd': '3', 't': '3',
+    'l': '4',
+    'm': '5', 'n': '5', 'ñ': '5',
+    'r': '6'
+}
+
+# Caracteres que se eliminan de cada palabra antes de verificarla
+TOKEN_CLEAN_PATTERN = re.compile(r'[^\wáéíóúñü]')
+
 @dataclass
 class SpellCheckConfig:
     """Configuración del corrector ortográfico"""
@@ -19,85 +38,388 @@ class SpellCheckConfig:
     min_similarity: float = 0.7
     max_edit_distance: int = 3
     
+    # Tamaño mínimo de cubeta para usar la distancia vectorizada con NumPy
+    numpy_batch_min_size: int = 256
+    
+    # Peso del modelo de bigramas al ordenar sugerencias (0 = solo distancia de edición)
+    context_weight: float = 0.3
+    
     # Configuración de variaciones
     enable_fuzzy_matching: bool = True
     enable_soundex: bool = True
     enable_common_errors: bool = True
     
-    # Errores comunes en español
-    common_errors: Dict[str, str] = None
+    # Longitud mínima de las palabras verificadas en textos completos
+    min_token_length: int = 3
+    
+    # Resultados memorizados de palabras desconocidas (0 = sin caché)
+    result_cache_size: int = 5000
+    
+    # Palabras nuevas hasta las que se invalidan solo los resultados que alcanzan;
+    # con más (p. ej. tras ingerir un corpus) se vacía el caché entero
+    selective_invalidation_max_words: int = 50
+    
+    # Segundos entre sincronizaciones con vocabulario y variaciones escritos por otros procesos
+    refresh_seconds: float = 5.0
+    
+    # Conjuntos de confusión del español: cada grafía puede escribirse como cualquier otra
+    # del mismo conjunto ('' representa una letra muda que se omite o se añade)
+    confusion_sets: List[Tuple[str, ...]] = None
+    
+    # Ediciones combinadas por palabra y tope de candidatos generados por palabra
+    max_confusion_edits: int = 2
+    max_confusion_candidates: int = 400
     
     def __post_init__(self):
-        if self.common_errors is None:
-            self.common_errors = {
-                # Errores de acentuación
-                'a': 'á', 'e': 'é', 'i': 'í', 'o': 'ó', 'u': 'ú',
-                'n': 'ñ',
-                # Errores comunes
-                'b': 'v', 'v': 'b',
-                'c': 's', 's': 'c',
-                'g': 'j', 'j': 'g',
-                'll': 'y', 'y': 'll',
-                'h': '',  # H muda
-                'x': 's', 's': 'x',
-                'z': 's', 's': 'z'
-            }
+        if self.confusion_sets is None:
+            self.confusion_sets = [
+                ('b', 'v'),
+                ('c', 's', 'z'),
+                ('c', 'k', 'qu'),
+                ('ll', 'y'),
+                ('g', 'j'),
+                ('x', 's'),
+                ('h', ''),  # H muda
+                ('r', 'rr'),
+                ('ñ', 'n', 'ni'),
+                # Acentos
+                ('a', 'á'), ('e', 'é'), ('i', 'í'), ('o', 'ó'), ('u', 'ú', 'ü'),
+            ]
 
 class SpellChecker:
     """Sistema de corrección ortográfica y manejo de variaciones"""
     
-    def __init__(self, db_path: str = "optimized_learning.db", config: Optional[SpellCheckConfig] = None):
+    def __init__(self, db_path: str = "optimized_learning.db", config: Optional[SpellCheckConfig] = None,
+                 context_model: Optional[BigramContextModel] = None):
         self.db_path = db_path
         self.config = config or SpellCheckConfig()
-        self._init_database()
+        self.context_model = context_model
+        self._confusion_table = self._build_confusion_table()
+        # Distancia de edición que pueden recorrer las ediciones de confusión combinadas
+        self._confusion_reach = self.config.max_confusion_edits * max(
+            (max(len(spelling), len(option)) for spelling, options in self._confusion_table for option in options),
+            default=0
+        )
+        
+        # Caché de resultados: una generación nueva lo invalida entero; las
+        # palabras añadidas, solo las entradas a las que pueden llegar
+        self.vocabulary_generation = 0
+        self._result_cache: "OrderedDict[Tuple[str, int], Dict]" = OrderedDict()
+        self._result_cache_lock = threading.Lock()
+        self._result_invalidations = 0
+        self.result_cache_stats = {'hits': 0, 'misses': 0}
+        
+        # El almacén compartido crea las tablas de variaciones y códigos fonéticos
+        self.store = get_store(db_path)
+        self.change_feed = self.store.change_feed
+        self._last_refresh = time.monotonic()
         self._load_vocabulary_cache()
-    
-    def _init_database(self):
-        """Inicializar tabla para variaciones ortográficas"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS spelling_variations (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    correct_word TEXT NOT NULL,
-                    variation TEXT NOT NULL,
-                    similarity REAL DEFAULT 0.0,
-                    error_type TEXT DEFAULT 'unknown',
-                    frequency INTEGER DEFAULT 1,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(correct_word, variation)
-                )
-            """)
-            conn.commit()
+        self._load_variations_cache()
     
     def _load_vocabulary_cache(self):
-        """Cargar vocabulario en caché para búsquedas rápidas"""
+        """Cargar vocabulario y su índice fonético en caché para búsquedas rápidas"""
+        self.vocabulary_cache: Set[str] = set()
+        self.soundex_index: Dict[str, Set[str]] = {}
+        self.length_index = LengthBucketIndex(numpy_min_bucket=self.config.numpy_batch_min_size)
+        
+        # Marca tomada antes de leer: los cambios concurrentes se reaplican sin efecto
+        try:
+            self._vocabulary_seq = self.change_feed.latest_seq()
+        except Exception as e:
+            logger.warning(f"No se pudo leer el feed de vocabulario: {e}")
+            self._vocabulary_seq = 0
+        
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.execute("SELECT word FROM vocabulary")
-                self.vocabulary_cache = {row[0].lower() for row in cursor.fetchall()}
+            missing_codes = []
+            for word, code in self.store.iter_words_with_codes():
+                if code is None:
+                    code = self._soundex(word.lower())
+                    missing_codes.append((word, code))
+                self._index_word(word.lower(), code)
+            
+            # Persistir solo los códigos que faltaban
+            if missing_codes:
+                self.store.save_phonetic_codes(missing_codes)
+                logger.info(f"Índice fonético actualizado: {len(missing_codes)} palabras nuevas")
         except Exception as e:
             logger.warning(f"No se pudo cargar vocabulario: {e}")
-            self.vocabulary_cache = set()
     
-    def check_spelling(self, word: str) -> Dict:
-        """Verificar ortografía y sugerir correcciones"""
+    def _load_variations_cache(self):
+        """Cargar variaciones conocidas en memoria (variación -> palabra correcta)"""
+        self.variations_cache: Dict[str, str] = {}
+        self._variations_watermark = 0
+        self._variations_lock = threading.Lock()
+        self._apply_variation_rows()
+    
+    def _apply_variation_rows(self):
+        """Incorporar al caché las variaciones con id posterior a la última marca leída"""
+        try:
+            with self._variations_lock:
+                rows = self.store.variations_since(self._variations_watermark)
+                
+                for row_id, variation, correct_word in rows:
+                    self.variations_cache[variation] = correct_word
+                    self._variations_watermark = row_id
+            if rows:
+                # Una variación solo cambia el resultado de la propia variación
+                self._invalidate_results(words=[variation for _, variation, _ in rows])
+        except Exception as e:
+            logger.warning(f"No se pudieron cargar variaciones: {e}")
+    
+    def _apply_vocabulary_changes(self):
+        """Aplicar las palabras nuevas o eliminadas desde la última marca del feed"""
+        try:
+            changes = self.change_feed.changes_since(self._vocabulary_seq)
+        except Exception as e:
+            logger.warning(f"No se pudo leer el feed de vocabulario: {e}")
+            return
+        
+        if changes is None:
+            # El feed fue compactado por encima de nuestra marca: recarga completa
+            self._load_vocabulary_cache()
+            self._bump_generation()
+            return
+        
+        for word in changes.removed:
+            self._unindex_word(word)
+        self.add_words(changes.added)
+        self._vocabulary_seq = changes.seq
+        if changes.removed:
+            self._bump_generation()
+    
+    def refresh(self):
+        """Sincronizar vocabulario y variaciones escritos por otros procesos"""
+        self._last_refresh = time.monotonic()
+        self._apply_vocabulary_changes()
+        self._apply_variation_rows()
+        if self.context_model is not None:
+            self.context_model.refresh()
+    
+    def mark_stale(self):
+        """Forzar la sincronización en la próxima verificación (p. ej. tras un aviso de otro proceso)"""
+        self._last_refresh = float('-inf')
+    
+    def _maybe_refresh(self):
+        """Sincronizar con la base de datos como mucho una vez por intervalo"""
+        if time.monotonic() - self._last_refresh >= self.config.refresh_seconds:
+            self.refresh()
+    
+    def _bump_generation(self):
+        """Invalidar los resultados memorizados tras un cambio de vocabulario o variaciones"""
+        with self._result_cache_lock:
+            self.vocabulary_generation += 1
+            # Las entradas de generaciones anteriores ya no pueden usarse
+            self._result_cache.clear()
+    
+    def _invalidate_results(self, added: Iterable[Tuple[str, str]] = (), words: Iterable[str] = ()):
+        """
+        Descartar solo los resultados memorizados que un cambio puede alterar:
+        los de `words` y aquellos a los que llega alguna palabra de `added`
+        (pares palabra, código fonético), por código fonético o por distancia
+        de edición dentro del umbral de la búsqueda difusa o de las ediciones
+        de confusión. Con muchas palabras nuevas se cambia de generación.
+        """
+        added = list(added)
+        if len(added) > self.config.selective_invalidation_max_words:
+            self._bump_generation()
+            return
+        
+        words = set(words)
+        codes = {code for _, code in added}
+        with self._result_cache_lock:
+            self._result_invalidations += 1
+            stale = [key for key in self._result_cache if key[0] in words or self._reaches(key[0], added, codes)]
+            for key in stale:
+                del self._result_cache[key]
+    
+    def _reaches(self, word: str, added: List[Tuple[str, str]], codes: Set[str]) -> bool:
+        """True si alguna palabra nueva puede aparecer entre las sugerencias de `word`"""
+        if not added:
+            return False
+        if self._soundex(word) in codes:
+            return True
+        reach = max(self._max_distance_for(word), self._confusion_reach)
+        return any(damerau_levenshtein(word, new_word, reach) <= reach for new_word, _ in added)
+    
+    def get_cache_stats(self) -> Dict:
+        """Obtener estadísticas del caché de resultados"""
+        hits = self.result_cache_stats['hits']
+        misses = self.result_cache_stats['misses']
+        return {
+            'size': len(self._result_cache),
+            'max_size': self.config.result_cache_size,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+            'generation': self.vocabulary_generation
+        }
+    
+    def _index_word(self, word: str, code: Optional[str] = None):
+        """Agregar una palabra al caché de vocabulario y al índice fonético"""
+        self.vocabulary_cache.add(word)
+        self.length_index.add(word)
+        self.soundex_index.setdefault(code or self._soundex(word), set()).add(word)
+    
+    def _unindex_word(self, word: str):
+        """Eliminar una palabra del caché de vocabulario y de sus índices"""
+        if word not in self.vocabulary_cache:
+            return
+        
+        self.vocabulary_cache.discard(word)
+        self.length_index.discard(word)
+        code = self._soundex(word)
+        bucket = self.soundex_index.get(code)
+        if bucket is not None:
+            bucket.discard(word)
+            if not bucket:
+                del self.soundex_index[code]
+    
+    def add_words(self, words: Iterable[str]):
+        """Registrar palabras correctas en caché, índice fonético y base de datos"""
+        new_codes = []
+        for word in words:
+            word_lower = word.lower()
+            if word_lower and word_lower not in self.vocabulary_cache:
+                code = self._soundex(word_lower)
+                self._index_word(word_lower, code)
+                new_codes.append((word_lower, code))
+        
+        if not new_codes:
+            return
+        
+        self._invalidate_results(added=new_codes)
+        # Los códigos solo aceleran la próxima carga: no hace falta esperar al escritor
+        self.store.write(lambda conn: self.store.save_phonetic_codes(new_codes, conn=conn),
+                         description="códigos fonéticos")
+    
+    def check_spelling(self, word: str, previous: Optional[str] = None,
+                       following: Optional[str] = None) -> Dict:
+        """Verificar ortografía y sugerir correcciones (opcionalmente con palabras vecinas)"""
+        self._maybe_refresh()
         word_lower = word.lower()
+        result = self._rank_with_context(word_lower, self._check_word(word_lower), previous, following)
+        return {'original': word, **result}
+    
+    def tokenize(self, text: str) -> List[Tuple[str, str]]:
+        """Dividir texto en pares (palabra original, palabra limpia) a verificar"""
+        return [
+            (original, clean) for original, clean in self._split_words(text)
+            if len(clean) >= self.config.min_token_length
+        ]
+    
+    def _split_words(self, text: str) -> List[Tuple[str, str]]:
+        """Todas las palabras del texto como pares (original, limpia), sin filtrar longitud"""
+        words = []
+        for word in text.split():
+            # Limpiar palabra de puntuación
+            clean_word = TOKEN_CLEAN_PATTERN.sub('', word.lower())
+            if clean_word:
+                words.append((word, clean_word))
+        return words
+    
+    def check_text(self, text: str) -> List[Dict]:
+        """Verificar la ortografía de un texto completo y devolver sus errores"""
+        return self.check_texts([text])[0]
+    
+    def check_texts(self, texts: Iterable[str]) -> List[List[Dict]]:
+        """Verificar varios textos resolviendo cada palabra distinta una sola vez"""
+        self._maybe_refresh()
+        split_texts = [self._split_words(text) for text in texts]
         
+        # Las palabras del vocabulario se descartan en bloque; solo el resto se analiza
+        unique_words = {
+            clean for words in split_texts for _, clean in words
+            if len(clean) >= self.config.min_token_length
+        }
+        results = {word: self._check_word(word) for word in unique_words - self.vocabulary_cache}
+        
+        corrections = []
+        for words in split_texts:
+            text_corrections = []
+            for position, (original, clean) in enumerate(words):
+                result = results.get(clean)
+                if result is None:
+                    continue
+                
+                # Reordenar sugerencias según las palabras vecinas de esta aparición
+                previous = words[position - 1][1] if position > 0 else None
+                following = words[position + 1][1] if position + 1 < len(words) else None
+                result = self._rank_with_context(clean, result, previous, following)
+                
+                correction = {
+                    'original': original,
+                    'suggestions': result['suggestions'],
+                    'confidence': result['confidence'],
+                    'error_type': result['error_type']
+                }
+                if 'corrected' in result:
+                    correction['corrected'] = result['corrected']
+                text_corrections.append(correction)
+            corrections.append(text_corrections)
+        
+        return corrections
+    
+    def _rank_with_context(self, word_lower: str, result: Dict, previous: Optional[str],
+                           following: Optional[str]) -> Dict:
+        """Combinar la puntuación de edición con la probabilidad de bigramas del contexto"""
+        if self.context_model is None or len(result['suggestions']) < 2:
+            return result
+        
+        context = self.context_model.context_scores(result['suggestions'], previous, following)
+        if context is None:
+            return result
+        
+        weight = self.config.context_weight
+        ranked = sorted(
+            ((suggestion, (1 - weight) * score + weight * context[suggestion])
+             for suggestion, score in self._score_suggestions(word_lower, result['suggestions'])),
+            key=lambda x: x[1], reverse=True
+        )
+        return {
+            **result,
+            'suggestions': [s for s, _ in ranked],
+            'confidence': ranked[0][1]
+        }
+    
+    def _check_word(self, word_lower: str) -> Dict:
+        """Verificar una palabra ya normalizada a minúsculas"""
         # Si la palabra está en el vocabulario, está correcta
         if word_lower in self.vocabulary_cache:
             return {
                 'is_correct': True,
-                'original': word,
                 'suggestions': [],
                 'confidence': 1.0
             }
         
+        key = (word_lower, self.vocabulary_generation)
+        with self._result_cache_lock:
+            cached = self._result_cache.get(key)
+            if cached is not None:
+                self._result_cache.move_to_end(key)
+                self.result_cache_stats['hits'] += 1
+                return cached
+            self.result_cache_stats['misses'] += 1
+            invalidations = self._result_invalidations
+        
+        result = self._check_unknown_word(word_lower)
+        
+        if self.config.result_cache_size > 0:
+            with self._result_cache_lock:
+                # Una invalidación durante el cálculo pudo dejar este resultado atrasado
+                if self._result_invalidations == invalidations:
+                    self._result_cache[key] = result
+                    while len(self._result_cache) > self.config.result_cache_size:
+                        self._result_cache.popitem(last=False)
+        
+        return result
+    
+    def _check_unknown_word(self, word_lower: str) -> Dict:
+        """Buscar variación conocida o sugerencias para una palabra fuera del vocabulario"""
         # Buscar variaciones conocidas
         known_variation = self._find_known_variation(word_lower)
         if known_variation:
             return {
                 'is_correct': False,
-                'original': word,
                 'corrected': known_variation,
                 'suggestions': [known_variation],
                 'confidence': 0.9,
@@ -112,10 +434,10 @@ class SpellChecker:
             fuzzy_suggestions = self._fuzzy_search(word_lower)
             suggestions.extend(fuzzy_suggestions)
         
-        # 2. Corrección de errores comunes
+        # 2. Corrección de errores comunes del español
         if self.config.enable_common_errors:
-            common_error_suggestions = self._fix_common_errors(word_lower)
-            suggestions.extend(common_error_suggestions)
+            confusion_suggestions = self._confusion_search(word_lower)
+            suggestions.extend(confusion_suggestions)
         
         # 3. Búsqueda por similitud de sonido
         if self.config.enable_soundex:
@@ -128,7 +450,6 @@ class SpellChecker:
         
         return {
             'is_correct': False,
-            'original': word,
             'suggestions': [s for s, _ in scored_suggestions[:5]],
             'confidence': scored_suggestions[0][1] if scored_suggestions else 0.0,
             'error_type': 'spelling_error'
@@ -136,62 +457,70 @@ class SpellChecker:
     
     def _find_known_variation(self, word: str) -> Optional[str]:
         """Buscar si la palabra es una variación conocida"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute(
-                "SELECT correct_word FROM spelling_variations WHERE variation = ?",
-                (word,)
-            )
-            result = cursor.fetchone()
-            return result[0] if result else None
+        return self.variations_cache.get(word)
     
     def _fuzzy_search(self, word: str) -> List[str]:
-        """Búsqueda difusa por similitud"""
-        suggestions = []
-        
-        for vocab_word in self.vocabulary_cache:
-            similarity = difflib.SequenceMatcher(None, word, vocab_word).ratio()
-            if similarity >= self.config.min_similarity:
-                suggestions.append(vocab_word)
-        
-        return suggestions
+        """Búsqueda difusa por distancia de edición acotada"""
+        matches = self.length_index.search(word, self._max_distance_for(word))
+        return [vocab_word for vocab_word, _ in matches]
     
-    def _fix_common_errors(self, word: str) -> List[str]:
-        """Corregir errores comunes en español"""
-        suggestions = []
+    def _max_distance_for(self, word: str) -> int:
+        """Umbral de edición proporcional a la longitud, limitado por max_edit_distance"""
+        proportional = math.ceil(len(word) * (1 - self.config.min_similarity))
+        return max(1, min(self.config.max_edit_distance, proportional))
+    
+    def _build_confusion_table(self) -> List[Tuple[str, List[str]]]:
+        """Tabla grafía -> alternativas a partir de los conjuntos de confusión"""
+        alternatives: Dict[str, List[str]] = {}
+        for confusion_set in self.config.confusion_sets:
+            for spelling in confusion_set:
+                options = alternatives.setdefault(spelling, [])
+                options.extend(o for o in confusion_set if o != spelling and o not in options)
         
-        # Aplicar correcciones de errores comunes
-        for error, correction in self.config.common_errors.items():
-            if error in word:
-                corrected = word.replace(error, correction)
-                if corrected in self.vocabulary_cache:
-                    suggestions.append(corrected)
+        # Grafías largas primero para que 'll' o 'qu' se traten como una unidad
+        return sorted(alternatives.items(), key=lambda item: len(item[0]), reverse=True)
+    
+    def _single_confusion_edits(self, word: str) -> Iterator[str]:
+        """Palabras a una edición de confusión: sustituir, omitir o añadir una grafía"""
+        for position in range(len(word) + 1):
+            for spelling, options in self._confusion_table:
+                if spelling and not word.startswith(spelling, position):
+                    continue
+                rest = word[position + len(spelling):]
+                for option in options:
+                    yield word[:position] + option + rest
+    
+    def _confusion_candidates(self, word: str) -> Iterator[str]:
+        """Ediciones simples y dobles de confusión, limitadas a max_confusion_candidates"""
+        seen = {word}
+        frontier = [word]
+        generated = 0
         
-        return suggestions
+        for _ in range(self.config.max_confusion_edits):
+            next_frontier = []
+            for source in frontier:
+                for candidate in self._single_confusion_edits(source):
+                    if candidate in seen:
+                        continue
+                    seen.add(candidate)
+                    next_frontier.append(candidate)
+                    yield candidate
+                    
+                    generated += 1
+                    if generated >= self.config.max_confusion_candidates:
+                        return
+            frontier = next_frontier
+    
+    def _confusion_search(self, word: str) -> List[str]:
+        """Candidatos de confusión que existen en el vocabulario"""
+        return [c for c in self._confusion_candidates(word) if c in self.vocabulary_cache]
     
     def _soundex_search(self, word: str) -> List[str]:
         """Búsqueda por similitud de sonido usando Soundex"""
-        word_soundex = self._soundex(word)
-        suggestions = []
-        
-        for vocab_word in self.vocabulary_cache:
-            vocab_soundex = self._soundex(vocab_word)
-            if word_soundex == vocab_soundex:
-                suggestions.append(vocab_word)
-        
-        return suggestions
+        return list(self.soundex_index.get(self._soundex(word), ()))
     
     def _soundex(self, word: str) -> str:
         """Implementación simple de Soundex para español"""
-        # Mapeo de sonidos para español
-        soundex_map = {
-            'b': '1', 'f': '1', 'p': '1', 'v': '1',
-            'c': '2', 'g': '2', 'j': '2', 'k': '2', 'q': '2', 's': '2', 'x': '2', 'z': '2',
-            'd': '3', 't': '3',
-            'l': '4',
-            'm': '5', 'n': '5', 'ñ': '5',
-            'r': '6'
-        }
-        
         if not word:
             return "0000"
         
@@ -201,8 +530,8 @@ class SpellChecker:
         # Convertir resto a códigos
         for char in word[1:]:
             char_lower = char.lower()
-            if char_lower in soundex_map:
-                code = soundex_map[char_lower]
+            if char_lower in SOUNDEX_MAP:
+                code = SOUNDEX_MAP[char_lower]
                 if code != result[-1]:  # No repetir códigos consecutivos
                     result += code
         
@@ -216,62 +545,103 @@ class SpellChecker:
         scored = []
         
         for suggestion in suggestions:
-            # Similitud de secuencia
-            sequence_similarity = difflib.SequenceMatcher(None, original, suggestion).ratio()
+            longest = max(len(original), len(suggestion))
+            
+            # Similitud por distancia de edición (transposiciones y tildes cuentan como una edición)
+            distance = damerau_levenshtein(original, suggestion, longest)
+            edit_similarity = 1 - distance / longest
             
             # Similitud de longitud
-            length_similarity = 1 - abs(len(original) - len(suggestion)) / max(len(original), len(suggestion))
+            length_similarity = 1 - abs(len(original) - len(suggestion)) / longest
             
             # Puntuación combinada
-            score = (sequence_similarity * 0.7) + (length_similarity * 0.3)
+            score = (edit_similarity * 0.7) + (length_similarity * 0.3)
             scored.append((suggestion, score))
         
         # Ordenar por puntuación descendente
         return sorted(scored, key=lambda x: x[1], reverse=True)
     
-    def learn_variation(self, correct_word: str, variation: str, error_type: str = "user_input"):
-        """Aprender una nueva variación ortográfica"""
+    def learn_variation(self, correct_word: str, variation: str, error_type: str = "user_input",
+                        wait: bool = False):
+        """
+        Aprender una nueva variación ortográfica.
+        
+        La variación y la palabra correcta (con su código fonético) se escriben
+        en una sola operación del escritor del almacén; el caché en memoria se
+        actualiza al momento. Con wait=True se espera a que se confirme.
+        """
+        correct_lower = correct_word.lower()
+        variation_lower = variation.lower()
+        code = self._soundex(correct_lower)
+        
+        def save(conn) -> int:
+            # La palabra correcta pasa a ser sugerible también tras reiniciar
+            self.store.upsert_words({correct_lower: 1}, source="spelling_variation", conn=conn)
+            self.store.save_phonetic_codes([(correct_lower, code)], conn=conn)
+            # Insertar o sumar frecuencia conservando el id de la variación
+            return self.store.upsert_variation(correct_lower, variation_lower, error_type, conn=conn)
+        
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                # Insertar o actualizar variación
-                conn.execute("""
-                    INSERT OR REPLACE INTO spelling_variations 
-                    (correct_word, variation, error_type, frequency)
-                    VALUES (?, ?, ?, 
-                        COALESCE((SELECT frequency + 1 FROM spelling_variations 
-                                 WHERE correct_word = ? AND variation = ?), 1))
-                """, (correct_word.lower(), variation.lower(), error_type, correct_word.lower(), variation.lower()))
-                conn.commit()
-                
-                logger.info(f"Aprendida variación: '{variation}' -> '{correct_word}' ({error_type})")
+            ack = self.store.write(save, description=f"variación '{variation_lower}'")
+            ack.add_done_callback(self._advance_variations_watermark)
+            
+            # Actualizar caché en memoria sin esperar a la próxima sincronización
+            with self._variations_lock:
+                self.variations_cache[variation_lower] = correct_lower
+            added = []
+            if correct_lower not in self.vocabulary_cache:
+                self._index_word(correct_lower, code)
+                added.append((correct_lower, code))
+            self._invalidate_results(added=added, words=[variation_lower])
+            
+            if wait:
+                ack.result()
+            logger.info(f"Aprendida variación: '{variation}' -> '{correct_word}' ({error_type})")
                 
         except Exception as e:
             logger.error(f"Error aprendiendo variación: {e}")
     
+    def _advance_variations_watermark(self, ack):
+        """Tras confirmar una variación propia, avanzar la marca si no hay filas intermedias de otros procesos"""
+        if ack.cancelled() or ack.exception() is not None:
+            return
+        with self._variations_lock:
+            if ack.result() == self._variations_watermark + 1:
+                self._variations_watermark = ack.result()
+    
     def get_variations_stats(self) -> Dict:
         """Obtener estadísticas de variaciones aprendidas"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.execute("""
-                    SELECT 
-                        COUNT(*) as total_variations,
-                        COUNT(DISTINCT correct_word) as unique_words,
-                        AVG(similarity) as avg_similarity,
-                        SUM(frequency) as total_frequency
-                    FROM spelling_variations
-                """)
-                result = cursor.fetchone()
-                
-                return {
-                    'total_variations': result[0],
-                    'unique_words': result[1],
-                    'avg_similarity': result[2] or 0.0,
-                    'total_frequency': result[3] or 0
-                }
-                
+            result = self.store.variation_stats()
+            
+            return {
+                'total_variations': result[0],
+                'unique_words': result[1],
+                'avg_similarity': result[2] or 0.0,
+                'total_frequency': result[3] or 0
+            }
+            
         except Exception as e:
             logger.error(f"Error obteniendo estadísticas: {e}")
             return {}
 
-# Instancia global
-spell_checker = SpellChecker() 
\ No newline at end of file
+# Instancia global, creada en el primer uso: importar el módulo (p. ej. solo
+# por sus clases) no abre ni crea optimized_learning.db
+_spell_checker: Optional[SpellChecker] = None
+_spell_checker_lock = threading.Lock()
+
+
+def get_spell_checker() -> SpellChecker:
+    """Corrector global del proceso"""
+    global _spell_checker
+    with _spell_checker_lock:
+        if _spell_checker is None:
+            _spell_checker = SpellChecker()
+        return _spell_checker
+
+
+def __getattr__(name: str):
+    # `from spell_checker import spell_checker` sigue devolviendo la instancia global
+    if name == "spell_checker":
+        return get_spell_checker()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}") 
\ No newline at end of file
@@ -0,0 +1,834 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pruebas de las descargas asíncronas de AutoVocabularyLearner
+Usan un servidor HTTP local en lugar de las APIs públicas
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from auto_learning import AutoVocabularyLearner, AutoLearningConfig
+from continuous_learning import MIGRATIONS as CONTINUOUS_MIGRATIONS
+from continuous_learning import ContinuousLearningSystem, ContinuousLearningConfig
+from learning_events import (SESSION_ENDED, SESSION_PROGRESS, SESSION_STARTED, STATS_DELTA, LearningEventBus,
+                             format_sse)
+from learning_worker import VOCABULARY_CHANGED, LearningWorkerClient
+from traffic_load import LoadSignal
+from optimized_learning import OptimizedVocabularyLearner, LearningConfig
+import seen_content
+from vocabulary_store import get_store, release_store
+
+SLOW_SECONDS = 0.5
+
+# Corpus de prueba: una palabra distinta por línea
+CORPUS_WORDS = [f"palabra{chr(97 + i // 26)}{chr(97 + i % 26)}" for i in range(600)]
+CORPUS_BODY = "\n".join(CORPUS_WORDS).encode("utf-8")
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Respuestas simuladas de las fuentes de aprendizaje"""
+    flaky_calls = 0
+
+    def do_GET(self):
+        if self.path.startswith("/slow"):
+            time.sleep(SLOW_SECONDS)
+            self._send(200, json.dumps([{"title": "servicio lento disponible"}]), "application/json")
+        elif self.path == "/posts":
+            self._send(200, json.dumps([{"title": "hola mundo", "body": "pedido factura garantía"}]),
+                       "application/json")
+        elif self.path == "/flaky":
+            StandInHandler.flaky_calls += 1
+            if StandInHandler.flaky_calls == 1:
+                self._send(503, "ocupado", "text/plain")
+            else:
+                self._send(200, json.dumps({"estado": "recuperado"}), "application/json")
+        elif self.path == "/hang":
+            time.sleep(3)
+            self._send(200, "{}", "application/json")
+        elif self.path in ("/corpus.txt", "/corpus-sin-etag.txt"):
+            self._send_corpus(with_etag=self.path == "/corpus.txt")
+        elif self.path == "/corpus.json":
+            self._send(200, json.dumps(CORPUS_WORDS), "application/json")
+        else:
+            self._send(404, "no encontrado", "text/plain")
+
+    def _send_corpus(self, with_etag):
+        etag = '"corpus-v1"'
+        if with_etag and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(CORPUS_BODY)))
+        if with_etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(CORPUS_BODY)
+
+    def _send(self, status, body, content_type):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in_server():
+    """Servidor HTTP local en un puerto libre"""
+    StandInHandler.flaky_calls = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def learner(tmp_path):
+    """AutoVocabularyLearner sobre una base de datos temporal"""
+    db_path = str(tmp_path / "learning.db")
+    OptimizedVocabularyLearner(LearningConfig(db_path=db_path))
+    config = AutoLearningConfig(
+        text_files_path=str(tmp_path / "learning_data"),
+        http_cache_path=str(tmp_path / "learning_data" / "http_cache"),
+        max_retries=1,
+        retry_backoff_seconds=0.05,
+        api_timeout_seconds=2.0
+    )
+    return AutoVocabularyLearner(db_path=db_path, config=config)
+
+
+def fetch_to_cache(learner, urls, timeout):
+    """(estado, contenido en caché o None) de cada URL descargada a la vez"""
+    async def run():
+        try:
+            return await asyncio.gather(*(learner._fetch_to_cache(url, timeout) for url in urls))
+        finally:
+            await learner.close()
+
+    return [(status, path.read_bytes() if path else None) for status, path in asyncio.run(run())]
+
+
+def test_fetch_to_cache_runs_sources_concurrently(stand_in_server, learner):
+    """Tres fuentes lentas tardan lo que la más lenta, no la suma; el semáforo acota la concurrencia"""
+    start = time.perf_counter()
+    fetched = fetch_to_cache(learner, [f"{stand_in_server}/slow?n={i}" for i in range(3)], timeout=2.0)
+    elapsed = time.perf_counter() - start
+
+    assert [status for status, _ in fetched] == ["changed"] * 3
+    assert all(json.loads(body) == [{"title": "servicio lento disponible"}] for _, body in fetched)
+    assert elapsed < SLOW_SECONDS * 2
+
+    learner.config.max_concurrent_requests = 1
+    start = time.perf_counter()
+    fetch_to_cache(learner, [f"{stand_in_server}/slow?m={i}" for i in range(3)], timeout=2.0)
+    assert time.perf_counter() - start >= SLOW_SECONDS * 3
+
+
+def test_fetch_to_cache_retries_server_errors(stand_in_server, learner):
+    """Un 503 se reintenta y la segunda respuesta queda en la caché"""
+    [(status, body)] = fetch_to_cache(learner, [f"{stand_in_server}/flaky"], timeout=2.0)
+
+    assert status == "changed"
+    assert json.loads(body) == {"estado": "recuperado"}
+    assert StandInHandler.flaky_calls == 2
+
+
+def test_timeout_only_affects_its_source(stand_in_server, learner):
+    """Una fuente colgada agota su timeout sin retrasar al resto"""
+    learner.config.max_retries = 0
+    learner.config.api_timeout_seconds = 0.3
+    learner.config.api_endpoints = [f"{stand_in_server}/hang", f"{stand_in_server}/posts"]
+
+    async def run():
+        try:
+            return await learner.learn_from_api_data()
+        finally:
+            await learner.close()
+
+    start = time.perf_counter()
+    result = asyncio.run(run())
+
+    assert result["status"] == "success" and result["words_learned"] > 0
+    assert time.perf_counter() - start < 2
+    assert vocabulary_words(learner) >= {"hola", "mundo", "pedido"}
+
+
+def test_learn_from_api_data_uses_shared_client(stand_in_server, learner):
+    """learn_from_api_data termina en el tiempo de la fuente más lenta"""
+    learner.config.api_endpoints = [f"{stand_in_server}/slow?n={i}" for i in range(3)] + \
+                                   [f"{stand_in_server}/posts"]
+
+    async def run():
+        try:
+            return await learner.learn_from_api_data()
+        finally:
+            await learner.close()
+
+    start = time.perf_counter()
+    result = asyncio.run(run())
+
+    assert result["status"] == "success"
+    assert time.perf_counter() - start < SLOW_SECONDS * 2
+
+
+def vocabulary_words(learner):
+    with sqlite3.connect(learner.db_path) as conn:
+        return {row[0] for row in conn.execute("SELECT word FROM vocabulary")}
+
+
+@pytest.mark.parametrize("path", ["/corpus.txt", "/corpus-sin-etag.txt"])
+def test_ingest_corpus_resumes_from_saved_offset(stand_in_server, learner, path):
+    """Una sesión limitada guarda su posición y la siguiente continúa desde ahí"""
+    learner.config.max_corpus_words_per_session = 250
+    learner.config.corpus_batch_size = 100
+    url = f"{stand_in_server}{path}"
+
+    async def run():
+        try:
+            return [await learner.ingest_corpus(url, "spanish_corpus") for _ in range(3)]
+        finally:
+            await learner.close()
+
+    first, second, third = asyncio.run(run())
+
+    assert first["words_learned"] == 250 and not first["completed"]
+    assert first["line_offset"] == 250
+    assert second["words_learned"] == 250
+    assert third["words_learned"] == 100 and third["completed"]
+    assert third["byte_offset"] == len(CORPUS_BODY)
+    assert vocabulary_words(learner) >= set(CORPUS_WORDS)
+
+
+@pytest.mark.parametrize("path, fetch_status", [
+    ("/corpus.txt", "not_modified"),
+    ("/corpus-sin-etag.txt", "unchanged")
+])
+def test_ingest_corpus_skips_unchanged_source(stand_in_server, learner, path, fetch_status):
+    """Un corpus ya leído completo no se vuelve a tokenizar si no cambió"""
+    url = f"{stand_in_server}{path}"
+
+    async def run():
+        try:
+            return [await learner.ingest_corpus(url, "spanish_corpus") for _ in range(2)]
+        finally:
+            await learner.close()
+
+    first, second = asyncio.run(run())
+
+    assert first["fetch_status"] == "changed" and first["completed"]
+    assert second["fetch_status"] == fetch_status
+    assert second["skipped"] and second["words_learned"] == 0
+
+
+def test_learn_from_api_data_skips_identical_responses(stand_in_server, learner):
+    """Una respuesta con el mismo contenido que la anterior no se vuelve a aprender"""
+    learner.config.api_endpoints = [f"{stand_in_server}/posts"]
+
+    async def run():
+        try:
+            return [await learner.learn_from_api_data() for _ in range(2)]
+        finally:
+            await learner.close()
+
+    first, second = asyncio.run(run())
+
+    assert first["words_learned"] > 0 and first["unchanged_sources"] == 0
+    assert second["words_learned"] == 0 and second["unchanged_sources"] == 1
+
+
+def test_ingest_corpus_splits_lines_without_newlines(stand_in_server, learner):
+    """Un JSON minificado se procesa en trozos sin partir palabras"""
+    learner.config.max_corpus_line_bytes = 64
+
+    async def run():
+        try:
+            return await learner.ingest_corpus(f"{stand_in_server}/corpus.json", "spanish_corpus")
+        finally:
+            await learner.close()
+
+    result = asyncio.run(run())
+
+    assert result["completed"] and result["words_learned"] == len(CORPUS_WORDS)
+    assert vocabulary_words(learner) >= set(CORPUS_WORDS)
+
+
+def vocabulary_frequencies(learner):
+    with sqlite3.connect(learner.db_path) as conn:
+        return dict(conn.execute("SELECT word, frequency FROM vocabulary"))
+
+
+def test_learn_from_text_file_processes_only_new_content(learner, tmp_path):
+    """Las líneas ya leídas no vuelven a sumar frecuencia; las añadidas sí se leen"""
+    learner.config.enable_seen_content_filter = False  # Aquí se prueba solo el punto de control
+    learner.config.max_words_per_session = 2
+    path = tmp_path / "learning_data" / "spanish_vocabulary.txt"
+    path.write_text("ventana\npuerta\ntejado\n", encoding="utf-8")
+
+    assert learner.learn_from_text_file(str(path))["words"] == 2
+    third = learner.learn_from_text_file(str(path))
+    assert third["words"] == 1 and third["completed"]
+    assert learner.learn_from_text_file(str(path))["words"] == 0
+
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("ventana\n")
+    assert learner.learn_from_text_file(str(path))["words"] == 1
+    assert vocabulary_frequencies(learner)["ventana"] == 2
+    assert vocabulary_frequencies(learner)["puerta"] == 1
+
+
+def test_learn_from_text_file_restarts_rewritten_file(learner, tmp_path):
+    """Un archivo reescrito con otro contenido se lee desde el principio"""
+    learner.config.enable_seen_content_filter = False
+    path = tmp_path / "learning_data" / "spanish_vocabulary.txt"
+    path.write_text("ventana\npuerta\n", encoding="utf-8")
+    learner.learn_from_text_file(str(path))
+
+    path.write_text("jardines\nventana\npuerta\n", encoding="utf-8")
+    result = learner.learn_from_text_file(str(path))
+
+    assert result["words"] == 3
+    assert vocabulary_frequencies(learner)["jardines"] == 1
+
+
+def test_full_session_runs_sources_concurrently(stand_in_server, learner, tmp_path):
+    """Las fuentes corren a la vez, con plazo propio y duración en el resultado"""
+    (tmp_path / "learning_data" / "spanish_vocabulary.txt").write_text("ventana\npuerta\n", encoding="utf-8")
+    learner.config.api_endpoints = [f"{stand_in_server}/hang"]
+    learner.config.spanish_corpus_urls = [f"{stand_in_server}/slow?n=corpus"]
+    learner.config.source_deadlines = {"api_data": 0.3}
+    learner.config.source_deadline_grace_seconds = 0.1
+
+    start = time.perf_counter()
+    result = asyncio.run(learner.run_full_learning_session())
+    elapsed = time.perf_counter() - start
+
+    assert result["sources"]["api_data"]["status"] == "timeout"
+    assert result["sources"]["text_files"]["words_learned"] == 2
+    assert result["sources"]["synthetic_data"]["status"] == "success"
+    assert result["sources"]["spanish_corpus"]["status"] == "success"
+    assert set(result["timings"]) == {"text_files", "api_data", "synthetic_data", "spanish_corpus", "session"}
+    assert result["writer"]["operations"] > 0 and result["writer"]["errors"] == 0
+    assert list(result["phases"]["text_files"]) == ["tokenize", "categorize", "write"]
+    assert result["phases"]["spanish_corpus"]["fetch"]["rows"] == 1
+    assert result["phases"]["text_files"]["write"]["rows"] == 2
+    assert elapsed < 3
+
+
+def test_ingest_corpus_sharded_matches_sequential(stand_in_server, learner):
+    """El modo por fragmentos en varios procesos cuenta lo mismo que la lectura secuencial"""
+    learner.config.sharded_ingestion_min_bytes = 1
+    learner.config.shard_size_bytes = 512
+    learner.config.shard_workers = 2
+    # Líneas ya aprendidas por otra fuente: los fragmentos las omiten
+    assert learner._learn_from_messages(CORPUS_WORDS[:10], [], "synthetic_data") == (10, 0)
+
+    async def run():
+        try:
+            return await learner.ingest_corpus(f"{stand_in_server}/corpus.txt", "spanish_corpus")
+        finally:
+            await learner.close()
+
+    result = asyncio.run(run())
+
+    assert result["shards"] > 1 and result["completed"]
+    assert result["words_learned"] == len(CORPUS_WORDS) - 10
+    assert result["line_offset"] == len(CORPUS_WORDS)
+    assert all(count == 1 for count in vocabulary_frequencies(learner).values())
+    assert vocabulary_words(learner) == set(CORPUS_WORDS)
+    # Y las líneas del corpus quedan marcadas para las demás fuentes
+    assert learner._learn_from_messages(CORPUS_WORDS[-10:], [], "synthetic_data") == (0, 0)
+
+
+def test_corpus_shard_module_imports_without_side_effects(tmp_path):
+    """Los procesos de fragmentos importan corpus_shards sin crear bases de datos ni instancias globales"""
+    backend = os.path.dirname(os.path.abspath(__file__))
+    code = f"import sys; sys.path.insert(0, {backend!r}); import corpus_shards; print(*sys.modules, sep=chr(10))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, capture_output=True, text=True, timeout=30)
+
+    assert result.returncode == 0, result.stderr
+    assert not {"auto_learning", "vocabulary_store", "httpx"} & set(result.stdout.split())
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_importing_continuous_learning_builds_no_system(tmp_path):
+    """El servidor importa continuous_learning sin crear un sistema propio ni continuous_learning.log"""
+    backend = os.path.dirname(os.path.abspath(__file__))
+    code = (f"import sys; sys.path.insert(0, {backend!r}); import logging, continuous_learning; "
+            "print(continuous_learning._continuous_learner is None, logging.getLogger().handlers == [])")
+    result = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, capture_output=True, text=True, timeout=30)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ["True", "True"]
+    assert not (tmp_path / "continuous_learning.log").exists()
+
+
+def test_store_writer_groups_concurrent_writes(learner):
+    """Las escrituras de varios hilos pasan por un solo escritor, agrupadas y aisladas"""
+    store = learner.store
+    before = dict(store.writer.stats)
+
+    def failing(conn):
+        raise ValueError("operación inválida")
+
+    def chat_thread():
+        for _ in range(50):
+            store.write(lambda conn: store.upsert_words({"concurrencia": 1}, "test", conn=conn))
+
+    threads = [threading.Thread(target=chat_thread) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    failed = store.write(failing)
+    for thread in threads:
+        thread.join()
+    store.flush().result(timeout=10)
+
+    operations = store.writer.stats["operations"] - before["operations"]
+    batches = store.writer.stats["batches"] - before["batches"]
+    assert vocabulary_frequencies(learner)["concurrencia"] == 400
+    assert isinstance(failed.exception(), ValueError)
+    assert operations == 401 and batches < operations
+
+
+def test_chat_learning_recategorizes_existing_words(learner):
+    """El chat vuelve a categorizar las palabras que ya existen; las demás fuentes conservan la categoría"""
+    chat = OptimizedVocabularyLearner(LearningConfig(db_path=learner.db_path))
+    def learn_from_corpus(counts):
+        learner.store.write(lambda conn: learner._upsert_word_counts(conn, counts, "corpus")).result()
+
+    learn_from_corpus({"computadora": 1, "cliente": 1})
+
+    def categories():
+        with sqlite3.connect(learner.db_path) as conn:
+            return dict(conn.execute("SELECT word, category FROM vocabulary WHERE word IN ('computadora', 'cliente')"))
+
+    assert categories() == {"computadora": "general", "cliente": "business"}
+    chat.learn_from_text("computadora cliente", wait=True)
+    assert categories() == {"computadora": "technical", "cliente": "business"}
+    assert chat.vocabulary_cache["computadora"]["category"] == "technical"
+
+    learn_from_corpus({"computadora": 1})
+    assert categories()["computadora"] == "technical"
+
+
+def table_names(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def test_modules_apply_their_own_migrations_once(tmp_path):
+    """El almacén crea solo sus tablas; cada módulo aplica las suyas, registradas por nombre"""
+    db_path = str(tmp_path / "learning.db")
+    store = get_store(db_path)
+    assert {"vocabulary", "expressions", "learning_stats"} <= table_names(db_path)
+    assert "continuous_learning_log" not in table_names(db_path)
+
+    store.migrate(CONTINUOUS_MIGRATIONS)
+    release_store(db_path)
+    get_store(db_path).migrate(CONTINUOUS_MIGRATIONS)
+
+    assert {"continuous_learning_log", "continuous_learning_checkpoints",
+            "learning_phase_metrics"} <= table_names(db_path)
+    with sqlite3.connect(db_path) as conn:
+        applied = [row[0] for row in conn.execute("SELECT name FROM schema_migrations ORDER BY rowid")]
+    assert applied == ["_migration_base_schema", "_migration_source_columns", "_migration_spelling",
+                       "_migration_continuous_learning", "_migration_session_checkpoints",
+                       "_migration_session_yield", "_migration_phase_metrics"]
+    release_store(db_path)
+
+
+@pytest.fixture
+def continuous_system(stand_in_server, learner):
+    """Aprendizaje continuo con solo la fuente de corpus, que no responde a tiempo"""
+    config = ContinuousLearningConfig(
+        db_path=learner.db_path,
+        enable_text_files=False,
+        enable_api_learning=False,
+        enable_synthetic_data=False,
+        spanish_corpus_urls=[f"{stand_in_server}/hang"],
+        start_jitter_seconds=0
+    )
+    system = ContinuousLearningSystem(config)
+    learner.config.source_deadline_grace_seconds = 0.1
+    system.auto_learner = learner
+    yield system
+    system.stop_continuous_learning()
+
+
+def session_statuses(learner):
+    learner.store.flush().result(timeout=10)
+    with sqlite3.connect(learner.db_path) as conn:
+        return [row[0] for row in conn.execute("SELECT status FROM continuous_learning_log ORDER BY id")]
+
+
+def test_continuous_session_enforces_deadline(continuous_system, learner):
+    """La sesión termina en su plazo y queda registrada como parcial"""
+    continuous_system.config.max_training_time_minutes = 0.5 / 60
+
+    start = time.perf_counter()
+    asyncio.run(continuous_system._run_training_session())
+
+    assert time.perf_counter() - start < 2
+    assert session_statuses(learner) == ["partial"]
+
+
+def test_continuous_learning_stops_immediately(continuous_system, learner):
+    """Detener cancela la sesión en curso sin esperar al plazo ni al intervalo"""
+    continuous_system.config.max_training_time_minutes = 1
+    continuous_system.start_continuous_learning()
+    # Esperar a que la sesión quede registrada, no solo a que tome el cerrojo
+    for _ in range(100):
+        if session_statuses(learner) == ["running"]:
+            break
+        time.sleep(0.02)
+
+    start = time.perf_counter()
+    continuous_system.stop_continuous_learning()
+    continuous_system.learning_thread.join(timeout=2)
+
+    assert not continuous_system.learning_thread.is_alive()
+    assert time.perf_counter() - start < 2
+    assert session_statuses(learner) == ["stopped"]
+    assert continuous_system.get_learning_stats()["next_training_in_minutes"] is None
+
+
+def test_learning_worker_process_notifies_vocabulary_changes(tmp_path):
+    """El proceso de aprendizaje se controla por IPC y avisa al escribir vocabulario"""
+    config = ContinuousLearningConfig(
+        db_path=str(tmp_path / "worker.db"),
+        enable_text_files=False,
+        enable_api_learning=False,
+        enable_spanish_corpus=False,
+        start_jitter_seconds=0
+    )
+    client = LearningWorkerClient(config, request_timeout=30)
+    changed = threading.Event()
+    events = []
+    client.add_listener(lambda event: event["event"] == VOCABULARY_CHANGED and (events.append(event), changed.set()))
+    try:
+        assert client.update_config(training_interval_minutes=5)["training_interval_minutes"] == 5
+        assert client.start()["is_running"]
+        assert changed.wait(timeout=60)
+        stats = client.stats()
+        assert stats["is_running"] and stats["worker"]["alive"]
+        assert stats["worker"]["last_notification"]["event"] == VOCABULARY_CHANGED
+        assert client.stop()["is_running"] is False
+    finally:
+        client.shutdown()
+
+    assert events[0]["event"] == VOCABULARY_CHANGED
+    assert events[0]["words_learned"] > 0
+    assert not client.is_alive()
+    # Los demás avisos no sustituyen al último cambio de vocabulario
+    client._dispatch({"event": SESSION_PROGRESS, "source": "synthetic_data"})
+    assert client.last_notification["event"] == VOCABULARY_CHANGED
+    with sqlite3.connect(config.db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM vocabulary WHERE source = 'synthetic_data'").fetchone()[0] > 0
+
+
+def test_learning_worker_restarts_after_a_crash(tmp_path):
+    """Si el proceso de trabajo muere se lanza otro, sin tocar el módulo principal del servidor"""
+    main_module = sys.modules["__main__"]
+    client = LearningWorkerClient(ContinuousLearningConfig(db_path=str(tmp_path / "worker.db")),
+                                  request_timeout=30, load_signal=LoadSignal())
+    try:
+        first_pid = client.stats()["worker"]["pid"]
+        client._process.kill()
+        deadline = time.monotonic() + 30
+        while not (client.restarts and client.is_alive()) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        stats = client.stats()
+    finally:
+        client.shutdown()
+
+    assert stats["worker"]["alive"] and stats["worker"]["restarts"] == 1
+    assert stats["worker"]["pid"] != first_pid
+    assert sys.modules["__main__"] is main_module
+
+
+WORKER_LAUNCHER = """
+import os
+import sys
+sys.path.insert(0, {backend!r})
+with open("main_runs.log", "a") as f:
+    f.write(f"{{os.getpid()}}\\n")
+
+from continuous_learning import ContinuousLearningConfig
+from learning_worker import LearningWorkerClient
+
+if __name__ == "__main__":
+    client = LearningWorkerClient(ContinuousLearningConfig(db_path="worker.db"), request_timeout=30)
+    try:
+        print(client.stats()["worker"]["alive"])
+    finally:
+        client.shutdown()
+"""
+
+
+def test_learning_worker_does_not_rerun_the_server_script(tmp_path):
+    """El proceso de trabajo no vuelve a ejecutar el script con el que se lanzó el servidor"""
+    script = tmp_path / "servidor.py"
+    script.write_text(WORKER_LAUNCHER.format(backend=os.path.dirname(os.path.abspath(__file__))), encoding="utf-8")
+
+    result = subprocess.run([sys.executable, str(script)], cwd=tmp_path, capture_output=True, text=True, timeout=60)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "True"
+    assert len((tmp_path / "main_runs.log").read_text().splitlines()) == 1
+
+
+def test_learning_pauses_while_server_is_busy(learner, tmp_path):
+    """Con el servidor saturado el aprendizaje espera y sigue en cuanto baja la carga"""
+    path = tmp_path / "vocabulario.txt"
+    path.write_text("".join(f"consulta factura pedido {i}\n" for i in range(50)), encoding="utf-8")
+    signal = LoadSignal()
+    learner.throttle.signal = signal
+    signal.publish(in_flight=10, p95_ms=0, writer_queue=0)
+    threading.Timer(0.4, signal.publish, kwargs={"in_flight": 0, "p95_ms": 0, "writer_queue": 0}).start()
+
+    start = time.perf_counter()
+    result = learner.learn_from_text_file(str(path))
+
+    assert time.perf_counter() - start >= 0.4
+    assert result["words"] == 150
+    assert learner.throttle.get_stats()["pauses"] >= 1
+
+
+def test_seen_content_is_not_learned_again(learner, tmp_path):
+    """Las líneas ya aprendidas se omiten en cualquier fuente, también tras reiniciar"""
+    path = tmp_path / "learning_data" / "spanish_vocabulary.txt"
+    path.write_text("ventana abierta\npuerta cerrada\n", encoding="utf-8")
+    learner.learn_from_text_file(str(path))
+
+    path.write_text("puerta  CERRADA\njardines\nventana abierta\n", encoding="utf-8")
+    assert learner.learn_from_text_file(str(path))["words"] == 1
+    assert learner._learn_from_messages(["jardines", "tejado rojo"], [], "synthetic_data") == (2, 0)
+
+    restarted = AutoVocabularyLearner(db_path=learner.db_path, config=learner.config)
+    assert restarted._learn_from_messages(["tejado rojo", "ventana abierta"], [], "synthetic_data") == (0, 0)
+    assert vocabulary_frequencies(learner) == {"ventana": 1, "abierta": 1, "puerta": 1, "cerrada": 1,
+                                               "jardines": 1, "tejado": 1, "rojo": 1}
+    assert restarted.seen_content.get_stats()["skipped"] == 2
+
+
+def test_seen_content_is_kept_only_when_the_write_commits(learner, tmp_path, monkeypatch):
+    """Las líneas de un lote que no llegó a escribirse siguen contando como nuevas"""
+    path = tmp_path / "learning_data" / "spanish_vocabulary.txt"
+    path.write_text("ventana abierta\npuerta cerrada\n", encoding="utf-8")
+
+    def failing_upsert(conn, counts, source, categories=None):
+        raise sqlite3.OperationalError("disco lleno")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(learner, "_upsert_word_counts", failing_upsert)
+        with pytest.raises(sqlite3.OperationalError):
+            learner.learn_from_text_file(str(path))
+    # Un lote posterior que sí se escribe no arrastra los hashes del que falló
+    assert learner._learn_from_messages(["tejado rojo"], [], "synthetic_data") == (2, 0)
+
+    assert learner.learn_from_text_file(str(path))["words"] == 4
+    assert AutoVocabularyLearner(db_path=learner.db_path, config=learner.config)._learn_from_messages(
+        ["ventana abierta", "tejado rojo"], [], "synthetic_data") == (0, 0)
+
+
+def test_seen_content_filters_of_two_processes_are_merged(learner):
+    """Dos copias del filtro (servidor y proceso de aprendizaje) no se pisan los bits al guardar"""
+    other = AutoVocabularyLearner(db_path=learner.db_path, config=learner.config)
+    # Ambas cargan el filtro antes de que la otra guarde nada
+    learner.seen_content.get_stats()
+    other.seen_content.get_stats()
+
+    assert learner._learn_from_messages(["ventana abierta"], [], "synthetic_data") == (2, 0)
+    assert other._learn_from_messages(["tejado rojo"], [], "synthetic_data") == (2, 0)
+    assert learner._learn_from_messages(["puerta cerrada"], [], "synthetic_data") == (2, 0)
+
+    # Cada una ve lo que guardó la otra antes de su último guardado
+    assert other._learn_from_messages(["ventana abierta"], [], "synthetic_data") == (0, 0)
+    assert learner._learn_from_messages(["tejado rojo"], [], "synthetic_data") == (0, 0)
+    restarted = AutoVocabularyLearner(db_path=learner.db_path, config=learner.config)
+    assert restarted._learn_from_messages(["ventana abierta", "tejado rojo", "puerta cerrada"], [],
+                                          "synthetic_data") == (0, 0)
+
+
+def test_seen_content_save_writes_only_touched_chunks(learner):
+    """Un lote pequeño reescribe unos pocos trozos de la capa, no la capa entera"""
+    seen = learner.seen_content
+    learner._learn_from_messages(["ventana abierta"], [], "synthetic_data")
+
+    layer = next(iter(seen._filters.values())).layers[0]
+    with sqlite3.connect(learner.db_path) as conn:
+        stored_chunks = conn.execute("SELECT COUNT(*) FROM seen_content_chunks").fetchone()[0]
+    written = seen.get_stats()["chunks_written"]
+    assert 0 < written == stored_chunks <= layer.hash_count
+    assert written * seen_content.CHUNK_BYTES < len(layer.bits) // 10
+
+
+def test_api_word_limit_leaves_remaining_texts_for_later(learner, tmp_path):
+    """Con el límite de palabras, los textos que no se escribieron no quedan marcados como vistos"""
+    path = tmp_path / "response.json"
+    path.write_text(json.dumps([{"title": "ventana abierta"}, {"title": "puerta cerrada"}]), encoding="utf-8")
+
+    assert learner._learn_from_json_file(path, "api_data", 3) == 3
+    assert set(vocabulary_frequencies(learner)) == {"title", "ventana", "abierta"}
+
+    assert learner._learn_from_json_file(path, "api_data", 100) == 2
+    assert vocabulary_frequencies(learner) == {"title": 1, "ventana": 1, "abierta": 1, "puerta": 1, "cerrada": 1}
+
+
+def test_interrupted_session_is_aborted_and_resumed(learner):
+    """Una sesión que quedó 'running' se marca abortada y la siguiente solo repite lo pendiente"""
+    system = ContinuousLearningSystem(ContinuousLearningConfig(
+        db_path=learner.db_path,
+        enable_api_learning=False,
+        enable_spanish_corpus=False,
+        start_jitter_seconds=0
+    ))
+    system.auto_learner = learner
+    with sqlite3.connect(learner.db_path) as conn:
+        interrupted = conn.execute("""
+            INSERT INTO continuous_learning_log (session_start, status, heartbeat_at, owner_pid)
+            VALUES ('2024-01-01 10:00:00', 'running', '2024-01-01T10:05:00', NULL)
+        """).lastrowid
+        conn.executemany("""
+            INSERT INTO continuous_learning_checkpoints (session_id, source, status, words_learned)
+            VALUES (?, ?, ?, ?)
+        """, [(interrupted, "synthetic_data", "success", 40), (interrupted, "text_files", "running", 5)])
+
+    asyncio.run(system._run_training_session())
+
+    learner.store.flush().result(timeout=10)
+    with sqlite3.connect(learner.db_path) as conn:
+        aborted = conn.execute("SELECT status, words_learned FROM continuous_learning_log WHERE id = ?",
+                               (interrupted,)).fetchone()
+        resumed = conn.execute("SELECT id, status FROM continuous_learning_log WHERE resumed_from = ?",
+                               (interrupted,)).fetchone()
+        sources = dict(conn.execute("SELECT source, status FROM continuous_learning_checkpoints WHERE session_id = ?",
+                                    (resumed[0],)))
+    assert aborted == ("aborted", 45)
+    assert resumed[1] == "completed"
+    assert sources == {"text_files": "success"}
+    assert system.get_learning_stats()["aborted_sessions"] == 1
+
+
+def test_adaptive_schedule_follows_session_yield(learner):
+    """Sesiones sin palabras nuevas alargan el intervalo y pausan la fuente; contenido nuevo lo acorta"""
+    config = ContinuousLearningConfig(db_path=learner.db_path, training_interval_minutes=30,
+                                      min_interval_minutes=20, max_interval_minutes=60, yield_window=2)
+    system = ContinuousLearningSystem(config)
+
+    def log_sessions(new_words, source_words):
+        with sqlite3.connect(learner.db_path) as conn:
+            for _ in range(config.yield_window):
+                session_id = conn.execute("""
+                    INSERT INTO continuous_learning_log (session_start, session_end, status, new_words)
+                    VALUES (CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, 'completed', ?)
+                """, (new_words,)).lastrowid
+                conn.execute("""
+                    INSERT INTO continuous_learning_checkpoints
+                    (session_id, source, status, words_learned, cpu_seconds) VALUES (?, 'text_files', 'success', ?, 2.0)
+                """, (session_id, source_words))
+
+    log_sessions(new_words=0, source_words=0)
+    assert [system.schedule.next_interval_minutes() for _ in range(2)] == [45, 60]
+    assert system.schedule.paused_sources() == {"text_files": config.source_cooldown_sessions}
+
+    log_sessions(new_words=500, source_words=400)
+    assert system.schedule.next_interval_minutes() == 40
+    assert system.schedule.paused_sources() == {}
+
+    system.config.training_interval_minutes = 15
+    assert system.schedule.next_interval_minutes() == 20
+
+
+def test_session_events_reach_subscribers(learner):
+    """Los eventos de sesión llegan a los suscriptores del bus y se recuperan al reconectar"""
+    system = ContinuousLearningSystem(ContinuousLearningConfig(
+        db_path=learner.db_path,
+        enable_text_files=False,
+        enable_api_learning=False,
+        enable_spanish_corpus=False,
+        start_jitter_seconds=0
+    ))
+    system.auto_learner = learner
+    bus = LearningEventBus()
+    system.on_event = bus.publish
+
+    async def session_events():
+        subscription, missed = bus.subscribe()
+        await system._run_training_session()
+        events = []
+        while (event := await subscription.get(timeout=0.1)) is not None:
+            events.append(event)
+        subscription.close()
+        return missed, events
+
+    missed, events = asyncio.run(session_events())
+
+    assert missed is None
+    # Avance al terminar la fuente y con el último punto de control
+    assert [event["event"] for event in events] == [SESSION_STARTED, SESSION_PROGRESS, SESSION_PROGRESS,
+                                                    SESSION_ENDED, STATS_DELTA]
+    assert [event["id"] for event in events] == [1, 2, 3, 4, 5]
+    assert events[2]["sources"]["synthetic_data"]["status"] == "success"
+    ended, delta = events[3], events[4]
+    assert ended["status"] == "completed"
+    assert delta["total_sessions"] == 1
+    assert delta["total_words_learned"] == ended["words_learned"] == events[2]["words_learned"] > 0
+    assert "event: session_ended" in format_sse(ended)
+
+    async def reconnect(last_event_id):
+        subscription, missed = bus.subscribe(last_event_id)
+        subscription.close()
+        return missed
+
+    assert [event["id"] for event in asyncio.run(reconnect(3))] == [4, 5]
+    assert asyncio.run(reconnect(5)) == []
+    assert asyncio.run(reconnect(9)) is None
+
+
+def test_session_counts_only_its_own_new_words(learner, tmp_path, monkeypatch):
+    """Las palabras nuevas de la sesión no incluyen las que otro proceso inserta mientras tanto"""
+    monkeypatch.chdir(tmp_path)  # El sistema continuo lee learning_data/ relativo al directorio actual
+    (tmp_path / "learning_data" / "spanish_vocabulary.txt").write_text("ventana\npuerta\ntejado\n", encoding="utf-8")
+    learner.store.upsert_words({"ventana": 1}, source="chat")
+    system = ContinuousLearningSystem(ContinuousLearningConfig(
+        db_path=learner.db_path,
+        enable_api_learning=False,
+        enable_synthetic_data=False,
+        enable_spanish_corpus=False,
+        start_jitter_seconds=0
+    ))
+    system.auto_learner = learner
+    ended = []
+
+    def on_event(event):
+        if event["event"] == SESSION_STARTED:
+            # Escritura concurrente del servidor durante la sesión
+            learner.store.upsert_words({"servidor": 1, "conversación": 1}, source="chat")
+        elif event["event"] == SESSION_ENDED:
+            ended.append(event)
+
+    system.on_event = on_event
+    asyncio.run(system._run_training_session())
+    learner.store.flush().result(timeout=10)
+
+    assert ended[0]["words_learned"] == 3 and ended[0]["new_words"] == 2
+    with sqlite3.connect(learner.db_path) as conn:
+        assert conn.execute("SELECT new_words FROM continuous_learning_log").fetchone() == (2,)
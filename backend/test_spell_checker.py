@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pruebas del corrector ortográfico
+Cada prueba usa una base de datos temporal con un vocabulario pequeño
+"""
+
+import itertools
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+from context_model import BigramContextModel
+from edit_distance import NUMPY_AVAILABLE, batch_damerau_levenshtein, damerau_levenshtein, encode_words
+import spell_benchmark
+import vocabulary_store
+from spell_checker import SpellChecker, SpellCheckConfig
+from vocabulary_store import get_store
+
+VOCABULARY = ["casa", "cama", "perro", "producto", "que", "hola", "llamar", "vaca"]
+
+
+def create_checker(db_path, words=VOCABULARY, **config):
+    """SpellChecker sobre una base de datos con `words` ya aprendidas"""
+    get_store(db_path).upsert_words({word: 1 for word in words}, source="test")
+    return SpellChecker(db_path, SpellCheckConfig(**config))
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "spelling.db")
+
+
+def phonetic_codes(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return dict(conn.execute("SELECT word, code FROM vocabulary_phonetic"))
+
+
+def test_phonetic_codes_are_persisted_and_reused(db_path):
+    """La primera carga guarda el código Soundex de cada palabra; la siguiente lo lee de la tabla"""
+    checker = create_checker(db_path)
+    checker.store.flush().result()
+
+    codes = phonetic_codes(db_path)
+    assert set(codes) == set(VOCABULARY)
+    assert codes["casa"] == checker._soundex("casa")
+
+    # Un código guardado se usa tal cual, sin recalcularlo
+    checker.store.save_phonetic_codes([("vaca", "X000")])
+    reloaded = SpellChecker(db_path)
+    assert reloaded.soundex_index["X000"] == {"vaca"}
+    assert checker._soundex("vaca") not in reloaded.soundex_index
+
+
+def test_known_variation_is_served_from_memory(db_path):
+    """Una variación aprendida se corrige sin consultar la base de datos y se carga al reiniciar"""
+    checker = create_checker(db_path)
+    checker.learn_variation("producto", "prodcto", wait=True)
+
+    result = checker.check_spelling("prodcto")
+    assert result["error_type"] == "known_variation"
+    assert result["corrected"] == "producto"
+
+    reloaded = SpellChecker(db_path)
+    assert reloaded.variations_cache == {"prodcto": "producto"}
+    assert reloaded.check_spelling("Prodcto")["corrected"] == "producto"
+
+
+def test_check_texts_resolves_each_unknown_word_once(db_path, monkeypatch):
+    """Las palabras repetidas entre textos se analizan una sola vez y cada texto recibe sus correcciones"""
+    checker = create_checker(db_path, result_cache_size=0)
+    checker.learn_variation("producto", "prodcto", wait=True)
+    searched = []
+    fuzzy_search = checker._fuzzy_search
+    monkeypatch.setattr(checker, "_fuzzy_search", lambda word: searched.append(word) or fuzzy_search(word))
+
+    texts = ["casa cmaa perro", "Cmaa prodcto casa", "perrro", ""]
+    corrections = checker.check_texts(texts)
+
+    assert len(corrections) == len(texts)
+    assert [[c["original"] for c in text] for text in corrections] == [["cmaa"], ["Cmaa", "prodcto"], ["perrro"], []]
+    assert corrections[1][1]["corrected"] == "producto"
+    assert corrections[1][1]["error_type"] == "known_variation"
+    assert "cama" in corrections[0][0]["suggestions"]
+    assert sorted(searched) == ["cmaa", "perrro"]
+
+
+@pytest.fixture(scope="module")
+def optimized_server(tmp_path_factory):
+    """Servidor importado en un directorio temporal: crea sus bases de datos al importarse"""
+    pytest.importorskip("httpx")
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("server"))
+    try:
+        import optimized_server
+    finally:
+        os.chdir(cwd)
+    return optimized_server
+
+
+def test_check_batch_endpoint_returns_corrections_per_text(db_path, optimized_server, monkeypatch):
+    """/spelling/check-batch devuelve, en orden, cada texto con sus correcciones"""
+    from fastapi.testclient import TestClient
+
+    checker = create_checker(db_path)
+    monkeypatch.setattr(optimized_server, "spell_checker", checker)
+    texts = ["hola cmaa", "perro perrro", ""]
+
+    response = TestClient(optimized_server.app).post("/spelling/check-batch", json={"texts": texts})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total_texts"] == len(texts)
+    assert [result["text"] for result in body["results"]] == texts
+    assert [result["corrections"] for result in body["results"]] == checker.check_texts(texts)
+
+
+def osa_distance(source, target):
+    """Referencia sin acotar: distancia de alineamiento óptimo de cadenas (Damerau restringida)"""
+    rows = [[i + j if i * j == 0 else 0 for j in range(len(target) + 1)] for i in range(len(source) + 1)]
+    for i, j in itertools.product(range(1, len(source) + 1), range(1, len(target) + 1)):
+        cost = 0 if source[i - 1] == target[j - 1] else 1
+        rows[i][j] = min(rows[i - 1][j] + 1, rows[i][j - 1] + 1, rows[i - 1][j - 1] + cost)
+        if i > 1 and j > 1 and source[i - 1] == target[j - 2] and source[i - 2] == target[j - 1]:
+            rows[i][j] = min(rows[i][j], rows[i - 2][j - 2] + 1)
+    return rows[-1][-1]
+
+
+def random_words(rng, count, length):
+    # Alfabeto pequeño (con una letra acentuada) para que haya muchas coincidencias parciales
+    return ["".join(rng.choice("abcá") for _ in range(length)) for _ in range(count)]
+
+
+@pytest.mark.parametrize("max_distance", [0, 1, 2, 3])
+def test_damerau_levenshtein_matches_reference(max_distance):
+    """La distancia acotada coincide con la referencia, o vale max_distance + 1 por encima del umbral"""
+    rng = random.Random(max_distance)
+    for _ in range(500):
+        source, target = (random_words(rng, 1, rng.randint(0, 7))[0] for _ in range(2))
+        expected = min(osa_distance(source, target), max_distance + 1)
+        assert damerau_levenshtein(source, target, max_distance) == expected, (source, target)
+
+
+def test_damerau_levenshtein_counts_transpositions_and_cuts_off_the_band():
+    assert damerau_levenshtein("porducto", "producto", 1) == 1
+    assert damerau_levenshtein("ab", "ba", 1) == 1
+    # Sin transposición serían dos sustituciones
+    assert damerau_levenshtein("abcd", "badc", 2) == 2
+    # Fuera del umbral, por longitud o por contenido
+    assert damerau_levenshtein("casa", "casamiento", 3) == 4
+    assert damerau_levenshtein("abcdef", "ghijkl", 2) == 3
+    assert damerau_levenshtein("abcdef", "ghijkl", 6) == 6
+
+
+@pytest.mark.skipif(not NUMPY_AVAILABLE, reason="NumPy no está instalado")
+@pytest.mark.parametrize("max_distance", [1, 2, 3])
+def test_batch_damerau_levenshtein_matches_scalar(max_distance):
+    """La versión vectorizada da lo mismo que la escalar para toda una cubeta de longitud"""
+    rng = random.Random(100 + max_distance)
+    for target_length in range(1, 7):
+        targets = random_words(rng, 200, target_length) + [("ab" * 4)[:target_length]]
+        encoded = encode_words(targets)
+        for source in random_words(rng, 20, rng.randint(1, 7)) + ["ba"]:
+            expected = [min(osa_distance(source, t), max_distance + 1) for t in targets]
+            distances = batch_damerau_levenshtein(source, encoded, max_distance)
+            assert distances.tolist() == expected, source
+
+
+def test_length_index_search_uses_scalar_and_batch_paths(db_path):
+    """La búsqueda por cubetas devuelve las mismas palabras con y sin NumPy"""
+    words = random_words(random.Random(7), 400, 5) + random_words(random.Random(8), 50, 4)
+    scalar = create_checker(db_path, words, numpy_batch_min_size=10 ** 6)
+    batch = SpellChecker(db_path, SpellCheckConfig(numpy_batch_min_size=1))
+
+    for word in ["abcab", "bacá", "ccccc", "aaaaaa"]:
+        expected = {w for w in set(words) if osa_distance(word, w) <= 2}
+        assert {w for w, _ in scalar.length_index.search(word, 2)} == expected
+        assert {w for w, _ in batch.length_index.search(word, 2)} == expected
+
+
+def delete_words(store, words):
+    store.write(lambda conn: conn.executemany("DELETE FROM vocabulary WHERE word = ?",
+                                              [(word,) for word in words])).result()
+
+
+def test_change_feed_applies_added_and_removed_words(db_path):
+    """Las palabras escritas o borradas por otro módulo llegan al corrector con refresh()"""
+    checker = create_checker(db_path)
+    store = checker.store
+
+    store.upsert_words({"ventana": 1}, source="otro_proceso")
+    delete_words(store, ["vaca"])
+    checker.refresh()
+
+    assert "ventana" in checker.vocabulary_cache
+    assert "vaca" not in checker.vocabulary_cache
+    assert checker.check_spelling("ventana")["is_correct"]
+    assert "vaca" not in checker.check_spelling("vacas")["suggestions"]
+
+    # Insertada y borrada entre dos sincronizaciones: el cambio neto es un borrado
+    store.upsert_words({"tejado": 1}, source="otro_proceso")
+    delete_words(store, ["tejado"])
+    changes = checker.change_feed.changes_since(checker._vocabulary_seq)
+    assert changes.removed == {"tejado"} and not changes.added
+
+
+def test_compacted_feed_forces_full_reload(db_path):
+    """Si el feed se compactó por encima de la marca, changes_since devuelve None y se recarga todo"""
+    checker = create_checker(db_path)
+    store = checker.store
+    seq = checker._vocabulary_seq
+    generation = checker.vocabulary_generation
+
+    store.upsert_words({"ventana": 1, "puerta": 1}, source="otro_proceso")
+    delete_words(store, ["vaca"])
+    checker.change_feed.retention = 0
+    checker.change_feed.compact()
+
+    assert checker.change_feed.changes_since(seq) is None
+    checker.refresh()
+
+    assert checker.vocabulary_cache == (set(VOCABULARY) - {"vaca"}) | {"ventana", "puerta"}
+    assert checker.vocabulary_generation > generation
+    assert checker.change_feed.changes_since(checker._vocabulary_seq) is not None
+
+
+def test_context_reranks_suggestions_with_bigram_evidence(db_path):
+    """Con bigramas que la respaldan, una sugerencia más lejana por edición pasa a ser la primera"""
+    context_model = BigramContextModel(db_path=db_path)
+    for _ in range(20):
+        context_model.add_text("compré una cama grande")
+    checker = create_checker(db_path, enable_soundex=False, enable_common_errors=False)
+
+    # Sin modelo de contexto manda la distancia de edición: caso -> casa
+    assert checker.check_spelling("caso")["suggestions"][:2] == ["casa", "cama"]
+
+    checker.context_model = context_model
+    assert checker.check_spelling("caso", previous="una", following="grande")["suggestions"][0] == "cama"
+    # Sin palabras vecinas el orden no cambia
+    assert checker.check_spelling("caso")["suggestions"][0] == "casa"
+
+    corrections = {c["original"]: c for c in checker.check_text("compré una caso grande")}
+    assert corrections["caso"]["suggestions"][0] == "cama"
+
+
+def test_bigram_arrays_match_counted_pairs():
+    """Los bigramas mezclados en los arrays ordenados suman lo mismo que contarlos por pares"""
+    rng = random.Random(3)
+    words = ["una", "cama", "casa", "grande", "compré", "la", "vaca"]
+    model = BigramContextModel(db_path=":memory:", merge_threshold=8)
+    expected = {}
+    for _ in range(300):
+        text = [rng.choice(words) for _ in range(rng.randint(1, 6))]
+        model.add_words(text)
+        for pair in zip(text, text[1:]):
+            expected[pair] = expected.get(pair, 0) + 1
+
+    assert list(model.bigram_keys) == sorted(model.bigram_keys)
+    for first, second in itertools.product(words, repeat=2):
+        count = model._bigram(model.word_ids[first], model.word_ids[second])
+        assert count == expected.get((first, second), 0), (first, second)
+    assert model.get_stats()["bigrams"] == len(expected) == len(model.bigram_counts)
+
+
+@pytest.mark.parametrize("typo, expected", [("ke", "que"), ("ola", "hola"), ("yamar", "llamar"), ("baka", "vaca")])
+def test_confusion_sets_generate_spanish_corrections(db_path, typo, expected):
+    """Grafías confundibles (k/qu, h muda, ll/y, b/v) llevan a la palabra correcta"""
+    checker = create_checker(db_path, enable_fuzzy_matching=False, enable_soundex=False)
+
+    assert expected in checker._confusion_candidates(typo)
+    assert checker._confusion_search(typo) == [expected]
+    assert checker.check_spelling(typo)["suggestions"][0] == expected
+
+
+def test_confusion_candidates_are_capped(db_path):
+    checker = create_checker(db_path, max_confusion_candidates=25)
+    candidates = list(checker._confusion_candidates("cabeza"))
+
+    assert len(candidates) == 25
+    assert len(set(candidates)) == 25 and "cabeza" not in candidates
+
+
+def test_learned_variation_adds_the_correct_word_to_the_vocabulary(db_path):
+    """La palabra correcta de una variación se guarda en el vocabulario junto a su código fonético"""
+    checker = create_checker(db_path)
+    checker.learn_variation("Ventana", "bentana", wait=True)
+
+    assert checker.check_spelling("ventana")["is_correct"]
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT source FROM vocabulary WHERE word = 'ventana'").fetchone() == ("spelling_variation",)
+    assert phonetic_codes(db_path)["ventana"] == checker._soundex("ventana")
+
+    reloaded = SpellChecker(db_path)
+    assert "ventana" in reloaded.vocabulary_cache
+    assert reloaded.check_spelling("bentana")["corrected"] == "ventana"
+
+
+def test_new_words_invalidate_only_the_results_they_can_reach(db_path):
+    """Una palabra nueva descarta los resultados cercanos; los lejanos siguen en el caché"""
+    checker = create_checker(db_path, selective_invalidation_max_words=2)
+    checker.check_spelling("caso")
+    checker.check_spelling("prodcto")
+    generation = checker.vocabulary_generation
+
+    checker.add_words(["cosa"])
+
+    assert checker.vocabulary_generation == generation
+    assert [word for word, _ in checker._result_cache] == ["prodcto"]
+    assert "cosa" in checker.check_spelling("caso")["suggestions"]
+
+    # Muchas palabras a la vez (p. ej. tras ingerir un corpus) cambian de generación
+    checker.add_words(["ventana", "puerta", "tejado"])
+    assert checker.vocabulary_generation == generation + 1
+    assert checker.get_cache_stats()["size"] == 0
+
+
+def test_importing_the_module_does_not_create_the_database(tmp_path):
+    """La instancia global se crea al pedirla, no al importar las clases"""
+    backend = os.path.dirname(os.path.abspath(__file__))
+    code = (f"import sys; sys.path.insert(0, {backend!r}); "
+            "from spell_checker import SpellChecker; import spell_benchmark")
+    result = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, capture_output=True, text=True, timeout=30)
+
+    assert result.returncode == 0, result.stderr
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_benchmark_releases_its_store():
+    """Cada tamaño de vocabulario cierra su almacén temporal y el informe es reproducible"""
+    stores_before = set(vocabulary_store._stores)
+    report = spell_benchmark.run_benchmark([60], query_count=10, ks=[1, 3], seed=1)
+
+    assert set(vocabulary_store._stores) == stores_before
+    assert report["results"][0]["queries"] == 10
+    # Sin fecha, dos ejecuciones con la misma semilla solo difieren en las latencias
+    assert "generated_at" not in report
+    again = spell_benchmark.run_benchmark([60], query_count=10, ks=[1, 3], seed=1)
+    assert again["results"][0]["precision_at_k"] == report["results"][0]["precision_at_k"]
+    assert "generated_at" in spell_benchmark.run_benchmark([60], 10, [1], seed=1, timestamp=True)
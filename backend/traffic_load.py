@@ -0,0 +1,232 @@
+"""
+Señal de carga del servidor para el aprendizaje en segundo plano
+El servidor publica peticiones en vuelo, latencia p95 reciente y cola del
+escritor en un archivo proyectado en memoria; el aprendizaje la consulta entre porciones de
+trabajo y se frena o se pausa mientras el chat está ocupado.
+"""
+
+import asyncio
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Callable, Dict, Optional
+
+# Contador de escrituras seguido de en vuelo, p95 (ms), cola del escritor y hora de publicación
+_SEQUENCE = struct.Struct("<Q")
+_VALUES = struct.Struct("<4d")
+_SIGNAL_SIZE = _SEQUENCE.size + _VALUES.size
+
+
+def _release_signal_file(mapping: mmap.mmap, path: str):
+    """Cerrar la proyección y borrar el archivo de la señal (solo su creador)"""
+    mapping.close()
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class LoadSignal:
+    """
+    Última carga publicada por el servidor, legible desde otros procesos.
+
+    Los valores viven en un archivo pequeño proyectado en memoria (mmap): la
+    señal se envía al proceso de aprendizaje como la ruta de ese archivo y él
+    la vuelve a abrir. Solo publica el servidor; cada publicación incrementa
+    un contador antes y después de escribir, y una lectura que coincide con
+    una escritura se repite. Una latencia publicada hace más de
+    `stale_seconds` se considera caducada: sin tráfico nuevo no hay latencia
+    reciente.
+    """
+
+    def __init__(self, stale_seconds: float = 60.0, path: Optional[str] = None):
+        self.stale_seconds = stale_seconds
+        created = path is None
+        if created:
+            fd, path = tempfile.mkstemp(prefix="load-signal-", suffix=".bin")
+            with os.fdopen(fd, "wb") as f:
+                f.write(bytes(_SIGNAL_SIZE))
+        self.path = path
+        with open(path, "r+b") as f:
+            self._map = mmap.mmap(f.fileno(), _SIGNAL_SIZE)
+        if created:
+            weakref.finalize(self, _release_signal_file, self._map, path)
+        self._publish_lock = threading.Lock()
+
+    def __reduce__(self):
+        # En otro proceso se abre el mismo archivo
+        return LoadSignal, (self.stale_seconds, self.path)
+
+    def publish(self, in_flight: int, p95_ms: float, writer_queue: int):
+        """Publicar la carga actual"""
+        with self._publish_lock:
+            sequence = _SEQUENCE.unpack_from(self._map)[0]
+            _SEQUENCE.pack_into(self._map, 0, sequence + 1)
+            _VALUES.pack_into(self._map, _SEQUENCE.size, in_flight, p95_ms, writer_queue, time.time())
+            _SEQUENCE.pack_into(self._map, 0, sequence + 2)
+
+    def read(self) -> Dict[str, float]:
+        """Carga publicada: in_flight, p95_ms y writer_queue"""
+        while True:
+            sequence = _SEQUENCE.unpack_from(self._map)[0]
+            in_flight, p95_ms, writer_queue, updated_at = _VALUES.unpack_from(self._map, _SEQUENCE.size)
+            # Impar: publicación a medias; distinto: hubo otra mientras se leía
+            if not sequence & 1 and _SEQUENCE.unpack_from(self._map)[0] == sequence:
+                break
+        if time.time() - updated_at > self.stale_seconds:
+            p95_ms = 0.0
+        return {"in_flight": int(in_flight), "p95_ms": p95_ms, "writer_queue": int(writer_queue)}
+
+
+class RequestLoadTracker:
+    """
+    Lado del servidor: cuenta peticiones en vuelo y sus duraciones recientes
+    y las publica en una LoadSignal.
+
+    El p95 se calcula sobre las peticiones terminadas en los últimos
+    `window_seconds` (como mucho `max_samples`) y se recalcula como mucho
+    cada `p95_refresh_seconds` para no ordenar en cada petición.
+    """
+
+    def __init__(self, signal: LoadSignal, writer_queue_depth: Optional[Callable[[], int]] = None,
+                 window_seconds: float = 60.0, max_samples: int = 1000, p95_refresh_seconds: float = 0.25):
+        self.signal = signal
+        self.window_seconds = window_seconds
+        self.p95_refresh_seconds = p95_refresh_seconds
+        self._writer_queue_depth = writer_queue_depth
+        self._samples: deque = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._p95_ms = 0.0
+        self._p95_computed_at = 0.0
+
+    def begin(self):
+        """Una petición empieza"""
+        with self._lock:
+            self._in_flight += 1
+            self._publish()
+
+    def end(self, duration_seconds: float):
+        """Una petición termina tras `duration_seconds`"""
+        now = time.monotonic()
+        with self._lock:
+            self._in_flight -= 1
+            self._samples.append((now, duration_seconds * 1000))
+            if now - self._p95_computed_at >= self.p95_refresh_seconds:
+                self._p95_ms = self._compute_p95(now)
+                self._p95_computed_at = now
+            self._publish()
+
+    def get_stats(self) -> Dict:
+        """Carga actual tal como la ve el aprendizaje"""
+        return self.signal.read()
+
+    def _compute_p95(self, now: float) -> float:
+        """Percentil 95 de las duraciones dentro de la ventana"""
+        while self._samples and now - self._samples[0][0] > self.window_seconds:
+            self._samples.popleft()
+        if not self._samples:
+            return 0.0
+        durations = sorted(duration for _, duration in self._samples)
+        return durations[min(len(durations) - 1, math.ceil(0.95 * len(durations)) - 1)]
+
+    def _publish(self):
+        writer_queue = self._writer_queue_depth() if self._writer_queue_depth else 0
+        self.signal.publish(self._in_flight, self._p95_ms, writer_queue)
+
+
+class LearningThrottle:
+    """
+    Lado del aprendizaje: decide cuánto esperar antes de la siguiente porción.
+
+    La presión es el mayor de in_flight/max_in_flight, p95/max_p95_ms y
+    cola/max_writer_queue (la cola es la mayor entre la del servidor y la
+    local). Por debajo de `soft_pressure` no se espera, así se recupera el
+    retraso en los ratos libres; entre `soft_pressure` y 1 se cede un
+    intervalo corto; desde 1 se pausa con espera exponencial hasta que la
+    carga baje o `should_stop()` pida terminar.
+    """
+
+    def __init__(self, signal: Optional[LoadSignal] = None,
+                 local_queue_depth: Optional[Callable[[], int]] = None,
+                 max_in_flight: int = 4, max_p95_ms: float = 500.0, max_writer_queue: int = 64,
+                 soft_pressure: float = 0.5, min_backoff_seconds: float = 0.05,
+                 max_backoff_seconds: float = 2.0):
+        self.signal = signal
+        self.max_in_flight = max_in_flight
+        self.max_p95_ms = max_p95_ms
+        self.max_writer_queue = max_writer_queue
+        self.soft_pressure = soft_pressure
+        self.min_backoff_seconds = min_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self._local_queue_depth = local_queue_depth
+        self._lock = threading.Lock()
+        self.stats = {'checks': 0, 'yields': 0, 'pauses': 0, 'paused_seconds': 0.0, 'last_pressure': 0.0}
+
+    def pressure(self) -> float:
+        """Presión actual del servidor (1.0 = en el límite)"""
+        load = self.signal.read() if self.signal is not None else {"in_flight": 0, "p95_ms": 0.0, "writer_queue": 0}
+        writer_queue = max(load["writer_queue"], self._local_queue_depth() if self._local_queue_depth else 0)
+        pressure = max(
+            load["in_flight"] / self.max_in_flight if self.max_in_flight else 0.0,
+            load["p95_ms"] / self.max_p95_ms if self.max_p95_ms else 0.0,
+            writer_queue / self.max_writer_queue if self.max_writer_queue else 0.0
+        )
+        self.stats['last_pressure'] = round(pressure, 3)
+        return pressure
+
+    def wait_for_capacity(self, should_stop: Callable[[], bool] = lambda: False) -> float:
+        """Esperar (bloqueando) a que haya capacidad; devuelve los segundos esperados"""
+        waited = 0.0
+        for delay in self._delays(should_stop):
+            time.sleep(delay)
+            waited += delay
+        return self._record(waited)
+
+    async def await_capacity(self, should_stop: Callable[[], bool] = lambda: False) -> float:
+        """Como wait_for_capacity, sin bloquear el bucle de eventos"""
+        waited = 0.0
+        for delay in self._delays(should_stop):
+            await asyncio.sleep(delay)
+            waited += delay
+        return self._record(waited)
+
+    def get_stats(self) -> Dict:
+        """Esperas acumuladas y presión observada"""
+        with self._lock:
+            stats = dict(self.stats)
+        stats['paused_seconds'] = round(stats['paused_seconds'], 3)
+        return stats
+
+    def _delays(self, should_stop: Callable[[], bool]):
+        """Esperas sucesivas mientras dure la presión"""
+        pressure = self.pressure()
+        with self._lock:
+            self.stats['checks'] += 1
+            if pressure >= 1:
+                self.stats['pauses'] += 1
+            elif pressure >= self.soft_pressure:
+                self.stats['yields'] += 1
+        if pressure < self.soft_pressure:
+            return
+        if pressure < 1:
+            yield self.min_backoff_seconds
+            return
+
+        delay = self.min_backoff_seconds
+        while pressure >= 1 and not should_stop():
+            yield delay
+            delay = min(delay * 2, self.max_backoff_seconds)
+            pressure = self.pressure()
+
+    def _record(self, waited: float) -> float:
+        if waited:
+            with self._lock:
+                self.stats['paused_seconds'] += waited
+        return waited
@@ -0,0 +1,154 @@
+"""
+Registro incremental de cambios del vocabulario
+Permite que los consumidores en memoria (corrector ortográfico, cachés)
+se sincronicen aplicando solo las palabras nuevas o eliminadas
+"""
+
+import sqlite3
+import logging
+from dataclasses import dataclass, field
+from concurrent.futures import Future
+from typing import Callable, ContextManager, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class VocabularyChanges:
+    """Cambios netos del vocabulario desde una marca de secuencia"""
+    seq: int
+    added: Set[str] = field(default_factory=set)
+    removed: Set[str] = field(default_factory=set)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed)
+
+
+class VocabularyChangeFeed:
+    """
+    Feed de cambios basado en una tabla de secuencia alimentada por triggers.
+
+    Los triggers capturan las escrituras de cualquier proceso o módulo que
+    inserte o elimine palabras, sin que cada aprendiz tenga que notificarlo.
+    """
+
+    def __init__(self, db_path: str = "optimized_learning.db", retention: int = 100000,
+                 connection: Optional[Callable[[], ContextManager[sqlite3.Connection]]] = None,
+                 ensure_schema: bool = True,
+                 write: Optional[Callable[[Callable[[sqlite3.Connection], None]], Future]] = None):
+        self.db_path = db_path
+        self.retention = retention
+        # Fábrica de conexiones y escritor (p. ej. los del almacén de vocabulario)
+        self._connect = connection or (lambda: sqlite3.connect(self.db_path))
+        self._write = write
+        if ensure_schema:
+            self.ensure_schema()
+
+    def ensure_schema(self):
+        """Crear la tabla de cambios y, si existe el vocabulario, sus triggers"""
+        try:
+            with self._connect() as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS vocabulary_changes (
+                        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                        word TEXT NOT NULL,
+                        operation TEXT NOT NULL,
+                        changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS vocabulary_feed_state (
+                        key TEXT PRIMARY KEY,
+                        value INTEGER NOT NULL
+                    )
+                """)
+
+                vocabulary_exists = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'vocabulary'"
+                ).fetchone()
+                if vocabulary_exists:
+                    conn.execute("""
+                        CREATE TRIGGER IF NOT EXISTS trg_vocabulary_feed_insert
+                        AFTER INSERT ON vocabulary
+                        BEGIN
+                            INSERT INTO vocabulary_changes (word, operation) VALUES (NEW.word, 'insert');
+                        END
+                    """)
+                    conn.execute("""
+                        CREATE TRIGGER IF NOT EXISTS trg_vocabulary_feed_delete
+                        AFTER DELETE ON vocabulary
+                        BEGIN
+                            INSERT INTO vocabulary_changes (word, operation) VALUES (OLD.word, 'delete');
+                        END
+                    """)
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Error inicializando feed de vocabulario: {e}")
+
+    def latest_seq(self) -> int:
+        """Última secuencia registrada (marca a guardar antes de una carga completa)"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT MAX(seq) FROM vocabulary_changes").fetchone()
+            compacted = self._compacted_through(conn)
+            return max(row[0] or 0, compacted)
+
+    def changes_since(self, seq: int) -> Optional[VocabularyChanges]:
+        """
+        Cambios netos posteriores a `seq`.
+
+        Devuelve None si los cambios ya fueron compactados y el consumidor
+        debe recargar el vocabulario completo.
+        """
+        with self._connect() as conn:
+            if seq < self._compacted_through(conn):
+                return None
+
+            changes = VocabularyChanges(seq=seq)
+            cursor = conn.execute("""
+                SELECT seq, word, operation
+                FROM vocabulary_changes
+                WHERE seq > ?
+                ORDER BY seq
+            """, (seq,))
+
+            for row_seq, word, operation in cursor:
+                word = word.lower()
+                if operation == 'insert':
+                    changes.added.add(word)
+                    changes.removed.discard(word)
+                else:
+                    changes.removed.add(word)
+                    changes.added.discard(word)
+                changes.seq = row_seq
+
+            return changes
+
+    def compact(self):
+        """Eliminar cambios antiguos conservando los últimos `retention`"""
+        def compact(conn: sqlite3.Connection):
+            row = conn.execute("SELECT MAX(seq) FROM vocabulary_changes").fetchone()
+            cutoff = (row[0] or 0) - self.retention
+            if cutoff <= self._compacted_through(conn):
+                return
+
+            conn.execute("DELETE FROM vocabulary_changes WHERE seq <= ?", (cutoff,))
+            conn.execute("""
+                INSERT OR REPLACE INTO vocabulary_feed_state (key, value)
+                VALUES ('compacted_through', ?)
+            """, (cutoff,))
+
+        try:
+            if self._write is not None:
+                self._write(compact).result()
+            else:
+                with self._connect() as conn:
+                    compact(conn)
+        except Exception as e:
+            logger.error(f"Error compactando feed de vocabulario: {e}")
+
+    def _compacted_through(self, conn: sqlite3.Connection) -> int:
+        """Secuencia hasta la que se eliminaron cambios"""
+        row = conn.execute(
+            "SELECT value FROM vocabulary_feed_state WHERE key = 'compacted_through'"
+        ).fetchone()
+        return row[0] if row else 0
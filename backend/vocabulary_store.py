@@ -0,0 +1,566 @@
+"""
+Almacén único del vocabulario aprendido (optimized_learning.db)
+Es dueño del esquema del vocabulario, de aplicar las migraciones (las suyas
+y las que declara cada módulo), del pool de conexiones, de las operaciones
+masivas del camino caliente y de los conteos memorizados que consultan las
+estadísticas
+"""
+
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from db_writer import SingleWriter, WriteOperation
+from vocabulary_feed import VocabularyChangeFeed
+
+logger = logging.getLogger(__name__)
+
+# Contextos recientes que se conservan por palabra o expresión
+MAX_CONTEXTS = 10
+
+# SQL del camino caliente. Son cadenas constantes para que la caché de
+# sentencias de cada conexión del pool las reutilice ya preparadas.
+UPSERT_WORD_SQL = """
+    INSERT INTO vocabulary (word, frequency, contexts, learned_date, last_used, category, source)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(word) DO UPDATE SET
+        frequency = frequency + excluded.frequency,
+        contexts = append_contexts(contexts, excluded.contexts),
+        last_used = excluded.last_used
+"""
+
+# Igual, pero la categoría de cada aparición sustituye a la guardada (aprendizaje del chat)
+UPSERT_RECATEGORIZE_WORD_SQL = """
+    INSERT INTO vocabulary (word, frequency, contexts, learned_date, last_used, category, source)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(word) DO UPDATE SET
+        frequency = frequency + excluded.frequency,
+        contexts = append_contexts(contexts, excluded.contexts),
+        last_used = excluded.last_used,
+        category = excluded.category
+"""
+
+# Palabras del lote que ya existen; un solo parámetro JSON sirve para lotes de cualquier tamaño
+COUNT_EXISTING_WORDS_SQL = """
+    SELECT COUNT(*) FROM vocabulary WHERE word IN (SELECT value FROM json_each(?))
+"""
+
+UPSERT_EXPRESSION_SQL = """
+    INSERT INTO expressions (expression, frequency, contexts, learned_date, last_used, category, source)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(expression) DO UPDATE SET
+        frequency = frequency + excluded.frequency,
+        contexts = append_contexts(contexts, excluded.contexts),
+        last_used = excluded.last_used
+"""
+
+UPSERT_LEARNING_STATS_SQL = """
+    INSERT INTO learning_stats (date, new_words, new_expressions, total_learned)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(date) DO UPDATE SET
+        new_words = new_words + excluded.new_words,
+        new_expressions = new_expressions + excluded.new_expressions,
+        total_learned = total_learned + excluded.total_learned
+"""
+
+UPSERT_VARIATION_SQL = """
+    INSERT INTO spelling_variations (correct_word, variation, error_type, frequency)
+    VALUES (?, ?, ?, 1)
+    ON CONFLICT(correct_word, variation) DO UPDATE SET
+        frequency = frequency + 1,
+        error_type = excluded.error_type
+"""
+
+UPSERT_PHONETIC_SQL = "INSERT OR REPLACE INTO vocabulary_phonetic (word, code) VALUES (?, ?)"
+
+
+def _append_contexts(existing: Optional[str], new: Optional[str]) -> str:
+    """Función SQL: concatenar dos listas JSON de contextos y conservar las últimas"""
+    try:
+        contexts = json.loads(existing) if existing else []
+    except ValueError:
+        contexts = []
+    contexts.extend(json.loads(new) if new else [])
+    return json.dumps(contexts[-MAX_CONTEXTS:])
+
+
+# Paso de esquema que recibe la conexión de la transacción de migración
+Migration = Callable[[sqlite3.Connection], None]
+
+
+def add_column(conn: sqlite3.Connection, table: str, column: str, definition: str):
+    """ALTER TABLE ADD COLUMN solo si la columna no existe"""
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def _migration_base_schema(conn: sqlite3.Connection):
+    """Vocabulario, expresiones y estadísticas diarias"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS vocabulary (
+            word TEXT PRIMARY KEY,
+            frequency INTEGER DEFAULT 1,
+            contexts TEXT,
+            learned_date TEXT,
+            last_used TEXT,
+            category TEXT DEFAULT 'general'
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS expressions (
+            expression TEXT PRIMARY KEY,
+            frequency INTEGER DEFAULT 1,
+            contexts TEXT,
+            learned_date TEXT,
+            last_used TEXT,
+            category TEXT DEFAULT 'general'
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS learning_stats (
+            date TEXT PRIMARY KEY,
+            new_words INTEGER DEFAULT 0,
+            new_expressions INTEGER DEFAULT 0,
+            total_learned INTEGER DEFAULT 0
+        )
+    """)
+    # Tablas de vocabulario creadas por herramientas con un esquema mínimo
+    add_column(conn, "vocabulary", "contexts", "TEXT")
+    add_column(conn, "vocabulary", "learned_date", "TEXT")
+    add_column(conn, "vocabulary", "last_used", "TEXT")
+    add_column(conn, "vocabulary", "category", "TEXT DEFAULT 'general'")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_vocabulary_frequency ON vocabulary(frequency)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_vocabulary_category ON vocabulary(category)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_expressions_frequency ON expressions(frequency)")
+
+
+def _migration_source_columns(conn: sqlite3.Connection):
+    """Origen de cada palabra y expresión (el aprendizaje automático lo escribía sin que existiera)"""
+    add_column(conn, "vocabulary", "source", "TEXT")
+    add_column(conn, "expressions", "source", "TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_vocabulary_last_used ON vocabulary(last_used)")
+
+
+def _migration_spelling(conn: sqlite3.Connection):
+    """Variaciones ortográficas y códigos fonéticos del corrector"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS spelling_variations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            correct_word TEXT NOT NULL,
+            variation TEXT NOT NULL,
+            similarity REAL DEFAULT 0.0,
+            error_type TEXT DEFAULT 'unknown',
+            frequency INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(correct_word, variation)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS vocabulary_phonetic (
+            word TEXT PRIMARY KEY,
+            code TEXT NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_spelling_variations_variation ON spelling_variations(variation)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_vocabulary_phonetic_code ON vocabulary_phonetic(code)")
+
+
+# Migraciones del almacén: las tablas que usan sus propias operaciones. Los
+# demás módulos declaran las suyas junto a su código y las aplican con
+# store.migrate(...) antes de usar sus tablas. Cada migración es idempotente
+# y se registra por nombre en schema_migrations.
+MIGRATIONS: List[Migration] = [
+    _migration_base_schema,
+    _migration_source_columns,
+    _migration_spelling,
+]
+
+
+class VocabularyStore:
+    """
+    Acceso compartido a optimized_learning.db.
+
+    Las lecturas usan conexiones de un pool (modo WAL, con las funciones SQL
+    propias registradas). Las escrituras pasan todas por un único hilo
+    escritor (`writer`), dueño de la única conexión de escritura del proceso,
+    que las agrupa en transacciones: ya no compiten entre sí por el bloqueo de
+    la base de datos. Las operaciones reciben un `conn` opcional; sin él, se
+    encolan en el escritor y esperan su confirmación.
+
+    Los conteos de palabras y expresiones se memorizan unos segundos y se
+    descartan tras cada COMMIT del escritor.
+    """
+
+    def __init__(self, db_path: str = "optimized_learning.db", pool_size: int = 4,
+                 count_cache_seconds: float = 5.0,
+                 busy_timeout_seconds: float = 30.0, writer_max_batch: int = 256):
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self.count_cache_seconds = count_cache_seconds
+        self.busy_timeout_seconds = busy_timeout_seconds
+
+        self._pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._pool_lock = threading.Lock()
+        self._connections_created = 0
+
+        self._count_cache: Dict[str, Tuple[float, int]] = {}
+        self._cache_lock = threading.Lock()
+
+        self.writer = SingleWriter(lambda: self.open_connection(isolation_level=None),
+                                   max_batch=writer_max_batch, name="vocabulary-writer",
+                                   on_commit=self._after_commit)
+        self.change_feed = VocabularyChangeFeed(db_path, connection=self.connection, ensure_schema=False,
+                                                write=self.write)
+        self._applied_migrations: set = set()
+        self._migrate_lock = threading.Lock()
+        self.migrate()
+        self.change_feed.ensure_schema()
+
+    # --- Conexiones ---
+
+    def open_connection(self, **kwargs) -> sqlite3.Connection:
+        """Abrir una conexión configurada (WAL y funciones SQL propias) fuera del pool"""
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout_seconds,
+                               check_same_thread=False, cached_statements=256, **kwargs)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.create_function("append_contexts", 2, _append_contexts, deterministic=True)
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        """Tomar una conexión libre, abriendo una nueva si el pool no está lleno"""
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._pool_lock:
+            if self._connections_created < self.pool_size:
+                self._connections_created += 1
+                return self.open_connection()
+
+        return self._pool.get(timeout=self.busy_timeout_seconds)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Conexión de lectura del pool con la semántica de `with sqlite3.connect(...)`:
+        confirma al salir y revierte si hubo una excepción
+        """
+        conn = self._acquire()
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self._pool.put(conn)
+
+    def write(self, operation: WriteOperation, description: Optional[str] = None) -> Future:
+        """
+        Encolar una escritura en el hilo escritor; el Future se resuelve tras el COMMIT.
+        Con `description`, un fallo se registra aunque nadie espere el resultado.
+        """
+        future = self.writer.submit(operation)
+        if description is not None:
+            future.add_done_callback(lambda f: _log_failed_write(f, description))
+        return future
+
+    def flush(self) -> Future:
+        """Future que se resuelve cuando todas las escrituras encoladas están confirmadas"""
+        return self.writer.flush()
+
+    def _run(self, conn: Optional[sqlite3.Connection], operation: WriteOperation):
+        """Ejecutar en la transacción del llamador o en el escritor, esperando la confirmación"""
+        if conn is not None:
+            return operation(conn)
+        return self.write(operation).result()
+
+    def close(self):
+        """Confirmar las escrituras pendientes, detener el escritor y cerrar el pool"""
+        self.writer.close()
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._pool_lock:
+            self._connections_created = 0
+
+    # --- Esquema ---
+
+    def migrate(self, migrations: Sequence[Migration] = MIGRATIONS):
+        """
+        Aplicar las migraciones de `migrations` que falten, en orden. Se
+        identifican por nombre de función; las ya aplicadas en este proceso
+        no vuelven a consultarse.
+        """
+        pending = [m for m in migrations if m.__name__ not in self._applied_migrations]
+        if not pending:
+            return
+        with self._migrate_lock, self.connection() as conn:
+            # BEGIN IMMEDIATE serializa a los procesos que arrancan a la vez
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    name TEXT PRIMARY KEY,
+                    applied_at TEXT
+                )
+            """)
+            applied = {row[0] for row in conn.execute("SELECT name FROM schema_migrations")}
+            for migration in pending:
+                if migration.__name__ in applied:
+                    continue
+                migration(conn)
+                conn.execute("INSERT INTO schema_migrations (name, applied_at) VALUES (?, ?)",
+                             (migration.__name__, datetime.now().isoformat()))
+                applied.add(migration.__name__)
+                logger.info(f"Migración {migration.__name__} aplicada a {self.db_path}: {migration.__doc__}")
+            self._applied_migrations.update(applied)
+
+    # --- Vocabulario ---
+
+    def upsert_words(self, counts: Mapping[str, int], source: str,
+                     categories: Optional[Mapping[str, str]] = None,
+                     categorize: Optional[Callable[[str], str]] = None,
+                     context: Optional[str] = None,
+                     conn: Optional[sqlite3.Connection] = None,
+                     recategorize: bool = False) -> int:
+        """
+        Inserción masiva de palabras con su conteo: las existentes suman
+        frecuencia y contexto. La categoría es la de la primera inserción,
+        o con `recategorize` la de esta escritura también para las existentes.
+        Devuelve cuántas palabras no existían (contadas en la misma
+        transacción, sin mezclar escrituras de otros procesos).
+        """
+        if not counts:
+            return 0
+        now = datetime.now().isoformat()
+        contexts = json.dumps([context or source])
+        categories = categories or {}
+
+        def category_for(word: str) -> str:
+            return categories.get(word) or (categorize(word) if categorize else 'general')
+
+        rows = [(word, count, contexts, now, now, category_for(word), source) for word, count in counts.items()]
+        sql = UPSERT_RECATEGORIZE_WORD_SQL if recategorize else UPSERT_WORD_SQL
+
+        def upsert(c: sqlite3.Connection) -> int:
+            existing = c.execute(COUNT_EXISTING_WORDS_SQL, (json.dumps(list(counts)),)).fetchone()[0]
+            c.executemany(sql, rows)
+            return len(rows) - existing
+
+        return self._run(conn, upsert)
+
+    def upsert_expressions(self, counts: Mapping[str, int], source: str, category: str = 'general',
+                           context: Optional[str] = None,
+                           conn: Optional[sqlite3.Connection] = None) -> int:
+        """Inserción masiva de expresiones con la misma semántica que las palabras"""
+        if not counts:
+            return 0
+        now = datetime.now().isoformat()
+        contexts = json.dumps([context or source])
+        rows = [(expression, count, contexts, now, now, category, source) for expression, count in counts.items()]
+        self._run(conn, lambda c: c.executemany(UPSERT_EXPRESSION_SQL, rows))
+        return len(rows)
+
+    def top_words(self, limit: int) -> List[Tuple[str, int, List[str], str]]:
+        """Palabras más frecuentes: (palabra, frecuencia, contextos, categoría)"""
+        with self.connection() as conn:
+            rows = conn.execute("""
+                SELECT word, frequency, contexts, category
+                FROM vocabulary
+                ORDER BY frequency DESC
+                LIMIT ?
+            """, (limit,)).fetchall()
+        return [(word, frequency, json.loads(contexts) if contexts else [], category)
+                for word, frequency, contexts, category in rows]
+
+    def top_expressions(self, limit: int) -> List[Tuple[str, int]]:
+        """Expresiones más frecuentes: (expresión, frecuencia)"""
+        with self.connection() as conn:
+            return conn.execute("""
+                SELECT expression, frequency
+                FROM expressions
+                ORDER BY frequency DESC
+                LIMIT ?
+            """, (limit,)).fetchall()
+
+    def count_words(self) -> int:
+        """Total de palabras (memorizado unos segundos: COUNT(*) recorre la tabla)"""
+        return self._cached_count('words', "SELECT COUNT(*) FROM vocabulary")
+
+    def count_expressions(self) -> int:
+        """Total de expresiones (memorizado unos segundos)"""
+        return self._cached_count('expressions', "SELECT COUNT(*) FROM expressions")
+
+    def iter_words_with_codes(self) -> List[Tuple[str, Optional[str]]]:
+        """Todas las palabras con su código fonético guardado (None si falta)"""
+        with self.connection() as conn:
+            return conn.execute("""
+                SELECT v.word, p.code
+                FROM vocabulary v
+                LEFT JOIN vocabulary_phonetic p ON p.word = v.word
+            """).fetchall()
+
+    def save_phonetic_codes(self, codes: List[Tuple[str, str]], conn: Optional[sqlite3.Connection] = None):
+        """Guardar códigos fonéticos precalculados"""
+        if codes:
+            self._run(conn, lambda c: c.executemany(UPSERT_PHONETIC_SQL, codes))
+
+    def delete_stale(self, cutoff: str, min_frequency: int):
+        """Eliminar palabras y expresiones sin uso desde `cutoff` y con poca frecuencia"""
+        def delete(conn: sqlite3.Connection):
+            conn.execute("DELETE FROM vocabulary WHERE last_used < ? AND frequency < ?", (cutoff, min_frequency))
+            conn.execute("DELETE FROM expressions WHERE last_used < ? AND frequency < ?", (cutoff, min_frequency))
+
+        self._run(None, delete)
+        with self._cache_lock:
+            self._count_cache.clear()
+
+    # --- Estadísticas diarias ---
+
+    def add_learning_stats(self, new_words: int, new_expressions: int,
+                           conn: Optional[sqlite3.Connection] = None):
+        """Sumar lo aprendido hoy"""
+        today = datetime.now().strftime('%Y-%m-%d')
+        self._run(conn, lambda c: c.execute(
+            UPSERT_LEARNING_STATS_SQL, (today, new_words, new_expressions, new_words + new_expressions)
+        ))
+
+    def learning_stats_for(self, date: str) -> Optional[Tuple[int, int, int]]:
+        """(palabras, expresiones, total) aprendidos en una fecha YYYY-MM-DD"""
+        with self.connection() as conn:
+            return conn.execute("""
+                SELECT new_words, new_expressions, total_learned
+                FROM learning_stats
+                WHERE date = ?
+            """, (date,)).fetchone()
+
+    # --- Variaciones ortográficas ---
+
+    def upsert_variation(self, correct_word: str, variation: str, error_type: str,
+                         conn: Optional[sqlite3.Connection] = None) -> int:
+        """Registrar una variación (o sumar su frecuencia) y devolver su id"""
+        def operation(c: sqlite3.Connection) -> int:
+            c.execute(UPSERT_VARIATION_SQL, (correct_word, variation, error_type))
+            return c.execute(
+                "SELECT id FROM spelling_variations WHERE correct_word = ? AND variation = ?",
+                (correct_word, variation)
+            ).fetchone()[0]
+        return self._run(conn, operation)
+
+    def variations_since(self, watermark: int) -> List[Tuple[int, str, str]]:
+        """Variaciones con id posterior a la marca: (id, variación, palabra correcta)"""
+        with self.connection() as conn:
+            return conn.execute("""
+                SELECT id, variation, correct_word
+                FROM spelling_variations
+                WHERE id > ?
+                ORDER BY id
+            """, (watermark,)).fetchall()
+
+    def variation_stats(self) -> Tuple:
+        """(total, palabras únicas, similitud media, frecuencia total) de las variaciones"""
+        with self.connection() as conn:
+            return conn.execute("""
+                SELECT
+                    COUNT(*) as total_variations,
+                    COUNT(DISTINCT correct_word) as unique_words,
+                    AVG(similarity) as avg_similarity,
+                    SUM(frequency) as total_frequency
+                FROM spelling_variations
+            """).fetchone()
+
+    # --- Mantenimiento ---
+
+    def backup(self, backup_path: str):
+        """Copia en caliente de la base de datos"""
+        with self.connection() as conn:
+            backup_conn = sqlite3.connect(backup_path)
+            try:
+                conn.backup(backup_conn)
+            finally:
+                backup_conn.close()
+
+    def invalidate_caches(self):
+        """Vaciar los conteos memorizados (p. ej. cuando otro proceso escribió vocabulario)"""
+        with self._cache_lock:
+            self._count_cache.clear()
+
+    def get_cache_stats(self) -> Dict:
+        """Conteos memorizados y estado del pool y del escritor"""
+        return {
+            'cached_counts': len(self._count_cache),
+            'pool_connections': self._connections_created,
+            'pool_size': self.pool_size,
+            'writer_queue_depth': self.writer.queue_depth(),
+            'writer': dict(self.writer.stats)
+        }
+
+    def _after_commit(self):
+        """Descartar los conteos memorizados tras cada COMMIT del escritor"""
+        with self._cache_lock:
+            self._count_cache.clear()
+
+    def _cached_count(self, key: str, sql: str) -> int:
+        """Conteo memorizado durante count_cache_seconds"""
+        cached = self._count_cache.get(key)
+        now = time.monotonic()
+        if cached and now - cached[0] < self.count_cache_seconds:
+            return cached[1]
+        with self.connection() as conn:
+            value = conn.execute(sql).fetchone()[0]
+        self._count_cache[key] = (now, value)
+        return value
+
+
+def _log_failed_write(future: Future, description: str):
+    """Registrar una escritura encolada que falló"""
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(f"Error en escritura ({description}): {future.exception()}")
+
+
+_stores: Dict[str, VocabularyStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(db_path: str = "optimized_learning.db") -> VocabularyStore:
+    """Almacén compartido del proceso para una base de datos (uno por ruta)"""
+    key = os.path.abspath(db_path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = VocabularyStore(db_path)
+        return store
+
+
+def release_store(db_path: str):
+    """Cerrar el almacén compartido de una base de datos y olvidarlo (p. ej. bases temporales)"""
+    with _stores_lock:
+        store = _stores.pop(os.path.abspath(db_path), None)
+    if store is not None:
+        store.close()
+
+
+@atexit.register
+def _close_stores():
+    """No perder las escrituras encoladas al terminar el proceso"""
+    for store in list(_stores.values()):
+        try:
+            store.writer.close(timeout=10)
+        except Exception as e:
+            logger.error(f"Error cerrando el escritor de {store.db_path}: {e}")
@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 """
 Monitor del Sistema de Aprendizaje Continuo
-Monitorea el progreso del aprendizaje en tiempo real
+Monitorea el progreso del aprendizaje en tiempo real suscrito al flujo de
+eventos del servidor (SSE), sin consultar las estadísticas periódicamente
 """
 import requests
 import time
@@ -13,16 +14,80 @@ def clear_screen():
     """Limpiar pantalla"""
     os.system('cls' if os.name == 'nt' else 'clear')
 
-def get_learning_stats():
-    """Obtener estadísticas del aprendizaje"""
+EVENTS_URL = "http://localhost:8000/continuous-learning/events"
+# El servidor envía un comentario cada 15 s; sin nada en este tiempo se reconecta
+EVENTS_READ_TIMEOUT = 60
+RECONNECT_SECONDS = 5
+
+def follow_events(last_event_id=None):
+    """
+    Eventos (tipo, id, datos) del flujo SSE de aprendizaje; (None, None, None)
+    por cada comentario de mantenimiento. Termina si se corta la conexión.
+    """
+    headers = {"Accept": "text/event-stream"}
+    if last_event_id:
+        headers["Last-Event-ID"] = str(last_event_id)
+    with requests.get(EVENTS_URL, headers=headers, stream=True, timeout=(5, EVENTS_READ_TIMEOUT)) as response:
+        response.raise_for_status()
+        event_type, event_id, data = None, None, []
+        # chunk_size=1: cada evento se muestra en cuanto llega
+        for line in response.iter_lines(chunk_size=1, decode_unicode=True):
+            if line.startswith(":"):
+                yield None, None, None
+            elif line.startswith("event:"):
+                event_type = line[6:].strip()
+            elif line.startswith("id:"):
+                event_id = int(line[3:].strip())
+            elif line.startswith("data:"):
+                data.append(line[5:].strip())
+            elif not line and event_type:
+                yield event_type, event_id, json.loads("\n".join(data) or "{}")
+                event_type, event_id, data = None, None, []
+
+def apply_event(stats, event_type, data):
+    """Actualizar las estadísticas mostradas con un evento del flujo; devuelve las nuevas"""
+    if event_type == "stats":
+        return data
+    if not stats:
+        return stats
+    learning_stats = stats.setdefault('continuous_learning_stats', {})
+    
+    if event_type == "stats_delta":
+        for name, value in data.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                learning_stats[name] = learning_stats.get(name, 0) + value
+            elif value is not None:
+                learning_stats[name] = value
+    elif event_type == "learning_state":
+        stats['is_running'] = data['is_running']
+        learning_stats['is_running'] = data['is_running']
+        learning_stats['next_training_at'] = data.get('next_training_at')
+        learning_stats['next_training_in_minutes'] = data.get('next_training_in_minutes')
+    elif event_type == "session_started":
+        learning_stats['session_in_progress'] = True
+        stats['current_session'] = {**data, 'words_learned': 0, 'expressions_learned': 0, 'sources': {}}
+    elif event_type == "session_progress":
+        stats['current_session'] = {**stats.get('current_session', {}), **data}
+    elif event_type == "session_ended":
+        learning_stats['session_in_progress'] = False
+        stats.pop('current_session', None)
+        stats['last_session'] = data
+        # Media de duración: las sesiones con error o abortadas no guardan duración
+        if data['status'] != 'error' and data.get('duration_seconds') is not None:
+            timed = (learning_stats.get('total_sessions', 0) - learning_stats.get('error_sessions', 0)
+                     - learning_stats.get('aborted_sessions', 0))
+            average = learning_stats.get('avg_duration_seconds', 0)
+            learning_stats['avg_duration_seconds'] = (average * timed + data['duration_seconds']) / (timed + 1)
+    return stats
+
+def minutes_until(timestamp_str):
+    """Minutos que faltan hasta una fecha ISO (None si no hay fecha)"""
+    if not timestamp_str:
+        return None
     try:
-        response = requests.get("http://localhost:8000/continuous-learning/stats")
-        if response.status_code == 200:
-            return response.json()
-        else:
-            return None
-    except Exception as e:
-        print(f"❌ Error obteniendo estadísticas: {e}")
+        remaining = (datetime.fromisoformat(timestamp_str) - datetime.now()).total_seconds() / 60
+        return round(max(0.0, remaining), 1)
+    except ValueError:
         return None
 
 def format_duration(seconds):
@@ -57,6 +122,53 @@ def format_time_ago(timestamp_str):
     except:
         return "Desconocido"
 
+# Niveles para dibujar un histograma en una línea
+HISTOGRAM_BARS = " ▁▂▃▄▅▆▇█"
+
+def format_histogram(histogram):
+    """Histograma de duraciones {intervalo: llamadas} como una línea de barras"""
+    counts = list(histogram.values())
+    highest = max(counts) if counts else 0
+    if not highest:
+        return ""
+    bars = "".join(HISTOGRAM_BARS[-1] if count == highest else HISTOGRAM_BARS[(count * (len(HISTOGRAM_BARS) - 1)) // highest]
+                   for count in counts)
+    labels = list(histogram)
+    return f"{labels[0]} [{bars}] {labels[-1]}"
+
+def display_phase_metrics(phases):
+    """Mostrar tiempo, filas por segundo, errores e histograma por fuente y fase"""
+    if not phases:
+        return
+    print("🔬 **Rendimiento por Fuente y Fase** (últimas sesiones)")
+    for source, source_phases in phases.items():
+        print(f"   📦 {source}")
+        for phase, metrics in source_phases.items():
+            rate = metrics.get('rows_per_second')
+            rate_text = f"{rate:,.0f} filas/s" if rate is not None else "-"
+            errors = f", ❌ {metrics['errors']}" if metrics['errors'] else ""
+            print(f"      {phase:<10} {metrics['calls']:>5} llamadas  {format_duration(metrics['total_seconds']):>7}  "
+                  f"{rate_text}{errors}")
+            histogram = format_histogram(metrics.get('histogram', {}))
+            if histogram:
+                print(f"      {'':<10} {histogram}")
+    print()
+
+def display_session(current_session, last_session):
+    """Mostrar el avance de la sesión en curso o el resultado de la última"""
+    if current_session:
+        print(f"🎬 **Sesión en Curso** (#{current_session.get('session_id')})")
+        print(f"   📚 Palabras: {current_session.get('words_learned', 0):,}   "
+              f"💬 Expresiones: {current_session.get('expressions_learned', 0):,}")
+        for source, progress in current_session.get('sources', {}).items():
+            print(f"   📦 {source:<16} {progress['status']:<10} {progress['words_learned']:>8,} palabras")
+        print()
+    elif last_session:
+        print(f"🏁 **Última Sesión** (#{last_session.get('session_id')}): {last_session.get('status')}, "
+              f"{last_session.get('words_learned', 0):,} palabras, "
+              f"{last_session.get('new_words') or 0:,} nuevas en {format_duration(last_session.get('duration_seconds') or 0)}")
+        print()
+
 def display_stats(stats, start_time):
     """Mostrar estadísticas formateadas"""
     clear_screen()
@@ -94,8 +206,10 @@ def display_stats(stats, start_time):
         last_training = format_time_ago(learning_stats['last_training'])
         print(f"   🕒 Última sesión: {last_training} atrás")
     
-    if learning_stats['next_training_in_minutes']:
-        next_training = learning_stats['next_training_in_minutes']
+    next_training = minutes_until(learning_stats.get('next_training_at'))
+    if next_training is None:
+        next_training = learning_stats.get('next_training_in_minutes')
+    if next_training is not None:
         print(f"   ⏰ Próxima sesión: en {next_training} minutos")
     
     print(f"   ⏱️ Intervalo configurado: {config['training_interval_minutes']} minutos")
@@ -130,6 +244,9 @@ def display_stats(stats, start_time):
         print(f"   📚 Palabras/minuto: {words_per_minute:.1f}")
     
     print()
+    
+    display_session(stats.get('current_session'), stats.get('last_session'))
+    display_phase_metrics(learning_stats.get('phases'))
     print("💡 Presiona Ctrl+C para detener el monitor")
     print("=" * 60)
 
@@ -143,11 +260,23 @@ def monitor_learning():
     print("Presiona Ctrl+C para detener")
     print("=" * 60)
     
+    stats = None
+    last_event_id = None
     try:
         while True:
-            stats = get_learning_stats()
-            display_stats(stats, start_time)
-            time.sleep(10)  # Actualizar cada 10 segundos
+            try:
+                # Se redibuja con cada evento y con cada comentario de mantenimiento
+                # Sin instantánea todavía no hay nada que actualizar con los eventos perdidos
+                for event_type, event_id, data in follow_events(last_event_id if stats else None):
+                    if event_id is not None:
+                        last_event_id = event_id
+                    if event_type is not None:
+                        stats = apply_event(stats, event_type, data)
+                    display_stats(stats, start_time)
+            except (requests.RequestException, ValueError) as e:
+                print(f"❌ Conexión con el flujo de eventos perdida: {e}")
+            print(f"🔄 Reconectando en {RECONNECT_SECONDS} segundos...")
+            time.sleep(RECONNECT_SECONDS)
             
     except KeyboardInterrupt:
         print("\n🛑 Monitor detenido por el usuario")
@@ -162,7 +291,7 @@ Uso:
   python monitor_continuous_learning.py
 
 Funciones:
-  • Monitoreo en tiempo real del aprendizaje
+  • Monitoreo en tiempo real del aprendizaje (eventos SSE)
   • Estadísticas detalladas del sistema
   • Información de rendimiento
   • Estado de configuración
@@ -175,6 +304,7 @@ Comandos útiles:
   • Iniciar servidor: python backend/start_optimized.py
   • Iniciar aprendizaje: python start_continuous_learning.py
   • Ver estadísticas: curl http://localhost:8000/continuous-learning/stats
+  • Ver eventos: curl -N http://localhost:8000/continuous-learning/events
 """)
 
 def main():
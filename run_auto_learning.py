@@ -30,7 +30,10 @@ try:
             status = result.get('status', 'unknown')
             words = result.get('words_learned', 0)
             expressions = result.get('expressions_learned', 0)
-            print(f"   • {source}: {status} ({words} palabras, {expressions} expresiones)")
+            seconds = result.get('duration_seconds', 0)
+            print(f"   • {source}: {status} ({words} palabras, {expressions} expresiones) en {seconds:.1f}s")
+        
+        print(f"\n⏱️ Duración de la sesión: {results['timings']['session']:.1f}s")
         
         # Mostrar estadísticas
         stats = auto_learner.get_learning_stats()